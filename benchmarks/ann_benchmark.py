@@ -0,0 +1,140 @@
+"""
+Recall@k versus latency of the approximate FAISS index types.
+
+Builds every index type from the same vectors with the project's own
+build code (vector_store.ann_index), searches a query set at several
+nprobe / efSearch settings and compares the results with the exact flat
+index. Vectors are either synthetic (clustered Gaussian data with the
+dimension of all-MiniLM-L6-v2) or read from an existing project.
+
+Usage:
+    python benchmarks/ann_benchmark.py [--vectors 200000] [--queries 500] [-k 10]
+    python benchmarks/ann_benchmark.py --project my-project [--storage-dir vector_stores]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import faiss
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from vector_store.ann_index import IndexConfig, build_index, search_parameters  # noqa: E402
+from vector_store.generations import current_directory  # noqa: E402
+from vector_store.index_storage import VECTORS_FILE, read_meta  # noqa: E402
+
+SWEEPS = {
+    "flat": [None],
+    "hnsw": [16, 32, 64, 128, 256],
+    "ivf": [1, 4, 16, 64],
+    "ivfpq": [1, 4, 16, 64],
+}
+
+
+def synthetic_vectors(count, dimension, clusters, seed):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dimension)).astype(np.float32)
+    labels = rng.integers(0, clusters, size=count)
+    vectors = centers[labels] + 0.8 * rng.normal(size=(count, dimension)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def project_vectors(project, storage_dir):
+    directory = current_directory(os.path.join(storage_dir, project))
+    meta = read_meta(directory)
+    if meta is None:
+        raise SystemExit(f"No vector store found in {directory}")
+    rows = meta.get("rows", meta["count"])
+    vectors = np.fromfile(os.path.join(directory, VECTORS_FILE), dtype=np.float32, count=rows * meta["dimension"])
+    # Rows of removed chunks stay in the file until the next compaction.
+    return np.delete(vectors.reshape(rows, meta["dimension"]), meta.get("deleted", []), axis=0)
+
+
+def index_bytes(index):
+    return int(faiss.serialize_index(index).size)
+
+
+def run_queries(index, queries, k, params):
+    latencies = []
+    results = np.empty((len(queries), k), dtype=np.int64)
+    for i, query in enumerate(queries):
+        start = time.perf_counter()
+        _, positions = index.search(query[None, :], k, params=params)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results[i] = positions[0]
+    return results, np.array(latencies)
+
+
+def recall_at_k(results, truth):
+    hits = sum(len(set(found[found >= 0]) & set(expected)) for found, expected in zip(results, truth))
+    return hits / truth.size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark approximate index recall and latency")
+    parser.add_argument("--vectors", type=int, default=200_000, help="Number of synthetic vectors")
+    parser.add_argument("--dimension", type=int, default=384, help="Dimension of synthetic vectors")
+    parser.add_argument("--clusters", type=int, default=1000, help="Clusters in the synthetic data")
+    parser.add_argument("--project", help="Benchmark the vectors of an existing project instead")
+    parser.add_argument("--storage-dir", default="vector_stores", help="Vector store directory of --project")
+    parser.add_argument("--queries", type=int, default=500, help="Number of queries")
+    parser.add_argument("-k", type=int, default=10, help="Number of neighbors per query")
+    parser.add_argument("--types", default="flat,hnsw,ivf,ivfpq", help="Comma-separated index types")
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    args = parser.parse_args()
+
+    if args.project:
+        vectors = project_vectors(args.project, args.storage_dir)
+    else:
+        vectors = synthetic_vectors(args.vectors, args.dimension, args.clusters, seed=0)
+
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.choice(len(vectors), min(args.queries, len(vectors)), replace=False)]
+    queries = queries + 0.05 * rng.normal(size=queries.shape).astype(np.float32)
+
+    flat = build_index(vectors, IndexConfig("flat"))
+    _, truth = flat.search(queries, args.k)
+
+    report = {
+        "vectors": int(len(vectors)),
+        "dimension": int(vectors.shape[1]),
+        "queries": int(len(queries)),
+        "k": args.k,
+        "results": []
+    }
+    for index_type in args.types.split(","):
+        start = time.perf_counter()
+        index = flat if index_type == "flat" else build_index(vectors, IndexConfig(index_type))
+        build_seconds = time.perf_counter() - start
+
+        for setting in SWEEPS[index_type]:
+            params = search_parameters(index, nprobe=setting, ef_search=setting)
+            results, latencies = run_queries(index, queries, args.k, params)
+            entry = {
+                "index_type": index_type,
+                "build_seconds": round(build_seconds, 3),
+                "index_bytes": index_bytes(index),
+                "bytes_per_vector": round(index_bytes(index) / len(vectors), 1),
+                "recall_at_k": round(recall_at_k(results, truth), 4),
+                "latency_ms_mean": round(float(latencies.mean()), 4),
+                "latency_ms_p95": round(float(np.percentile(latencies, 95)), 4),
+            }
+            if index_type in ("ivf", "ivfpq"):
+                entry["nprobe"] = setting
+            elif index_type == "hnsw":
+                entry["ef_search"] = setting
+            report["results"].append(entry)
+            print(json.dumps(entry), file=sys.stderr)
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+
+
+if __name__ == "__main__":
+    main()
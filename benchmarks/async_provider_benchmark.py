@@ -0,0 +1,235 @@
+"""
+Concurrency benchmark for the asyncio LLM providers.
+
+Starts a local stand-in for the Ollama HTTP API (/api/generate, streamed
+and not, with a configurable per-request latency and a share of requests
+failing with HTTP 503), then asks it a set of questions through the
+AsyncOllamaProvider created by LLMProviderFactory:
+
+- one at a time, as a synchronous caller would;
+- all at once, limited by the provider's concurrency setting;
+- all at once with streaming, measuring time to first token.
+
+Reports wall time, throughput, the number of TCP connections the server
+saw (keep-alive pooling keeps it at the concurrency limit) and retried
+requests as JSON. Exits with status 1 if any answer is wrong, a run
+retried a different number of requests than failed, opened more
+connections than its concurrency (one for the sequential run), or the
+concurrent run is not faster than the sequential one. Connections idle
+through retry backoffs longer than httpx's keep-alive expiry (5 s) are
+closed and reopened, so very high --fail-rate values can fail the
+connection check without a pooling problem.
+
+Usage:
+    python benchmarks/async_provider_benchmark.py [--questions 32] [--concurrency 8] [--latency-ms 100] [--fail-rate 0.1]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from llm_providers.base_provider import LLMProviderError  # noqa: E402
+from llm_providers.provider_factory import LLMProviderFactory  # noqa: E402
+
+
+class StandInOllamaHandler(BaseHTTPRequestHandler):
+    """Answers /api/generate with the last line of the prompt, like a very fast echo model."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        request = json.loads(self.rfile.read(length))
+        with self.server.lock:
+            self.server.requests += 1
+            fail = self.server.random.random() < self.server.fail_rate
+            if fail and self.path == "/api/generate":
+                self.server.failures += 1
+
+        if self.path != "/api/generate" or fail:
+            body = json.dumps({"error": "unavailable"}).encode("utf-8")
+            self.send_response(404 if self.path != "/api/generate" else 503)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        answer = "answer to " + request["prompt"].split("Question: ")[1].split("\n")[0]
+        tokens = answer.split(" ")
+        if not request.get("stream"):
+            time.sleep(self.server.latency)
+            body = json.dumps({"model": request["model"], "response": answer, "done": True}).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        # Prompt processing dominates; the tokens then arrive quickly
+        time.sleep(self.server.latency * 0.8)
+        for i, token in enumerate(tokens):
+            time.sleep(self.server.latency * 0.2 / len(tokens))
+            piece = token if i == 0 else " " + token
+            self._write_chunk({"model": request["model"], "response": piece, "done": False})
+        self._write_chunk({"model": request["model"], "response": "", "done": True})
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _write_chunk(self, message):
+        line = (json.dumps(message) + "\n").encode("utf-8")
+        self.wfile.write(f"{len(line):X}\r\n".encode("ascii") + line + b"\r\n")
+        self.wfile.flush()
+
+
+def start_server(latency, fail_rate, seed):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInOllamaHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.fail_rate = fail_rate
+    server.random = random.Random(seed)
+    server.lock = threading.Lock()
+    server.connections = 0
+    server.requests = 0
+    server.failures = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def reset_counters(server):
+    with server.lock:
+        server.connections = 0
+        server.requests = 0
+        server.failures = 0
+
+
+async def ask_one(provider, question):
+    # Requests that failed after every retry count as wrong answers
+    try:
+        return await provider.aask_question(question, "context")
+    except LLMProviderError as e:
+        return str(e)
+
+
+async def ask_sequential(provider, questions):
+    return [await ask_one(provider, question) for question in questions]
+
+
+async def ask_concurrent(provider, questions):
+    return await asyncio.gather(*(ask_one(provider, question) for question in questions))
+
+
+async def ask_streaming(provider, questions):
+    async def one(question):
+        start = time.perf_counter()
+        first_token = None
+        pieces = []
+        try:
+            async for piece in provider.aask_question_stream(question, "context"):
+                if first_token is None:
+                    first_token = time.perf_counter() - start
+                pieces.append(piece)
+        except LLMProviderError as e:
+            pieces = [str(e)]
+        return "".join(pieces), first_token
+
+    return await asyncio.gather(*(one(question) for question in questions))
+
+
+async def run(args, server):
+    config = {
+        "base_url": f"http://127.0.0.1:{server.server_address[1]}",
+        "max_concurrency": args.concurrency,
+        "max_retries": args.retries,
+        "timeout": 30
+    }
+    questions = [f"question {i}" for i in range(args.questions)]
+    expected = [f"answer to {question}" for question in questions]
+    report = {"questions": args.questions, "concurrency": args.concurrency,
+              "latency_ms": args.latency_ms, "fail_rate": args.fail_rate, "runs": {}}
+    failures = []
+
+    for name, ask in (("sequential", ask_sequential), ("concurrent", ask_concurrent), ("streaming", ask_streaming)):
+        reset_counters(server)
+        async with LLMProviderFactory.create_async_provider("ollama", config) as provider:
+            start = time.perf_counter()
+            results = await ask(provider, questions)
+            elapsed = time.perf_counter() - start
+
+        answers = [result[0] for result in results] if name == "streaming" else results
+        wrong = sum(answer != wanted for answer, wanted in zip(answers, expected))
+        if wrong:
+            failures.append(f"{name}: {wrong} wrong answers (e.g. {answers[0]!r})")
+
+        run_report = {
+            "seconds": round(elapsed, 3),
+            "questions_per_sec": round(len(questions) / elapsed, 1),
+            "connections": server.connections,
+            "requests": server.requests,
+            "retried": server.requests - len(questions),
+            "injected_failures": server.failures,
+            "wrong_answers": wrong
+        }
+        # Every injected 503 is retried once, and nothing else is, except
+        # the last failure of a question that ran out of retries
+        if run_report["retried"] != server.failures - wrong:
+            failures.append(f"{name}: {run_report['retried']} requests retried for {server.failures} failures")
+        # Keep-alive pooling reuses connections up to the concurrency limit
+        max_connections = 1 if name == "sequential" else args.concurrency
+        if server.connections > max_connections:
+            failures.append(f"{name}: {server.connections} connections opened, expected at most {max_connections}")
+        if name == "streaming":
+            first_tokens = sorted(result[1] for result in results if result[1] is not None)
+            run_report["median_first_token_ms"] = round(first_tokens[len(first_tokens) // 2] * 1000, 1)
+        report["runs"][name] = run_report
+
+    if report["runs"]["concurrent"]["seconds"] >= report["runs"]["sequential"]["seconds"]:
+        failures.append("concurrent run was not faster than the sequential one")
+    return report, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the asyncio LLM providers against a stand-in Ollama server")
+    parser.add_argument("--questions", type=int, default=32, help="Number of questions per run")
+    parser.add_argument("--concurrency", type=int, default=8, help="Provider concurrency limit")
+    parser.add_argument("--latency-ms", type=float, default=100.0, help="Simulated generation time per request")
+    parser.add_argument("--fail-rate", type=float, default=0.1, help="Share of requests answered with HTTP 503")
+    parser.add_argument("--retries", type=int, default=5, help="Provider retries per request")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for injected failures")
+    args = parser.parse_args()
+
+    server = start_server(args.latency_ms / 1000, args.fail_rate, args.seed)
+    try:
+        report, failures = asyncio.run(run(args, server))
+    finally:
+        server.shutdown()
+
+    print(json.dumps(report, indent=2))
+    if failures:
+        for failure in failures:
+            print(f"FAIL: {failure}")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
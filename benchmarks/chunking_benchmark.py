@@ -0,0 +1,174 @@
+"""
+Syntax-aware chunking versus the character splitter.
+
+Indexes the code files of a directory twice, once split by CodeChunker
+and once by the 500-character RecursiveCharacterTextSplitter, and reports
+chunk count, chunk size, store size on disk and build time of each, with
+the retrieval quality (recall@k and MRR) of both on the same queries.
+
+Queries are the first line of the docstrings of Python functions and
+classes; a query is answered when a returned chunk overlaps the lines of
+its definition. The docstrings are blanked out of the indexed files (line
+numbers are kept) so that the query text is not in the index verbatim.
+
+Usage:
+    python benchmarks/chunking_benchmark.py [--path src] [-k 5] [--max-queries 200]
+"""
+import argparse
+import ast
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from utils.code_chunker import CodeChunker  # noqa: E402
+from utils.file_processor import FileProcessor  # noqa: E402
+from vector_store.generations import current_directory  # noqa: E402
+from vector_store.index_storage import read_meta  # noqa: E402
+from vector_store.vector_store_manager import VectorStoreManager  # noqa: E402
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+
+def read_code_files(root):
+    """Read the files of `root` that CodeChunker splits by syntax."""
+    chunker = CodeChunker()
+    files = []
+    for directory, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if d not in FileProcessor.DEFAULT_EXCLUDED_DIRS)
+        for filename in sorted(filenames):
+            if not chunker.supports(os.path.splitext(filename)[1].lower()):
+                continue
+            path = os.path.join(directory, filename)
+            try:
+                with open(path, encoding="utf-8") as f:
+                    content = f.read()
+            except (OSError, UnicodeDecodeError):
+                continue
+            files.append({"path": os.path.relpath(path, root), "content": content})
+    return files
+
+
+def extract_queries(files, max_queries):
+    """
+    Take the first docstring line of each Python definition as a query,
+    blanking the docstrings out of the file contents.
+    Returns the queries as (text, path, first line, last line).
+    """
+    queries = []
+    for doc in files:
+        if not doc["path"].endswith(".py"):
+            continue
+        try:
+            tree = ast.parse(doc["content"])
+        except SyntaxError:
+            continue
+        lines = doc["content"].splitlines(keepends=True)
+        for node in ast.walk(tree):
+            if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                continue
+            docstring = ast.get_docstring(node)
+            if not docstring:
+                continue
+            text = docstring.strip().splitlines()[0]
+            if len(text.split()) < 3:
+                continue
+            queries.append((text, doc["path"], node.lineno, node.end_lineno))
+            expression = node.body[0]
+            for number in range(expression.lineno - 1, expression.end_lineno):
+                lines[number] = "\n"
+        doc["content"] = "".join(lines)
+    return queries[:max_queries]
+
+
+def line_range(doc, contents):
+    """Lines covered by a chunk, from its metadata or its start offset."""
+    if "line_start" in doc.metadata:
+        return doc.metadata["line_start"], doc.metadata["line_end"]
+    content = contents[doc.metadata["source"]]
+    start = content.count("\n", 0, doc.metadata["start_index"]) + 1
+    return start, start + doc.page_content.count("\n")
+
+
+def evaluate(manager, queries, contents, k, mode):
+    results = manager.similarity_search_batch([q[0] for q in queries], k=k, group_by_source=False, mode=mode)
+    hits = 0
+    reciprocal_ranks = 0.0
+    context_chars = 0
+    for (_, path, first, last), docs in zip(queries, results):
+        context_chars += sum(len(doc.page_content) for doc in docs)
+        for rank, doc in enumerate(docs, 1):
+            start, end = line_range(doc, contents)
+            if doc.metadata["source"] == path and start <= last and end >= first:
+                hits += 1
+                reciprocal_ranks += 1 / rank
+                break
+    return {
+        "recall_at_k": round(hits / len(queries), 4),
+        "mrr": round(reciprocal_ranks / len(queries), 4),
+        "context_chars_mean": round(context_chars / len(queries), 1),
+    }
+
+
+def store_bytes(directory):
+    return sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare syntax-aware chunking with the character splitter")
+    parser.add_argument("--path", default=DEFAULT_PATH, help="Directory of code to index (default: this repository's src)")
+    parser.add_argument("-k", type=int, default=5, help="Chunks retrieved per query")
+    parser.add_argument("--max-queries", type=int, default=200, help="Maximum number of queries")
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    args = parser.parse_args()
+
+    files = read_code_files(args.path)
+    queries = extract_queries(files, args.max_queries)
+    if not queries:
+        raise SystemExit(f"No documented Python definitions found under {args.path}")
+    contents = {doc["path"]: doc["content"] for doc in files}
+
+    report = {"files": len(files), "queries": len(queries), "k": args.k, "results": []}
+    storage_dir = tempfile.mkdtemp(prefix="chunking-benchmark-")
+    engine = None
+    try:
+        for name, syntax_chunking in (("text_splitter", False), ("syntax", True)):
+            manager = VectorStoreManager(name, storage_dir=storage_dir, use_embedding_cache=False,
+                                         embedding_engine=engine, syntax_chunking=syntax_chunking)
+            start = time.perf_counter()
+            manager.create_or_update_vector_store(iter(files))
+            build_seconds = time.perf_counter() - start
+            # Both runs share the model, which is loaded once
+            engine = manager.embedding_engine
+
+            directory = current_directory(manager.vector_store_path)
+            count = read_meta(directory)["count"]
+            entry = {
+                "chunker": name,
+                "chunks": count,
+                "chunk_chars_mean": round(sum(len(doc["content"]) for doc in files) / count, 1),
+                "store_bytes": store_bytes(directory),
+                "build_seconds": round(build_seconds, 3),
+            }
+            for mode in VectorStoreManager.SEARCH_MODES:
+                entry[mode] = evaluate(manager, queries, contents, args.k, mode)
+            report["results"].append(entry)
+            print(json.dumps(entry), file=sys.stderr)
+    finally:
+        if engine is not None:
+            engine.close()
+        shutil.rmtree(storage_dir, ignore_errors=True)
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Check that git-driven updates index the same files as a full scan.
+
+Creates a small git repository and a project from it, then applies a
+sequence of working-tree changes, running `update_project` after each one
+(so it checks only the paths git reports). After every update the indexed
+files and their content hashes are compared with a full scan of the
+repository. The sequence covers edits, additions, untracked files,
+renames, commits and a tracked file deleted, updated, restored with
+`git checkout` and updated again.
+
+Prints one JSON report and exits with status 1 if any step left the index
+different from the scan.
+
+Usage:
+    python benchmarks/git_update_check.py
+"""
+import contextlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+PROJECT = "git-check"
+
+
+def git(repository, *args):
+    subprocess.run(["git", "-C", repository, "-c", "user.name=check", "-c", "user.email=check@example.com",
+                    *args], check=True, capture_output=True)
+
+
+def write(repository, path, content):
+    path = os.path.join(repository, path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(content)
+
+
+def remove(repository, path):
+    os.remove(os.path.join(repository, path))
+
+
+def compare(repository):
+    """Differences between the published index and a full scan of the repository."""
+    from utils.file_processor import FileProcessor
+    from vector_store.index_manifest import IndexManifest
+    from vector_store.vector_store_manager import VectorStoreManager
+
+    manifest = VectorStoreManager(PROJECT).load_manifest()
+    scanned = {path.replace(os.sep, "/"): IndexManifest.hash_content(document["content"])
+               for path, document in FileProcessor().scan_directory(repository) if document is not None}
+    indexed = {path.replace(os.sep, "/"): entry["hash"] for path, entry in manifest.files.items()}
+    return {
+        "missing": sorted(set(scanned) - set(indexed)),
+        "extra": sorted(set(indexed) - set(scanned)),
+        "stale": sorted(path for path in set(scanned) & set(indexed) if scanned[path] != indexed[path])
+    }
+
+
+def main():
+    if shutil.which("git") is None:
+        raise SystemExit("git is not installed")
+
+    workdir = tempfile.mkdtemp(prefix="git-update-check-")
+    cwd = os.getcwd()
+    repository = os.path.join(workdir, "repository")
+    steps = [
+        ("edit a tracked file", lambda: write(repository, "pkg/a.py", "def alpha():\n    return 2\n")),
+        ("add an untracked file", lambda: write(repository, "new.py", "def new():\n    return None\n")),
+        ("delete a tracked file", lambda: remove(repository, "pkg/b.js")),
+        ("restore it with git checkout", lambda: git(repository, "checkout", "--", "pkg/b.js")),
+        ("rename a tracked file", lambda: git(repository, "mv", "pkg/c.py", "pkg/renamed.py")),
+        ("commit everything", lambda: (git(repository, "add", "-A"), git(repository, "commit", "-qm", "change"))),
+        ("delete and commit", lambda: (git(repository, "rm", "-q", "pkg/b.js"), git(repository, "commit", "-qm", "rm"))),
+        ("revert the commit", lambda: git(repository, "revert", "--no-edit", "HEAD")),
+        ("delete the untracked file", lambda: remove(repository, "new.py")),
+    ]
+    report = {"steps": []}
+    try:
+        write(repository, "README.md", "# Check\n\nA repository for the git update check.\n")
+        write(repository, "pkg/a.py", "def alpha():\n    return 1\n")
+        write(repository, "pkg/b.js", "function beta() {\n  return 1;\n}\n")
+        write(repository, "pkg/c.py", "def gamma():\n    return 3\n")
+        write(repository, ".gitignore", "*.log\n")
+        git(repository, "init", "-q")
+        git(repository, "add", "-A")
+        git(repository, "commit", "-qm", "initial")
+
+        os.chdir(workdir)
+        from project_manager import ProjectManager
+        manager = ProjectManager()
+        with contextlib.redirect_stdout(sys.stderr):
+            if not manager.create_project(PROJECT, repository):
+                raise SystemExit("Could not create the project")
+
+        for name, change in steps:
+            change()
+            with contextlib.redirect_stdout(sys.stderr):
+                updated = manager.update_project(PROJECT)
+            differences = compare(repository)
+            ok = updated and not any(differences.values())
+            report["steps"].append({"step": name, "ok": ok, **differences})
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report["ok"] = all(step["ok"] for step in report["steps"])
+    print(json.dumps(report, indent=2))
+    sys.exit(0 if report["ok"] else 1)
+
+
+if __name__ == "__main__":
+    main()
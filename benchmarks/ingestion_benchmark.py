@@ -0,0 +1,185 @@
+"""
+Indexing throughput and memory on synthetic repositories.
+
+For each repository size, generates a repository (see synthetic_repo.py)
+and measures:
+
+- each ingestion stage on its own, one after another on the calling
+  thread: walk, text detection, read, chunk, embed, index build (adding
+  to FAISS and the lexical index, then building the configured index type)
+  and save (writing the vectors, chunks and metadata of a flat store);
+- `create_project` and, after changing part of the repository,
+  `update_project`, each end to end in a fresh process so that its peak
+  resident memory is its own.
+
+The model is loaded before the embed stage is timed. Prints one JSON
+report; --output also writes it to a file.
+
+Usage:
+    python benchmarks/ingestion_benchmark.py [--files 200,2000] [--mix py=0.5,js=0.5] [--index-type auto]
+"""
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC_DIR)
+
+from synthetic_repo import DEFAULT_MIX, generate_repository, mutate_repository  # noqa: E402
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def stage(name, items, unit, seconds, **extra):
+    entry = {"stage": name, unit: items, "seconds": round(seconds, 4),
+             f"{unit}_per_sec": round(items / seconds, 1) if seconds else None}
+    entry.update(extra)
+    return entry
+
+
+def measure_stages(repository, storage_dir, index_type):
+    """Time each ingestion stage separately, feeding each the output of the previous one."""
+    import numpy as np
+    from utils.file_processor import FileProcessor
+    from vector_store.ann_index import IndexConfig, build_index
+    from vector_store.index_storage import write_store
+    from vector_store.lexical_index import LexicalIndex
+    from vector_store.vector_store_manager import VectorStoreManager
+
+    stages = []
+    processor = FileProcessor()
+
+    start = time.perf_counter()
+    candidates = list(processor.iter_candidate_files(repository))
+    stages.append(stage("walk", len(candidates), "files", time.perf_counter() - start))
+
+    start = time.perf_counter()
+    text_files = [(path, relative) for path, relative in candidates if processor.is_text_file(path)]
+    stages.append(stage("detect", len(candidates), "files", time.perf_counter() - start, text_files=len(text_files),
+                        tiers=dict(processor.detection_counts)))
+
+    start = time.perf_counter()
+    documents = [document for document in (processor.read_document(path, relative) for path, relative in text_files)
+                 if document]
+    seconds = time.perf_counter() - start
+    megabytes = sum(document["size"] for document in documents) / (1024 * 1024)
+    stages.append(stage("read", len(documents), "files", seconds,
+                        mb_per_sec=round(megabytes / seconds, 2) if seconds else None))
+
+    manager = VectorStoreManager("stages", storage_dir=storage_dir, use_embedding_cache=False)
+    start = time.perf_counter()
+    chunks = [chunk for document in documents for chunk in manager.split_document(document["path"], document["content"])]
+    stages.append(stage("chunk", len(chunks), "chunks", time.perf_counter() - start))
+
+    engine = manager.embedding_engine
+    engine.embed_documents(["warm up"])
+    start = time.perf_counter()
+    vectors = engine.embed_documents([chunk.page_content for chunk in chunks])
+    stages.append(stage("embed", len(chunks), "chunks", time.perf_counter() - start,
+                        batch_size=engine.batch_size, workers=engine.workers))
+
+    config = IndexConfig(index_type)
+    lexical = LexicalIndex(os.path.join(storage_dir, "stages-lexical.sqlite"))
+    ids = [str(number) for number in range(len(chunks))]
+    start = time.perf_counter()
+    for offset in range(0, len(chunks), manager.INGEST_BATCH_SIZE):
+        batch = slice(offset, offset + manager.INGEST_BATCH_SIZE)
+        manager._add_embedded_batch(chunks[batch], ids[batch], vectors[batch])
+        lexical.add(ids[batch], [chunk.page_content for chunk in chunks[batch]])
+    lexical.commit()
+    resolved = config.resolve_type(len(chunks))
+    if resolved != "flat":
+        build_index(np.asarray(vectors, dtype=np.float32), config)
+    stages.append(stage("index_build", len(chunks), "chunks", time.perf_counter() - start, index_type=resolved))
+    lexical.close()
+
+    start = time.perf_counter()
+    write_store(manager.vector_store_path, manager.vector_store, IndexConfig("flat"))
+    stages.append(stage("save", len(chunks), "chunks", time.perf_counter() - start))
+    engine.close()
+    return stages
+
+
+def _run_project_command(workdir, command, name, repository, index_type):
+    """Run create_project or update_project in this (fresh) process."""
+    sys.path.insert(0, SRC_DIR)
+    os.chdir(workdir)
+    from project_manager import ProjectManager
+
+    manager = ProjectManager()
+    start = time.perf_counter()
+    # Keep the project manager's progress output off the JSON on stdout
+    with contextlib.redirect_stdout(sys.stderr):
+        if command == "create":
+            ok = manager.create_project(name, repository, index_config={"index_type": index_type})
+        else:
+            ok = manager.update_project(name)
+    seconds = time.perf_counter() - start
+    return {"command": command, "ok": ok, "seconds": round(seconds, 3), "peak_rss_mb": peak_rss_mb()}
+
+
+def run_project_command(*args):
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        return executor.submit(_run_project_command, *args).result()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark indexing stages and project create/update")
+    parser.add_argument("--files", default="200,2000", help="Comma-separated repository sizes, in source files")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Language weights (default: {DEFAULT_MIX})")
+    parser.add_argument("--modify", type=float, default=0.05, help="Fraction of files changed before the update")
+    parser.add_argument("--index-type", default="auto", help="Index type of the created projects")
+    parser.add_argument("--workdir", help="Directory to generate repositories and projects in (default: system temp)")
+    parser.add_argument("--skip-stages", action="store_true", help="Only run create and update end to end")
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    args = parser.parse_args()
+
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "mix": args.mix,
+        "index_type": args.index_type,
+        "results": []
+    }
+    for files in [int(size) for size in args.files.split(",")]:
+        workdir = tempfile.mkdtemp(prefix="ingestion-benchmark-", dir=args.workdir and os.path.abspath(args.workdir))
+        try:
+            repository = os.path.join(workdir, "repository")
+            entry = {"files": files, "repository": generate_repository(repository, files, args.mix)}
+            if not args.skip_stages:
+                entry["stages"] = measure_stages(repository, os.path.join(workdir, "stages"), args.index_type)
+
+            entry["create"] = run_project_command(workdir, "create", "benchmark", repository, args.index_type)
+            if entry["create"]["seconds"]:
+                entry["create"]["files_per_sec"] = round(files / entry["create"]["seconds"], 1)
+            entry["changes"] = mutate_repository(repository, modify_fraction=args.modify, mix=args.mix)
+            entry["update"] = run_project_command(workdir, "update", "benchmark", repository, args.index_type)
+            report["results"].append(entry)
+            print(json.dumps(entry), file=sys.stderr)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Per-path cost of the exclusion filter on a large tree.
+
+Compares the compiled PathFilter used by FileProcessor with the previous
+matcher, which split every path and scanned all file patterns with
+substring checks. Both are timed on the same list of relative paths
+(source files, files in excluded directories, excluded file types), and
+the full walk of a generated repository with .gitignore files is timed
+with and without them.
+
+Usage:
+    python benchmarks/path_filter_benchmark.py [--paths 200000] [--files 5000] [--repeat 3]
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from synthetic_repo import DIRECTORIES, EXCLUDED_DIRECTORIES, VERBS, WORDS, generate_repository  # noqa: E402
+from utils.file_processor import FileProcessor  # noqa: E402
+
+EXTENSIONS = [".py", ".js", ".java", ".cpp", ".md", ".json", ".pyc", ".png", ".log", ".min.js", ".lock"]
+GITIGNORE = "*.log\n/generated/\n**/fixtures/*.json\n!keep.log\n"
+
+
+def legacy_should_exclude(path, excluded_dirs, excluded_files):
+    """The matcher FileProcessor used before PathFilter."""
+    for part in path.split(os.sep):
+        if part in excluded_dirs:
+            return True
+    for pattern in excluded_files:
+        if pattern.startswith('*.'):
+            if path.endswith(pattern[1:]):
+                return True
+        elif pattern in path:
+            return True
+    return False
+
+
+def random_paths(count, seed=0):
+    rng = random.Random(seed)
+    directories = DIRECTORIES + EXCLUDED_DIRECTORIES[:1]
+    paths = []
+    for number in range(count):
+        parts = [rng.choice(directories) for _ in range(rng.randint(0, 5))]
+        name = f"{rng.choice(VERBS)}_{rng.choice(WORDS)}_{number}{rng.choice(EXTENSIONS)}"
+        paths.append(os.path.join(*parts, name))
+    return paths
+
+
+def time_per_path(check, paths, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        excluded = sum(1 for path in paths if check(path))
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return {"excluded": excluded, "ns_per_path": round(best / len(paths) * 1e9, 1)}
+
+
+def time_walk(processor, repository, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        files = sum(1 for _ in processor.iter_candidate_files(repository))
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return {"files": files, "seconds": round(best, 4)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the path exclusion filter")
+    parser.add_argument("--paths", type=int, default=200000, help="Number of relative paths to classify")
+    parser.add_argument("--files", type=int, default=5000, help="Source files of the walked repository")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement (the fastest is reported)")
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    args = parser.parse_args()
+
+    processor = FileProcessor()
+    paths = random_paths(args.paths)
+    legacy = time_per_path(
+        lambda path: legacy_should_exclude(path, processor.excluded_dirs, processor.excluded_files), paths, args.repeat)
+    compiled = time_per_path(processor.should_exclude_path, paths, args.repeat)
+    report = {
+        "paths": len(paths),
+        "legacy": legacy,
+        "path_filter": compiled,
+        "speedup": round(legacy["ns_per_path"] / compiled["ns_per_path"], 1) if compiled["ns_per_path"] else None,
+    }
+
+    workdir = tempfile.mkdtemp(prefix="path-filter-benchmark-")
+    try:
+        repository = os.path.join(workdir, "repository")
+        generate_repository(repository, args.files)
+        for directory, _, _ in list(os.walk(repository))[::10]:
+            with open(os.path.join(directory, ".gitignore"), "w") as f:
+                f.write(GITIGNORE)
+        report["walk"] = {
+            "files": args.files,
+            "without_gitignore": time_walk(FileProcessor(use_gitignore=False), repository, args.repeat),
+            "with_gitignore": time_walk(FileProcessor(), repository, args.repeat),
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+
+
+if __name__ == "__main__":
+    main()
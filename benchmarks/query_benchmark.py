@@ -0,0 +1,242 @@
+"""
+Search and ask latency, broken down by stage, and retrieval quality.
+
+Runs a query set through ProjectManager.search_project or ask_question at
+one or more concurrency levels and reports p50/p95/p99 latency of whole
+queries and of their stages: query embedding, index search (vector and
+lexical), chunk fetch from the docstore and, for ask, the LLM call. When
+queries name their gold source files, recall@k and MRR are reported too.
+
+Queries come from a JSONL file of {"query", "sources": [...]} lines or,
+by default, from the first line of the docstrings of the project's Python
+definitions, with the files defining them as gold sources. With
+--synthetic N a repository of N files is generated (see synthetic_repo.py)
+and indexed first. `ask` uses the offline stub provider unless --provider
+is given, so the benchmark runs without network access.
+
+Usage:
+    python benchmarks/query_benchmark.py --project NAME [--queries queries.jsonl] [--command search|ask]
+    python benchmarks/query_benchmark.py --synthetic 500 [--concurrency 1,4,16] [--llm-latency-ms 200]
+"""
+import argparse
+import ast
+import contextlib
+import functools
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from project_manager import ProjectManager  # noqa: E402
+from synthetic_repo import DEFAULT_MIX, generate_repository  # noqa: E402
+from utils.file_processor import FileProcessor  # noqa: E402
+from vector_store.embedding_engine import EmbeddingEngine  # noqa: E402
+from vector_store.index_storage import StoreReader  # noqa: E402
+
+STAGES = ["embed", "search", "fetch", "llm"]
+
+
+class StageTimer:
+    """
+    Adds up the time spent in wrapped functions, per thread, so that
+    concurrent queries each get their own breakdown.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def start(self):
+        self._local.times = defaultdict(float)
+
+    def stop(self):
+        times = dict(self._local.times)
+        self._local.times = None
+        return times
+
+    def wrap(self, owner, attribute, stage):
+        original = getattr(owner, attribute)
+        local = self._local
+
+        @functools.wraps(original)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                times = getattr(local, "times", None)
+                if times is not None:
+                    times[stage] += time.perf_counter() - start
+
+        setattr(owner, attribute, timed)
+
+
+def docstring_queries(repository, max_queries):
+    """Queries from Python docstrings, each with the files whose definitions carry it."""
+    sources = defaultdict(set)
+    for path, relative in FileProcessor().iter_candidate_files(repository):
+        if not path.endswith(".py"):
+            continue
+        try:
+            with open(path, encoding="utf-8") as f:
+                tree = ast.parse(f.read())
+        except (OSError, UnicodeDecodeError, SyntaxError):
+            continue
+        for node in ast.walk(tree):
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                docstring = ast.get_docstring(node)
+                if docstring and len(docstring.split()) >= 3:
+                    sources[docstring.strip().splitlines()[0]].add(relative)
+    return [{"query": query, "sources": sorted(files)} for query, files in list(sources.items())[:max_queries]]
+
+
+def read_queries(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def percentiles(values):
+    if not values:
+        return None
+    values = np.asarray(values) * 1000
+    return {f"p{p}": round(float(np.percentile(values, p)), 3) for p in (50, 95, 99)}
+
+
+def quality(items, k):
+    """recall@k and MRR of ranked source lists against the gold sources."""
+    judged = [(item["sources"], ranked) for item, ranked in items if item.get("sources")]
+    if not judged:
+        return None
+    hits = 0
+    reciprocal_ranks = 0.0
+    for gold, ranked in judged:
+        rank = next((i for i, source in enumerate(ranked[:k], 1) if source in gold), None)
+        if rank is not None:
+            hits += 1
+            reciprocal_ranks += 1 / rank
+    return {"judged": len(judged), "recall_at_k": round(hits / len(judged), 4),
+            "mrr": round(reciprocal_ranks / len(judged), 4)}
+
+
+def run_level(manager, project, items, args, timer, concurrency):
+    def run(item):
+        timer.start()
+        start = time.perf_counter()
+        if args.command == "search":
+            results = manager.search_project(project, item["query"], args.k, mode=args.search_mode)
+            ranked = [result["source"] for result in results]
+        else:
+            result = manager.ask_question(project, item["query"], args.k, use_cache=False, mode=args.search_mode)
+            ranked = [source["file"] for source in result["sources"]]
+        latency = time.perf_counter() - start
+        return latency, timer.stop(), ranked
+
+    work = [item for _ in range(args.repeat) for item in items]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        outcomes = list(executor.map(run, work))
+    wall = time.perf_counter() - start
+
+    stages = {stage: percentiles([times.get(stage, 0.0) for _, times, _ in outcomes]) for stage in STAGES}
+    if args.command == "search":
+        del stages["llm"]
+    return {
+        "concurrency": concurrency,
+        "queries": len(work),
+        "queries_per_sec": round(len(work) / wall, 2),
+        "latency_ms": percentiles([latency for latency, _, _ in outcomes]),
+        "stage_latency_ms": stages,
+        "quality": quality([(item, ranked) for item, (_, _, ranked) in zip(work, outcomes)], args.k),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark search/ask latency and retrieval quality")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--project", help="Existing project to query (from --projects-dir)")
+    source.add_argument("--synthetic", type=int, help="Generate and index a synthetic repository of N files")
+    parser.add_argument("--projects-dir", default="projects", help="Projects directory of --project")
+    parser.add_argument("--queries", help="JSONL file of {\"query\", \"sources\"} (default: docstring queries)")
+    parser.add_argument("--max-queries", type=int, default=200, help="Maximum number of derived queries")
+    parser.add_argument("--command", choices=["search", "ask"], default="search", help="Operation to benchmark")
+    parser.add_argument("-k", type=int, default=5, help="Results (or context chunks) per query")
+    parser.add_argument("--search-mode", choices=["hybrid", "vector"], default="hybrid", help="Retrieval mode")
+    parser.add_argument("--concurrency", default="1,4", help="Comma-separated numbers of concurrent queries")
+    parser.add_argument("--repeat", type=int, default=1, help="Times each query is run per concurrency level")
+    parser.add_argument("--query-cache", action="store_true", help="Keep the query cache on (off by default)")
+    parser.add_argument("--provider", default="stub", help="LLM provider for ask (default: offline stub)")
+    parser.add_argument("--config", type=json.loads, default={}, help="Provider configuration as JSON")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="First-token latency of the stub provider")
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    args = parser.parse_args()
+
+    llm_config = {"provider": args.provider, "config": dict(args.config)}
+    if args.provider == "stub":
+        llm_config["config"].setdefault("latency_ms", args.llm_latency_ms)
+    query_cache_config = None if args.query_cache else {"size": 0}
+
+    workdir = None
+    try:
+        if args.synthetic:
+            workdir = tempfile.mkdtemp(prefix="query-benchmark-")
+            os.chdir(workdir)
+            repository = os.path.join(workdir, "repository")
+            generate_repository(repository, args.synthetic, DEFAULT_MIX)
+            manager = ProjectManager(llm_config=llm_config, query_cache_config=query_cache_config)
+            project = "benchmark"
+            with contextlib.redirect_stdout(sys.stderr):
+                if not manager.create_project(project, repository):
+                    raise SystemExit("Indexing the synthetic repository failed")
+        else:
+            manager = ProjectManager(args.projects_dir, llm_config=llm_config, query_cache_config=query_cache_config)
+            project = args.project
+            projects = dict(manager.list_projects())
+            if project not in projects:
+                raise SystemExit(f"Project '{project}' does not exist")
+            repository = projects[project]["repository_path"]
+
+        items = read_queries(args.queries) if args.queries else docstring_queries(repository, args.max_queries)
+        if not items:
+            raise SystemExit("No queries to run")
+
+        timer = StageTimer()
+        timer.wrap(EmbeddingEngine, "embed_queries", "embed")
+        timer.wrap(StoreReader, "search_positions", "search")
+        timer.wrap(StoreReader, "lexical_search_positions", "search")
+        timer.wrap(StoreReader, "documents_at", "fetch")
+        if args.command == "ask":
+            timer.wrap(manager.llm_provider, "ask_question", "llm")
+
+        # Load the model and the index before anything is timed
+        with contextlib.redirect_stdout(sys.stderr):
+            manager.search_project(project, items[0]["query"], args.k, mode=args.search_mode)
+
+        report = {"project": project, "command": args.command, "search_mode": args.search_mode, "k": args.k,
+                  "provider": args.provider if args.command == "ask" else None, "results": []}
+        for concurrency in [int(level) for level in args.concurrency.split(",")]:
+            with contextlib.redirect_stdout(sys.stderr):
+                entry = run_level(manager, project, items, args, timer, concurrency)
+            report["results"].append(entry)
+            print(json.dumps(entry), file=sys.stderr)
+    finally:
+        if workdir is not None:
+            os.chdir(os.path.dirname(workdir))
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+
+
+if __name__ == "__main__":
+    main()
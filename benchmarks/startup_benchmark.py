@@ -0,0 +1,84 @@
+"""
+Startup-time benchmark for metadata-only CLI commands.
+
+Runs `rag_code_main.py list` repeatedly in a scratch directory, reports the
+median wall time next to the bare interpreter startup, and checks that no
+heavy dependency (langchain, FAISS, torch, openai, python-magic) gets
+imported along the way. Exits with status 1 if either guard fails.
+
+Usage:
+    python benchmarks/startup_benchmark.py [--runs 10] [--max-ms 200]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+MAIN = os.path.join(SRC_DIR, "rag_code_main.py")
+
+HEAVY_MODULES = [
+    "langchain", "langchain_core", "langchain_community", "langchain_huggingface",
+    "langchain_ollama", "faiss", "torch", "sentence_transformers", "openai", "magic", "numpy"
+]
+
+IMPORT_CHECK = """
+import json, sys
+sys.argv = ["rag_code_main.py", "list"]
+sys.path.insert(0, {src!r})
+import rag_code_main
+rag_code_main.main()
+print(json.dumps(sorted(m for m in {heavy!r} if m in sys.modules)))
+"""
+
+
+def time_command(command, runs, cwd):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=cwd, check=True, stdout=subprocess.DEVNULL)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark CLI startup time")
+    parser.add_argument("--runs", type=int, default=10, help="Number of runs per command")
+    parser.add_argument("--max-ms", type=float, default=200.0, help="Maximum median time for `list`")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        interpreter_ms = time_command([sys.executable, "-c", "pass"], args.runs, workdir)
+        list_ms = time_command([sys.executable, MAIN, "list"], args.runs, workdir)
+
+        check = subprocess.run(
+            [sys.executable, "-c", IMPORT_CHECK.format(src=os.path.abspath(SRC_DIR), heavy=HEAVY_MODULES)],
+            cwd=workdir, check=True, capture_output=True, text=True
+        )
+        heavy_imported = json.loads(check.stdout.strip().splitlines()[-1])
+
+    report = {
+        "runs": args.runs,
+        "interpreter_ms": round(interpreter_ms, 1),
+        "list_ms": round(list_ms, 1),
+        "list_overhead_ms": round(list_ms - interpreter_ms, 1),
+        "max_ms": args.max_ms,
+        "heavy_modules_imported": heavy_imported
+    }
+    print(json.dumps(report, indent=2))
+
+    if heavy_imported:
+        print(f"FAIL: `list` imported heavy modules: {', '.join(heavy_imported)}")
+        sys.exit(1)
+    if list_ms > args.max_ms:
+        print(f"FAIL: `list` took {list_ms:.1f} ms (limit {args.max_ms:.0f} ms)")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
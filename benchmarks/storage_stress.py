@@ -0,0 +1,231 @@
+"""
+Stress test of concurrent updates and queries on one project.
+
+Creates a project from a synthetic repository (see synthetic_repo.py),
+then runs, for a fixed time and each in its own process:
+
+- updaters, which change a few files (appending to existing ones, adding
+  and deleting their own) and run `update_project`, so that updates of the
+  same project and writes to projects.json overlap;
+- readers, which keep one resident vector store open and run hybrid
+  searches, as `serve` does, picking up every generation the updaters
+  publish. After each search they check that the generation they read is
+  whole: as many chunks in SQLite and in the lexical index as vectors in
+  its metadata. They also re-read projects.json.
+
+Afterwards the published index is compared with a full scan of the
+repository. Prints one JSON report and exits with status 1 if any update,
+search or check failed.
+
+Usage:
+    python benchmarks/storage_stress.py [--files 300] [--updaters 3] [--readers 3] [--seconds 30]
+"""
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import traceback
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC_DIR)
+
+from synthetic_repo import VERBS, WORDS, generate_repository  # noqa: E402
+
+PROJECT = "stress"
+QUERIES = [f"{verb} {word}" for verb in VERBS[:5] for word in WORDS[:4]]
+# Errors kept in the report per worker
+MAX_ERRORS = 5
+
+
+def _setup_worker(workdir):
+    sys.path.insert(0, SRC_DIR)
+    os.chdir(workdir)
+
+
+def run_updater(workdir, repository, number, start_at, deadline):
+    """Change files and update the project from `start_at` until `deadline`."""
+    _setup_worker(workdir)
+    from project_manager import ProjectManager
+
+    rng = random.Random(number)
+    manager = ProjectManager()
+    sources = []
+    for directory, dirnames, filenames in os.walk(repository):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith((".", "_")) and d != "node_modules")
+        sources += [os.path.join(directory, name) for name in sorted(filenames) if name.endswith(".py")]
+    stats = {"updater": number, "updates": 0, "failed": 0, "seconds": 0.0, "errors": []}
+    round_number = 0
+    time.sleep(max(start_at - time.time(), 0))
+    while time.time() < deadline:
+        for path in rng.sample(sources, min(3, len(sources))):
+            with open(path, "a") as f:
+                f.write(f"\ndef {rng.choice(VERBS)}_{rng.choice(WORDS)}_{number}_{round_number}():\n    return None\n")
+        own = os.path.join(repository, f"stress_{number}_{round_number % 4}.py")
+        if os.path.exists(own):
+            os.remove(own)
+        else:
+            with open(own, "w") as f:
+                f.write(f"def {rng.choice(VERBS)}_{rng.choice(WORDS)}():\n    return {round_number}\n")
+        round_number += 1
+
+        start = time.perf_counter()
+        # Keep the project manager's progress output off the JSON on stdout
+        with contextlib.redirect_stdout(sys.stderr):
+            ok = manager.update_project(PROJECT)
+        stats["seconds"] += time.perf_counter() - start
+        stats["updates" if ok else "failed"] += 1
+        if not ok and len(stats["errors"]) < MAX_ERRORS:
+            stats["errors"].append("update_project returned False (see stderr)")
+    stats["seconds"] = round(stats["seconds"], 3)
+    return stats
+
+
+def check_generation(reader):
+    """Describe how the generation a reader has open is inconsistent, or None if it is whole."""
+    chunks = reader._connection.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+    if chunks != reader.count:
+        return f"{reader.version}: {reader.count} vectors but {chunks} chunks"
+    if reader.lexical is not None:
+        terms = reader.lexical.connection.execute("SELECT COUNT(*) FROM chunk_ids").fetchone()[0]
+        if terms != reader.count:
+            return f"{reader.version}: {reader.count} vectors but {terms} lexical entries"
+    return None
+
+
+def run_reader(workdir, number, start_at, deadline):
+    """Search the project from a resident vector store from `start_at` until `deadline`."""
+    _setup_worker(workdir)
+    from vector_store.vector_store_manager import VectorStoreManager
+
+    rng = random.Random(number)
+    vector_store = VectorStoreManager(PROJECT, query_cache_size=0)
+    # Loads the embedding model
+    vector_store.similarity_search(QUERIES[0])
+    time.sleep(max(start_at - time.time(), 0))
+    stats = {"reader": number, "searches": 0, "failed": 0, "torn": 0, "metadata_failed": 0,
+             "generations": 0, "seconds": 0.0, "errors": []}
+    versions = set()
+    while time.time() < deadline:
+        start = time.perf_counter()
+        try:
+            results = vector_store.similarity_search_batch(rng.sample(QUERIES, 4), k=5, mode="hybrid")
+            stats["seconds"] += time.perf_counter() - start
+            reader = vector_store._ensure_loaded()
+            versions.add(reader.version)
+            problem = check_generation(reader)
+            if problem is None and not all(results):
+                problem = f"{reader.version}: a search returned nothing"
+            if problem is not None:
+                stats["torn"] += 1
+                if len(stats["errors"]) < MAX_ERRORS:
+                    stats["errors"].append(problem)
+            stats["searches"] += 1
+        except Exception:
+            stats["failed"] += 1
+            if len(stats["errors"]) < MAX_ERRORS:
+                stats["errors"].append(traceback.format_exc(limit=3))
+
+        try:
+            with open(os.path.join("projects", "projects.json")) as f:
+                json.load(f)[PROJECT]["document_count"]
+        except Exception as e:
+            stats["metadata_failed"] += 1
+            if len(stats["errors"]) < MAX_ERRORS:
+                stats["errors"].append(f"projects.json: {e!r}")
+    vector_store.close()
+    stats["generations"] = len(versions)
+    stats["seconds"] = round(stats["seconds"], 3)
+    return stats
+
+
+def verify(workdir, repository):
+    """Compare the published index and projects.json with a full scan of the repository."""
+    _setup_worker(workdir)
+    from project_manager import ProjectManager
+    from utils.file_processor import FileProcessor
+    from vector_store.generations import current_directory
+    from vector_store.index_storage import read_meta
+    from vector_store.vector_store_manager import VectorStoreManager
+
+    vector_store = VectorStoreManager(PROJECT)
+    manifest = vector_store.load_manifest()
+    directory = current_directory(vector_store.vector_store_path)
+    scanned = {relative_path for relative_path, _ in FileProcessor().scan_directory(repository)}
+    chunk_ids = sum(len(entry["chunk_ids"]) for entry in manifest.files.values())
+    metadata = dict(ProjectManager().list_projects())[PROJECT]
+    report = {
+        "generation": os.path.basename(directory),
+        "generations_on_disk": sum(1 for name in os.listdir(vector_store.vector_store_path)
+                                   if name.startswith("gen-")),
+        "files_match_scan": manifest.paths() == scanned,
+        "chunks_match_manifest": read_meta(directory)["count"] == chunk_ids,
+        "document_count_matches": metadata["document_count"] == len(manifest.files),
+    }
+    report["ok"] = report["files_match_scan"] and report["chunks_match_manifest"] and report["document_count_matches"]
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run concurrent project updates and queries")
+    parser.add_argument("--files", type=int, default=300, help="Source files of the generated repository")
+    parser.add_argument("--updaters", type=int, default=3, help="Processes updating the project")
+    parser.add_argument("--readers", type=int, default=3, help="Processes searching the project")
+    parser.add_argument("--seconds", type=float, default=30, help="How long updates and searches run")
+    parser.add_argument("--warmup", type=float, default=20,
+                        help="Seconds given to the workers to load the embedding model before starting")
+    parser.add_argument("--workdir", help="Directory to generate the repository and project in (default: system temp)")
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="storage-stress-", dir=args.workdir and os.path.abspath(args.workdir))
+    cwd = os.getcwd()
+    try:
+        repository = os.path.join(workdir, "repository")
+        report = {"repository": generate_repository(repository, args.files), "updaters": args.updaters,
+                  "readers": args.readers, "seconds": args.seconds}
+
+        context = multiprocessing.get_context("spawn")
+        os.chdir(workdir)
+        from project_manager import ProjectManager
+        with contextlib.redirect_stdout(sys.stderr):
+            if not ProjectManager().create_project(PROJECT, repository):
+                raise SystemExit("Could not create the project")
+
+        start_at = time.time() + args.warmup
+        deadline = start_at + args.seconds
+        with context.Pool(args.updaters + args.readers) as pool:
+            readers = [pool.apply_async(run_reader, (workdir, number, start_at, deadline))
+                       for number in range(args.readers)]
+            updaters = [pool.apply_async(run_updater, (workdir, repository, number, start_at, deadline))
+                        for number in range(args.updaters)]
+            report["update_results"] = [result.get() for result in updaters]
+            report["reader_results"] = [result.get() for result in readers]
+
+        with contextlib.redirect_stdout(sys.stderr):
+            # Settle the changes made after the last update started
+            ProjectManager().update_project(PROJECT)
+        report["final"] = verify(workdir, repository)
+        report["ok"] = (report["final"]["ok"]
+                        and not any(result["failed"] for result in report["update_results"])
+                        and not any(result["failed"] or result["torn"] or result["metadata_failed"]
+                                    for result in report["reader_results"]))
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    sys.exit(0 if report["ok"] else 1)
+
+
+if __name__ == "__main__":
+    main()
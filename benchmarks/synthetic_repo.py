@@ -0,0 +1,237 @@
+"""
+Synthetic source repositories for the ingestion and query benchmarks.
+
+Generates a directory tree of source files in a configurable language mix,
+with plausible identifiers, docstrings and comments, plus the kinds of
+files indexing must skip (binary assets, dependency and cache
+directories). Generation is deterministic for a given seed.
+
+Usage:
+    python benchmarks/synthetic_repo.py OUTPUT_DIR [--files 1000] [--mix py=0.4,js=0.25,java=0.15,cpp=0.1,md=0.1]
+"""
+import argparse
+import json
+import os
+import random
+
+DEFAULT_MIX = "py=0.4,js=0.25,java=0.15,cpp=0.1,md=0.1"
+
+WORDS = [
+    "user", "account", "session", "token", "cache", "index", "query", "result", "record", "batch",
+    "order", "invoice", "payment", "customer", "report", "config", "request", "response", "event", "queue",
+    "file", "path", "buffer", "stream", "parser", "lexer", "node", "graph", "vector", "matrix",
+    "price", "stock", "email", "message", "channel", "worker", "task", "job", "schedule", "metric",
+]
+VERBS = ["get", "set", "load", "save", "build", "parse", "render", "validate", "compute", "update",
+         "delete", "create", "fetch", "resolve", "merge", "encode", "decode", "flush", "sync", "apply"]
+DIRECTORIES = ["core", "api", "services", "models", "utils", "handlers", "storage", "jobs", "web", "lib"]
+# Skipped by FileProcessor's default exclusions, so they measure pruning only
+EXCLUDED_DIRECTORIES = ["node_modules", "__pycache__", ".git", "build"]
+
+
+def parse_mix(mix):
+    """Parse "py=0.4,js=0.6" into {"py": 0.4, "js": 0.6}."""
+    weights = {}
+    for part in mix.split(","):
+        language, _, weight = part.partition("=")
+        if language not in GENERATORS:
+            raise ValueError(f"Unknown language '{language}', expected one of: {', '.join(GENERATORS)}")
+        weights[language] = float(weight or 1)
+    return weights
+
+
+def _words(rng, count):
+    return [rng.choice(WORDS) for _ in range(count)]
+
+
+def _names(rng):
+    verb, first, second = rng.choice(VERBS), rng.choice(WORDS), rng.choice(WORDS)
+    return {
+        "snake": f"{verb}_{first}_{second}",
+        "camel": f"{verb}{first.title()}{second.title()}",
+        "class": f"{first.title()}{second.title()}{rng.choice(['Service', 'Manager', 'Store', 'Handler'])}",
+        "doc": f"{verb.title()} the {first} {second} of the {' '.join(_words(rng, 2))}.",
+    }
+
+
+def python_file(rng, functions):
+    lines = ['"""Module for ' + " ".join(_words(rng, 4)) + '."""', "import os", "import json", ""]
+    in_class = False
+    for _ in range(functions):
+        names = _names(rng)
+        if rng.random() < 0.2:
+            lines += ["", f"class {names['class']}:", f'    """{names["doc"]}"""', ""]
+            in_class = True
+            continue
+        indent = "    " if in_class else ""
+        arguments = ", ".join(_words(rng, rng.randint(1, 3)))
+        lines += ["", f"{indent}def {names['snake']}({'self, ' if in_class else ''}{arguments}):",
+                  f'{indent}    """{names["doc"]}"""']
+        for _ in range(rng.randint(2, 12)):
+            first, second = rng.choice(WORDS), rng.choice(WORDS)
+            lines.append(f"{indent}    {first}_{second} = {rng.choice(VERBS)}_{first}({second}, {rng.randint(0, 99)})")
+        lines.append(f"{indent}    return {rng.choice(WORDS)}_{rng.choice(WORDS)}")
+    return "\n".join(lines) + "\n"
+
+
+def javascript_file(rng, functions):
+    lines = ["// " + " ".join(_words(rng, 6)), "import { " + rng.choice(WORDS) + " } from './lib';", ""]
+    for _ in range(functions):
+        names = _names(rng)
+        lines += [f"/** {names['doc']} */", f"export function {names['camel']}({', '.join(_words(rng, 2))}) {{"]
+        for _ in range(rng.randint(2, 12)):
+            lines.append(f"  const {rng.choice(WORDS)}{rng.randint(0, 9)} = {rng.choice(VERBS)}{rng.choice(WORDS).title()}();")
+        lines += [f"  return {rng.choice(WORDS)};", "}", ""]
+    return "\n".join(lines)
+
+
+def java_file(rng, functions):
+    names = _names(rng)
+    lines = ["package com.example." + rng.choice(DIRECTORIES) + ";", "", "import java.util.List;", "",
+             f"/** {names['doc']} */", f"public class {names['class']} {{"]
+    for _ in range(functions):
+        method = _names(rng)
+        lines += ["", f"    /** {method['doc']} */",
+                  f"    public List<String> {method['camel']}(String {rng.choice(WORDS)}) {{"]
+        for _ in range(rng.randint(2, 10)):
+            lines.append(f"        String {rng.choice(WORDS)}{rng.randint(0, 9)} = {rng.choice(WORDS)}.{rng.choice(VERBS)}();")
+        lines += ["        return List.of();", "    }"]
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+
+def cpp_file(rng, functions):
+    lines = ["#include <string>", "#include <vector>", "", "namespace " + rng.choice(WORDS) + " {", ""]
+    for _ in range(functions):
+        names = _names(rng)
+        lines += [f"// {names['doc']}", f"int {names['snake']}(const std::vector<int>& {rng.choice(WORDS)}) {{"]
+        for _ in range(rng.randint(2, 10)):
+            lines.append(f"    int {rng.choice(WORDS)}_{rng.randint(0, 9)} = {rng.choice(VERBS)}_{rng.choice(WORDS)}();")
+        lines += ["    return 0;", "}", ""]
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+
+def markdown_file(rng, functions):
+    lines = ["# " + " ".join(_words(rng, 3)).title(), ""]
+    for _ in range(functions):
+        lines += ["## " + " ".join(_words(rng, 2)).title(), "",
+                  " ".join(_words(rng, rng.randint(20, 60))) + ".", ""]
+    return "\n".join(lines)
+
+
+GENERATORS = {
+    "py": python_file,
+    "js": javascript_file,
+    "java": java_file,
+    "cpp": cpp_file,
+    "md": markdown_file,
+}
+
+
+def _file_path(rng, root, language, number):
+    depth = rng.randint(0, 3)
+    directory = os.path.join(root, *[rng.choice(DIRECTORIES) for _ in range(depth)])
+    return os.path.join(directory, f"{rng.choice(VERBS)}_{rng.choice(WORDS)}_{number}.{language}")
+
+
+def _write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(content)
+
+
+def generate_repository(root, files=1000, mix=DEFAULT_MIX, functions=(3, 12), seed=0,
+                        binary_fraction=0.02, excluded_fraction=0.05):
+    """
+    Write a synthetic repository of `files` source files under `root`.
+
+    Args:
+        root: Directory to create the repository in
+        files: Number of source files
+        mix: Language weights, e.g. "py=0.5,js=0.5" (see GENERATORS)
+        functions: Range of functions (or sections) per file
+        seed: Random seed
+        binary_fraction: Binary files added, relative to `files`
+        excluded_fraction: Files added inside excluded directories, relative to `files`
+
+    Returns:
+        dict: Number of files written per kind and their total bytes
+    """
+    rng = random.Random(seed)
+    weights = parse_mix(mix)
+    languages = list(weights)
+    summary = {"files": 0, "bytes": 0, "languages": dict.fromkeys(languages, 0), "binary": 0, "excluded": 0}
+
+    for number in range(files):
+        language = rng.choices(languages, weights=[weights[name] for name in languages])[0]
+        content = GENERATORS[language](rng, rng.randint(*functions))
+        _write(_file_path(rng, root, language, number), content)
+        summary["files"] += 1
+        summary["bytes"] += len(content)
+        summary["languages"][language] += 1
+
+    for number in range(int(files * binary_fraction)):
+        path = os.path.join(root, "assets", f"image_{number}.png")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(b"\x89PNG\r\n\x1a\n" + rng.randbytes(rng.randint(1024, 16384)))
+        summary["binary"] += 1
+
+    for number in range(int(files * excluded_fraction)):
+        directory = os.path.join(root, rng.choice(EXCLUDED_DIRECTORIES), rng.choice(DIRECTORIES))
+        _write(os.path.join(directory, f"vendored_{number}.js"), javascript_file(rng, 3))
+        summary["excluded"] += 1
+
+    return summary
+
+
+def mutate_repository(root, modify_fraction=0.05, add_fraction=0.01, delete_fraction=0.01,
+                      mix=DEFAULT_MIX, seed=1):
+    """
+    Change a generated repository the way a day of commits might: append a
+    function to some files, add new files and delete others.
+
+    Returns:
+        dict: Number of files modified, added and deleted
+    """
+    rng = random.Random(seed)
+    weights = parse_mix(mix)
+    languages = list(weights)
+    excluded = set(EXCLUDED_DIRECTORIES) | {"assets"}
+    sources = []
+    for directory, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if d not in excluded)
+        sources += [os.path.join(directory, name) for name in sorted(filenames)]
+
+    rng.shuffle(sources)
+    modify = int(len(sources) * modify_fraction)
+    delete = int(len(sources) * delete_fraction)
+    for path in sources[:modify]:
+        language = os.path.splitext(path)[1][1:]
+        with open(path, "a") as f:
+            f.write("\n" + GENERATORS[language](rng, 1))
+    for path in sources[modify:modify + delete]:
+        os.remove(path)
+
+    add = int(len(sources) * add_fraction)
+    for number in range(add):
+        language = rng.choices(languages, weights=[weights[name] for name in languages])[0]
+        _write(_file_path(rng, root, language, f"new{seed}_{number}"), GENERATORS[language](rng, rng.randint(3, 12)))
+
+    return {"modified": modify, "added": add, "deleted": delete}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic source repository")
+    parser.add_argument("output", help="Directory to create the repository in")
+    parser.add_argument("--files", type=int, default=1000, help="Number of source files")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Language weights (default: {DEFAULT_MIX})")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    args = parser.parse_args()
+
+    print(json.dumps(generate_repository(args.output, args.files, args.mix, seed=args.seed), indent=2))
+
+
+if __name__ == "__main__":
+    main()
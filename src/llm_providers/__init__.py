@@ -1,5 +1,16 @@
-from .base_provider import BaseLLMProvider
-from .ollama_provider import OllamaProvider
+from .base_provider import BaseLLMProvider, LLMProviderError
 from .provider_factory import LLMProviderFactory
 
-__all__ = ['BaseLLMProvider', 'OllamaProvider', 'LLMProviderFactory']
+__all__ = ['BaseLLMProvider', 'LLMProviderError', 'AsyncBaseLLMProvider', 'OllamaProvider', 'LLMProviderFactory']
+
+
+def __getattr__(name):
+    # Provider implementations pull in their client libraries, so they are
+    # only imported when actually requested
+    if name == 'OllamaProvider':
+        from .ollama_provider import OllamaProvider
+        return OllamaProvider
+    if name == 'AsyncBaseLLMProvider':
+        from .async_base_provider import AsyncBaseLLMProvider
+        return AsyncBaseLLMProvider
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,165 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from .base_provider import BaseLLMProvider
+
+
+class CachedLLMProvider(BaseLLMProvider):
+    """
+    Semantic answer cache in front of any LLM provider.
+
+    A stored answer is returned when the same context was retrieved (the
+    same chunks, compared by a hash of the context text) and the question
+    is either identical after normalization or its embedding is within
+    `similarity_threshold` cosine similarity of a cached question. Entries
+    expire after `ttl_seconds` and the least recently used are evicted
+    beyond `max_entries`.
+    """
+
+    def __init__(self, provider: BaseLLMProvider, embed_query: Callable[[str], List[float]],
+                 similarity_threshold: float = 0.95, ttl_seconds: float = 3600, max_entries: int = 1024):
+        """
+        Initialize the cache.
+
+        Args:
+            provider: Provider answering cache misses
+            embed_query: Embeds a question for similarity matching
+            similarity_threshold: Minimum cosine similarity of a cached question
+            ttl_seconds: Seconds an answer stays valid
+            max_entries: Number of answers kept
+        """
+        self.provider = provider
+        self.embed_query = embed_query
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        # entry id -> (context hash, normalized question, unit question vector, answer, created at)
+        self._entries = OrderedDict()
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(question: str) -> str:
+        return " ".join(question.split()).casefold()
+
+    @staticmethod
+    def _hash_context(context: str) -> str:
+        return hashlib.sha256(context.encode('utf-8', errors='surrogatepass')).hexdigest()
+
+    def _unit_vector(self, question: str) -> np.ndarray:
+        vector = np.asarray(self.embed_query(question), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _expire(self, now: float) -> None:
+        expired = [entry_id for entry_id, entry in self._entries.items() if now - entry[4] > self.ttl_seconds]
+        for entry_id in expired:
+            del self._entries[entry_id]
+
+    def _lookup(self, context_hash: str, question: str, vector: Optional[np.ndarray]) -> Optional[str]:
+        """
+        Return the best cached answer for the context, matching text first
+        and embeddings if given. Counts a hit when an answer is found and a
+        miss when none is found by embeddings, the last lookup of a question.
+        """
+        with self._lock:
+            self._expire(time.time())
+            best_id, best_similarity = None, self.similarity_threshold
+            for entry_id, (entry_hash, entry_question, entry_vector, _, _) in self._entries.items():
+                if entry_hash != context_hash:
+                    continue
+                if entry_question == question:
+                    best_id = entry_id
+                    break
+                if vector is not None:
+                    similarity = float(np.dot(vector, entry_vector))
+                    if similarity >= best_similarity:
+                        best_id, best_similarity = entry_id, similarity
+            if best_id is None:
+                if vector is not None:
+                    self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(best_id)
+            return self._entries[best_id][3]
+
+    def _find(self, question: str, context: str) -> Tuple[Optional[str], str, str, Optional[np.ndarray]]:
+        """Look a question up, returning the answer (if any) and the keys to store a new one under."""
+        context_hash = self._hash_context(context)
+        normalized = self._normalize(question)
+
+        # Identical questions are found without embedding anything
+        answer = self._lookup(context_hash, normalized, None)
+        vector = None
+        if answer is None:
+            vector = self._unit_vector(question)
+            answer = self._lookup(context_hash, normalized, vector)
+        return answer, context_hash, normalized, vector
+
+    def _store(self, context_hash: str, question: str, vector: np.ndarray, answer: str) -> None:
+        with self._lock:
+            self._entries[self._next_id] = (context_hash, question, vector, answer, time.time())
+            self._next_id += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def ask_question(self, question: str, context: str) -> str:
+        """
+        Answer from the cache if a similar question was asked with the same
+        context. Provider failures (LLMProviderError) propagate and leave
+        nothing cached.
+        """
+        answer, context_hash, normalized, vector = self._find(question, context)
+        if answer is None:
+            answer = self.provider.ask_question(question, context)
+            self._store(context_hash, normalized, vector, answer)
+        return answer
+
+    def ask_question_stream(self, question: str, context: str) -> Iterator[str]:
+        """Yield a cached answer at once, or stream a new one and cache it when complete."""
+        answer, context_hash, normalized, vector = self._find(question, context)
+        if answer is not None:
+            yield answer
+            return
+
+        tokens = []
+        for token in self.provider.ask_question_stream(question, context):
+            tokens.append(token)
+            yield token
+        self._store(context_hash, normalized, vector, "".join(tokens).strip())
+
+    @property
+    def context_window(self) -> int:
+        return self.provider.context_window
+
+    @property
+    def template(self) -> str:
+        return self.provider.template
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit and miss counts, hit rate and current size."""
+        with self._lock:
+            hits, misses, entries = self.hits, self.misses, len(self._entries)
+        lookups = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "entries": entries
+        }
+
+    def get_config(self) -> Dict[str, Any]:
+        config = dict(self.provider.get_config())
+        config["answer_cache"] = {
+            "similarity_threshold": self.similarity_threshold,
+            "ttl_seconds": self.ttl_seconds,
+            "max_entries": self.max_entries
+        }
+        return config
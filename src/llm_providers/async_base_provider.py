@@ -0,0 +1,132 @@
+import asyncio
+from abc import ABC, abstractmethod
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, TypeVar
+
+import httpx
+
+T = TypeVar("T")
+
+# Failures worth retrying: the request may succeed on another attempt
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+def is_retryable(error: Exception) -> bool:
+    """Check whether a failed request should be retried."""
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code in RETRYABLE_STATUS_CODES
+    return isinstance(error, httpx.TransportError)
+
+
+class AsyncBaseLLMProvider(ABC):
+    """
+    Abstract base class for asyncio LLM providers.
+
+    Each provider keeps one pooled HTTP client with keep-alive connections
+    and lets at most `max_concurrency` requests run at once; callers beyond
+    that wait for a slot instead of opening more connections.
+    """
+
+    # Tokens the model accepts per request, prompt and answer together
+    context_window = 4096
+
+    # Prompt sent around the context, counted against the context window
+    template = ""
+
+    def __init__(self, max_concurrency: int = 4, timeout: float = 120.0, max_retries: int = 2,
+                 retry_backoff: float = 0.5):
+        """
+        Initialize the shared request settings.
+
+        Args:
+            max_concurrency: Maximum number of requests in flight
+            timeout: Seconds to wait for a response (or for each streamed piece)
+            max_retries: Retries of a request failing with a transient error
+            retry_backoff: Seconds before the first retry, doubled on each one
+        """
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    def _create_client(self, **kwargs) -> httpx.AsyncClient:
+        """Create the pooled HTTP client sized for the concurrency limit."""
+        return httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=self.max_concurrency,
+                                max_keepalive_connections=self.max_concurrency),
+            timeout=httpx.Timeout(self.timeout, connect=min(self.timeout, 10.0)),
+            **kwargs
+        )
+
+    async def _with_retries(self, request: Callable[[], Awaitable[T]]) -> T:
+        """Run a request inside the concurrency limit, retrying transient failures."""
+        async with self._semaphore:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    return await request()
+                except Exception as e:
+                    if attempt == self.max_retries or not is_retryable(e):
+                        raise
+                await asyncio.sleep(self.retry_backoff * 2 ** attempt)
+
+    async def _stream_with_retries(self, stream: Callable[[], AsyncIterator[str]]) -> AsyncIterator[str]:
+        """Run a streaming request inside the concurrency limit, retrying until the first piece arrives."""
+        async with self._semaphore:
+            for attempt in range(self.max_retries + 1):
+                started = False
+                try:
+                    async for piece in stream():
+                        started = True
+                        yield piece
+                    return
+                except Exception as e:
+                    # Once part of the answer was yielded a retry would repeat it
+                    if started or attempt == self.max_retries or not is_retryable(e):
+                        raise
+                await asyncio.sleep(self.retry_backoff * 2 ** attempt)
+
+    @abstractmethod
+    async def aask_question(self, question: str, context: str) -> str:
+        """
+        Ask a question using the context provided.
+
+        Args:
+            question (str): The question to ask
+            context (str): The context to use for answering the question
+
+        Returns:
+            str: The answer from the LLM
+
+        Raises:
+            LLMProviderError: If the LLM could not be reached or failed
+        """
+        pass
+
+    async def aask_question_stream(self, question: str, context: str) -> AsyncIterator[str]:
+        """
+        Ask a question and yield the answer in pieces as they are generated.
+        Providers that cannot stream inherit this default, which yields the
+        complete answer at once.
+        """
+        yield await self.aask_question(question, context)
+
+    @abstractmethod
+    def get_config(self) -> Dict[str, Any]:
+        """
+        Get the configuration for the provider.
+
+        Returns:
+            Dict[str, Any]: Configuration dictionary
+        """
+        pass
+
+    @abstractmethod
+    async def aclose(self) -> None:
+        """Close the pooled HTTP connections."""
+        pass
+
+    async def __aenter__(self) -> "AsyncBaseLLMProvider":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
@@ -0,0 +1,129 @@
+import json
+from typing import Any, AsyncIterator, Dict
+
+from langchain.prompts import PromptTemplate
+
+from .async_base_provider import AsyncBaseLLMProvider
+from .base_provider import LLMProviderError
+
+
+class AsyncOllamaProvider(AsyncBaseLLMProvider):
+    """Asyncio Ollama provider talking to the Ollama HTTP API over pooled connections."""
+
+    def __init__(self, model_name: str = "llama3.2:3b", base_url: str = "http://localhost:11434",
+                 max_concurrency: int = 4, timeout: float = 120.0, max_retries: int = 2,
+                 context_window: int = 2048):
+        """
+        Initialize async Ollama provider.
+
+        Args:
+            model_name (str): Name of the Ollama model to use
+            base_url (str): Base URL for Ollama API
+            max_concurrency (int): Maximum number of requests in flight
+            timeout (float): Seconds to wait for a response
+            max_retries (int): Retries of requests failing with a transient error
+            context_window (int): Context size requested from Ollama (num_ctx)
+        """
+        super().__init__(max_concurrency=max_concurrency, timeout=timeout, max_retries=max_retries)
+        self.model_name = model_name
+        self.base_url = base_url
+        self.context_window = context_window
+        self.client = self._create_client(base_url=base_url)
+
+        # Define a template that instructs the model to focus on code-related questions
+        self.template = """You are a helpful coding assistant. Use the following context to answer the question.
+        If you cannot answer the question based on the context, say so.
+        Context: {context}
+
+        Question: {question}
+
+        Answer: """
+
+        self.prompt = PromptTemplate(
+            template=self.template,
+            input_variables=["context", "question"]
+        )
+
+    def _payload(self, question: str, context: str, stream: bool) -> Dict[str, Any]:
+        return {
+            "model": self.model_name,
+            "prompt": self.prompt.format(context=context, question=question),
+            "stream": stream,
+            "options": {"temperature": 0, "num_ctx": self.context_window}
+        }
+
+    async def aask_question(self, question: str, context: str) -> str:
+        """
+        Ask a question using the provided context.
+
+        Args:
+            question (str): The question to ask
+            context (str): The context to use for answering the question
+
+        Returns:
+            str: The answer from the LLM
+        """
+        async def generate() -> str:
+            response = await self.client.post("/api/generate", json=self._payload(question, context, False))
+            response.raise_for_status()
+            return response.json()["response"]
+
+        try:
+            return (await self._with_retries(generate)).strip()
+        except Exception as e:
+            raise LLMProviderError(f"Error getting response from Ollama: {str(e)}") from e
+
+    async def aask_question_stream(self, question: str, context: str) -> AsyncIterator[str]:
+        """
+        Ask a question and yield the answer as tokens arrive from Ollama.
+
+        Args:
+            question (str): The question to ask
+            context (str): The context to use for answering the question
+
+        Returns:
+            AsyncIterator[str]: Answer tokens, in order
+        """
+        async def generate() -> AsyncIterator[str]:
+            # Ollama streams one JSON object per line, the last one marked
+            # "done"; the body is read to its end so the connection is reused
+            async with self.client.stream("POST", "/api/generate",
+                                          json=self._payload(question, context, True)) as response:
+                if response.is_error:
+                    # Read the error body too, or the connection is dropped instead of reused
+                    await response.aread()
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    message = json.loads(line)
+                    if message.get("error"):
+                        raise RuntimeError(message["error"])
+                    if message.get("response"):
+                        yield message["response"]
+
+        try:
+            async for token in self._stream_with_retries(generate):
+                yield token
+        except Exception as e:
+            raise LLMProviderError(f"Error getting response from Ollama: {str(e)}") from e
+
+    def get_config(self) -> Dict[str, Any]:
+        """
+        Get the configuration for the provider.
+
+        Returns:
+            Dict[str, Any]: Configuration dictionary
+        """
+        return {
+            "provider": "ollama",
+            "model_name": self.model_name,
+            "base_url": self.base_url,
+            "context_window": self.context_window,
+            "max_concurrency": self.max_concurrency,
+            "timeout": self.timeout,
+            "max_retries": self.max_retries
+        }
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
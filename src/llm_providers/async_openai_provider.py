@@ -0,0 +1,84 @@
+from typing import Any, AsyncIterator, Dict, Optional
+
+import openai
+from langchain.prompts import PromptTemplate
+
+from .async_base_provider import AsyncBaseLLMProvider
+from .base_provider import LLMProviderError
+from .openai_provider import CONTEXT_WINDOWS
+
+
+class AsyncOpenAIProvider(AsyncBaseLLMProvider):
+    """Asyncio OpenAI provider sharing one pooled HTTP client across requests."""
+
+    def __init__(self, api_key: str, model_name: str = "gpt-4-turbo", max_concurrency: int = 4,
+                 timeout: float = 120.0, max_retries: int = 2, context_window: Optional[int] = None):
+        super().__init__(max_concurrency=max_concurrency, timeout=timeout, max_retries=max_retries)
+        self.model_name = model_name
+        self.context_window = context_window or CONTEXT_WINDOWS.get(model_name, 8192)
+        # The OpenAI client retries transient failures itself, with backoff
+        self.client = openai.AsyncOpenAI(
+            api_key=api_key,
+            max_retries=max_retries,
+            timeout=timeout,
+            http_client=self._create_client()
+        )
+
+        self.template = """You are a helpful coding assistant. Use the following context to answer the question.
+        If you cannot answer the question based on the context, say so.
+        Context: {context}
+
+        Question: {question}
+
+        Answer: """
+
+        self.prompt = PromptTemplate(
+            template=self.template,
+            input_variables=["context", "question"]
+        )
+
+    def _messages(self, question: str, context: str):
+        return [{"role": "system", "content": self.prompt.format(context=context, question=question)}]
+
+    async def aask_question(self, question: str, context: str) -> str:
+        """Ask a question and get the complete response as a string."""
+        try:
+            async with self._semaphore:
+                response = await self.client.chat.completions.create(
+                    model=self.model_name,
+                    messages=self._messages(question, context),
+                    temperature=0
+                )
+            return response.choices[0].message.content.strip()
+        except Exception as e:
+            raise LLMProviderError(f"Error getting response from OpenAI: {str(e)}") from e
+
+    async def aask_question_stream(self, question: str, context: str) -> AsyncIterator[str]:
+        """Ask a question and yield each token as it arrives."""
+        try:
+            async with self._semaphore:
+                stream = await self.client.chat.completions.create(
+                    model=self.model_name,
+                    messages=self._messages(question, context),
+                    temperature=0,
+                    stream=True
+                )
+                async for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content is not None:
+                        yield chunk.choices[0].delta.content
+        except Exception as e:
+            raise LLMProviderError(f"Error getting response from OpenAI: {str(e)}") from e
+
+    def get_config(self) -> Dict[str, Any]:
+        return {
+            "provider": "openai",
+            "api_key": self.client.api_key,
+            "model_name": self.model_name,
+            "context_window": self.context_window,
+            "max_concurrency": self.max_concurrency,
+            "timeout": self.timeout,
+            "max_retries": self.max_retries
+        }
+
+    async def aclose(self) -> None:
+        await self.client.close()
@@ -1,8 +1,19 @@
 from abc import ABC, abstractmethod
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Iterator, Optional
+
+
+class LLMProviderError(RuntimeError):
+    """Raised by providers when the LLM could not produce an answer."""
+
 
 class BaseLLMProvider(ABC):
     """Abstract base class for LLM providers."""
+
+    # Tokens the model accepts per request, prompt and answer together
+    context_window = 4096
+
+    # Prompt sent around the context, counted against the context window
+    template = ""
     
     @abstractmethod
     def ask_question(self, question: str, context: str) -> str:
@@ -15,8 +26,30 @@ class BaseLLMProvider(ABC):
             
         Returns:
             str: The answer from the LLM
+
+        Raises:
+            LLMProviderError: If the LLM could not be reached or failed
         """
         pass
+
+    def ask_question_stream(self, question: str, context: str) -> Iterator[str]:
+        """
+        Ask a question and yield the answer in pieces as they are generated.
+
+        Providers that cannot stream inherit this default, which yields the
+        complete answer at once.
+
+        Args:
+            question (str): The question to ask
+            context (str): The context to use for answering the question
+
+        Returns:
+            Iterator[str]: Pieces of the answer, in order
+
+        Raises:
+            LLMProviderError: If the LLM failed, possibly after some pieces
+        """
+        yield self.ask_question(question, context)
     
     @abstractmethod
     def get_config(self) -> Dict[str, Any]:
@@ -1,21 +1,24 @@
-from typing import Dict, Any
+from typing import Dict, Any, Iterator
 from langchain_ollama import OllamaLLM
 from langchain.prompts import PromptTemplate
-from .base_provider import BaseLLMProvider
+from .base_provider import BaseLLMProvider, LLMProviderError
 
 class OllamaProvider(BaseLLMProvider):
     """Ollama LLM provider implementation."""
-    def __init__(self, model_name: str = "llama3.2:3b", base_url: str = "http://localhost:11434"):
+    def __init__(self, model_name: str = "llama3.2:3b", base_url: str = "http://localhost:11434",
+                 context_window: int = 2048):
         """
         Initialize Ollama provider.
         
         Args:
             model_name (str): Name of the Ollama model to use
             base_url (str): Base URL for Ollama API
+            context_window (int): Context size requested from Ollama (num_ctx)
         """
         self.model_name = model_name
         self.base_url = base_url
-        self.llm = OllamaLLM(model=model_name, base_url=base_url, temperature=0)
+        self.context_window = context_window
+        self.llm = OllamaLLM(model=model_name, base_url=base_url, temperature=0, num_ctx=context_window)
         
         # Define a template that instructs the model to focus on code-related questions
         self.template = """You are a helpful coding assistant. Use the following context to answer the question. 
@@ -47,7 +50,25 @@ class OllamaProvider(BaseLLMProvider):
             response = self.llm.invoke(prompt_text)
             return response.strip()
         except Exception as e:
-            return f"Error getting response from Ollama: {str(e)}"
+            raise LLMProviderError(f"Error getting response from Ollama: {str(e)}") from e
+
+    def ask_question_stream(self, question: str, context: str) -> Iterator[str]:
+        """
+        Ask a question and yield the answer as tokens arrive from Ollama.
+        
+        Args:
+            question (str): The question to ask
+            context (str): The context to use for answering the question
+            
+        Returns:
+            Iterator[str]: Answer tokens, in order
+        """
+        try:
+            prompt_text = self.prompt.format(context=context, question=question)
+            for token in self.llm.stream(prompt_text):
+                yield token
+        except Exception as e:
+            raise LLMProviderError(f"Error getting response from Ollama: {str(e)}") from e
     
     def get_config(self) -> Dict[str, Any]:
         """
@@ -59,5 +80,6 @@ class OllamaProvider(BaseLLMProvider):
         return {
             "provider": "ollama",
             "model_name": self.model_name,
-            "base_url": self.base_url
+            "base_url": self.base_url,
+            "context_window": self.context_window
         }
@@ -1,11 +1,22 @@
-from typing import Dict, Any, Generator
+from typing import Dict, Any, Generator, Optional
 import openai
 from langchain.prompts import PromptTemplate
-from .base_provider import BaseLLMProvider
+from .base_provider import BaseLLMProvider, LLMProviderError
+
+# Context windows of common models; others are assumed to take 8k tokens
+CONTEXT_WINDOWS = {
+    "gpt-4-turbo": 128000,
+    "gpt-4o": 128000,
+    "gpt-4o-mini": 128000,
+    "gpt-4": 8192,
+    "gpt-3.5-turbo": 16385,
+}
+
 
 class OpenAIProvider(BaseLLMProvider):
-    def __init__(self, api_key: str, model_name: str = "gpt-4-turbo"):
+    def __init__(self, api_key: str, model_name: str = "gpt-4-turbo", context_window: Optional[int] = None):
         self.model_name = model_name
+        self.context_window = context_window or CONTEXT_WINDOWS.get(model_name, 8192)
         self.client = openai.OpenAI(api_key=api_key)
         
         self.template = """You are a helpful coding assistant. Use the following context to answer the question. 
@@ -37,7 +48,7 @@ class OpenAIProvider(BaseLLMProvider):
             )
             return response.choices[0].message.content.strip()
         except Exception as e:
-            return f"Error getting response from OpenAI: {str(e)}"
+            raise LLMProviderError(f"Error getting response from OpenAI: {str(e)}") from e
     
     def ask_question_stream(self, question: str, context: str) -> Generator[str, None, None]:
         """
@@ -60,11 +71,12 @@ class OpenAIProvider(BaseLLMProvider):
                     yield chunk.choices[0].delta.content
                     
         except Exception as e:
-            yield f"Error getting response from OpenAI: {str(e)}"
+            raise LLMProviderError(f"Error getting response from OpenAI: {str(e)}") from e
     
     def get_config(self) -> Dict[str, Any]:
         return {
             "provider": "openai",
             "api_key": self.client.api_key,
-            "model_name": self.model_name
+            "model_name": self.model_name,
+            "context_window": self.context_window
         }
@@ -1,7 +1,8 @@
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, TYPE_CHECKING
 from .base_provider import BaseLLMProvider
-from .ollama_provider import OllamaProvider
-from .openai_provider import OpenAIProvider
+
+if TYPE_CHECKING:
+    from .async_base_provider import AsyncBaseLLMProvider
 
 class LLMProviderFactory:
     """Factory class for creating LLM providers."""
@@ -12,7 +13,8 @@ class LLMProviderFactory:
         Create an LLM provider instance.
         
         Args:
-            provider_type (str): Type of provider ('ollama', 'openai', etc.)
+            provider_type (str): Type of provider ('ollama', 'openai', or 'stub'
+                for offline benchmarks and tests)
             config (Optional[Dict[str, Any]]): Provider configuration
             
         Returns:
@@ -23,16 +25,67 @@ class LLMProviderFactory:
         """
         config = config or {}
         
+        # Providers are imported here so only the selected client library is loaded
+        if provider_type.lower() == 'ollama':
+            from .ollama_provider import OllamaProvider
+            model_name = config.get('model_name', 'llama3.2:3b')
+            base_url = config.get('base_url', 'http://localhost:11434')
+            context_window = config.get('context_window', 2048)
+            return OllamaProvider(model_name=model_name, base_url=base_url, context_window=context_window)
+            
+        elif provider_type.lower() == 'openai':
+            from .openai_provider import OpenAIProvider
+            api_key = config.get('api_key')
+            if not api_key:
+                raise ValueError("OpenAI provider requires an API key")
+            model_name = config.get('model_name', 'gpt-4-turbo')
+            return OpenAIProvider(api_key=api_key, model_name=model_name,
+                                  context_window=config.get('context_window'))
+
+        elif provider_type.lower() == 'stub':
+            from .stub_provider import StubProvider
+            settings = {key: config[key] for key in ('latency_ms', 'tokens_per_second', 'answer_tokens',
+                                                     'context_window') if key in config}
+            return StubProvider(**settings)
+            
+        raise ValueError(f"Unsupported provider type: {provider_type}")
+
+    @staticmethod
+    def create_async_provider(provider_type: str, config: Optional[Dict[str, Any]] = None) -> "AsyncBaseLLMProvider":
+        """
+        Create an asyncio LLM provider instance.
+        
+        Accepts the same configuration as create_provider, plus optional
+        'max_concurrency', 'timeout' and 'max_retries'. Close the provider
+        with `await provider.aclose()` (or use it as an async context
+        manager) to release its pooled connections.
+        
+        Args:
+            provider_type (str): Type of provider ('ollama', 'openai', etc.)
+            config (Optional[Dict[str, Any]]): Provider configuration
+            
+        Returns:
+            AsyncBaseLLMProvider: An instance of the requested provider
+            
+        Raises:
+            ValueError: If provider_type is not supported
+        """
+        config = config or {}
+        limits = {key: config[key] for key in ('max_concurrency', 'timeout', 'max_retries', 'context_window')
+                  if key in config}
+        
         if provider_type.lower() == 'ollama':
+            from .async_ollama_provider import AsyncOllamaProvider
             model_name = config.get('model_name', 'llama3.2:3b')
             base_url = config.get('base_url', 'http://localhost:11434')
-            return OllamaProvider(model_name=model_name, base_url=base_url)
+            return AsyncOllamaProvider(model_name=model_name, base_url=base_url, **limits)
             
         elif provider_type.lower() == 'openai':
+            from .async_openai_provider import AsyncOpenAIProvider
             api_key = config.get('api_key')
             if not api_key:
                 raise ValueError("OpenAI provider requires an API key")
             model_name = config.get('model_name', 'gpt-4-turbo')
-            return OpenAIProvider(api_key=api_key, model_name=model_name)
+            return AsyncOpenAIProvider(api_key=api_key, model_name=model_name, **limits)
             
         raise ValueError(f"Unsupported provider type: {provider_type}")
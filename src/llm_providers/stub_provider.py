@@ -0,0 +1,60 @@
+import re
+import time
+from typing import Any, Dict, Iterator
+
+from .base_provider import BaseLLMProvider
+
+
+class StubProvider(BaseLLMProvider):
+    """
+    Offline provider for benchmarks and tests.
+
+    Answers without any model or network: the answer names the files in
+    the context, after a fixed latency and at a fixed token rate, so that
+    retrieval and context building can be measured on their own.
+    """
+
+    def __init__(self, latency_ms: float = 0.0, tokens_per_second: float = 0.0,
+                 answer_tokens: int = 32, context_window: int = 4096):
+        """
+        Initialize stub provider.
+
+        Args:
+            latency_ms (float): Delay before the first token
+            tokens_per_second (float): Rate of the following tokens (0 for no delay)
+            answer_tokens (int): Number of tokens in each answer
+            context_window (int): Context window reported to the context builder
+        """
+        self.latency_ms = latency_ms
+        self.tokens_per_second = tokens_per_second
+        self.answer_tokens = answer_tokens
+        self.context_window = context_window
+        self.template = "Context: {context}\n\nQuestion: {question}\n\nAnswer: "
+
+    def _tokens(self, question: str, context: str) -> Iterator[str]:
+        files = re.findall(r"^File: (.+)$", context, re.MULTILINE)
+        words = f"Stub answer to '{question}' from {len(files)} files: {', '.join(files)}".split()
+        words = (words * (self.answer_tokens // max(len(words), 1) + 1))[:self.answer_tokens]
+
+        time.sleep(self.latency_ms / 1000)
+        for i, word in enumerate(words):
+            if i and self.tokens_per_second:
+                time.sleep(1 / self.tokens_per_second)
+            yield word if i == 0 else " " + word
+
+    def ask_question(self, question: str, context: str) -> str:
+        """Return the stub answer once it is fully "generated"."""
+        return "".join(self._tokens(question, context))
+
+    def ask_question_stream(self, question: str, context: str) -> Iterator[str]:
+        """Yield the stub answer token by token."""
+        yield from self._tokens(question, context)
+
+    def get_config(self) -> Dict[str, Any]:
+        return {
+            "provider": "stub",
+            "latency_ms": self.latency_ms,
+            "tokens_per_second": self.tokens_per_second,
+            "answer_tokens": self.answer_tokens,
+            "context_window": self.context_window
+        }
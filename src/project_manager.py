@@ -1,91 +1,318 @@
 import os
-from typing import List, Dict, Optional
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, List, Dict, Optional, Iterator, Set, Tuple, TYPE_CHECKING
 import json
 from datetime import datetime
 
-from utils.file_processor import FileProcessor
-from vector_store.vector_store_manager import VectorStoreManager
-from llm_providers.provider_factory import LLMProviderFactory
+from utils import instrumentation
+from utils.file_lock import FileLock
+
+# langchain, FAISS, torch and python-magic take seconds to import, so they
+# are only loaded by the methods that need them; metadata-only commands
+# such as `list` and `delete` never pay for them
+if TYPE_CHECKING:
+    from utils.file_processor import FileProcessor
+    from vector_store.vector_store_manager import VectorStoreManager
+    from vector_store.index_manifest import IndexManifest
+    from utils.git_changes import GitState
+    from vector_store.embedding_engine import EmbeddingEngine
+    from llm_providers.base_provider import BaseLLMProvider
+    from llm_providers.answer_cache import CachedLLMProvider
+    from langchain.docstore.document import Document
+
+class ProjectNotFoundError(KeyError):
+    """Raised by the query methods for a project that does not exist."""
+
+    def __str__(self) -> str:
+        # KeyError would quote the message like a missing key
+        return str(self.args[0]) if self.args else ""
+
 
 class ProjectManager:
-    def __init__(self, projects_dir: str = "projects", llm_config: Optional[Dict] = None):
-        """Initialize the project manager."""
+    def __init__(self, projects_dir: str = "projects", llm_config: Optional[Dict] = None,
+                 embedding_config: Optional[Dict] = None, max_open_projects: int = 8,
+                 query_cache_config: Optional[Dict] = None,
+                 answer_cache_config: Optional[Dict] = None,
+                 max_context_tokens: Optional[int] = None):
+        """
+        Initialize the project manager.
+
+        Args:
+            projects_dir: Directory holding projects.json
+            llm_config: LLM provider name and configuration
+            embedding_config: Optional "batch_size" and "workers" for the
+                embedding engine used when indexing
+            max_open_projects: Number of project indexes kept loaded for
+                searching, least recently used first out
+            query_cache_config: Optional "size" (0 disables) and "persist"
+                settings of each open project's query result cache
+            answer_cache_config: Optional "enabled" (default False),
+                "similarity_threshold", "ttl_seconds" and "max_entries" of
+                the semantic answer cache in front of the LLM provider
+            max_context_tokens: Cap on the tokens of retrieved code sent to
+                the LLM, on top of the limit set by the model's context window
+        """
         self.projects_dir = projects_dir
+        self.embedding_config = embedding_config or {}
+        self.max_open_projects = max_open_projects
+        self.query_cache_config = query_cache_config or {}
+        self.answer_cache_config = answer_cache_config or {}
+        self.max_context_tokens = max_context_tokens
+
+        self._query_embedding_engine = None
+        self._open_vector_stores = OrderedDict()
+        self._open_lock = threading.Lock()
+        # Serializes the lazy creation of the engine, provider and answer
+        # cache so concurrent first requests create each of them once
+        self._init_lock = threading.RLock()
         self.projects_file = os.path.join(projects_dir, "projects.json")
+        self._projects_lock = FileLock(self.projects_file + ".lock")
         self.initialize_projects_directory()
         
-        # Initialize LLM provider with default to Ollama if no config provided
+        # LLM provider defaults to Ollama if no config provided; it is
+        # created on first use
         self.llm_config = llm_config or {"provider": "ollama"}
-        self.llm_provider = LLMProviderFactory.create_provider(
-            self.llm_config["provider"],
-            self.llm_config.get("config", {})
-        )
+        self._llm_provider = None
+        self._answer_cache = None
+
+    @property
+    def llm_provider(self) -> "BaseLLMProvider":
+        """LLM provider, created on first use."""
+        if self._llm_provider is None:
+            with self._init_lock:
+                if self._llm_provider is None:
+                    from llm_providers.provider_factory import LLMProviderFactory
+                    self._llm_provider = LLMProviderFactory.create_provider(
+                        self.llm_config["provider"],
+                        self.llm_config.get("config", {})
+                    )
+        return self._llm_provider
+
+    @property
+    def answer_cache(self) -> Optional["CachedLLMProvider"]:
+        """Semantic answer cache wrapping the LLM provider, or None if disabled."""
+        if self._answer_cache is None and self.answer_cache_config.get("enabled", False):
+            with self._init_lock:
+                if self._answer_cache is None:
+                    from llm_providers.answer_cache import CachedLLMProvider
+                    settings = {key: value for key, value in self.answer_cache_config.items()
+                                if key != "enabled" and value is not None}
+                    self._answer_cache = CachedLLMProvider(
+                        self.llm_provider,
+                        self.query_embedding_engine.embed_query,
+                        **settings
+                    )
+        return self._answer_cache
+
+    def answer_cache_stats(self) -> Optional[Dict]:
+        """Return the answer cache statistics, or None if it was not used."""
+        return self._answer_cache.stats() if self._answer_cache is not None else None
+
+    @property
+    def query_embedding_engine(self) -> "EmbeddingEngine":
+        """Query embedding engine shared by every open project, created on first use."""
+        if self._query_embedding_engine is None:
+            with self._init_lock:
+                if self._query_embedding_engine is None:
+                    from vector_store.embedding_engine import EmbeddingEngine
+                    from vector_store.vector_store_manager import VectorStoreManager
+                    self._query_embedding_engine = EmbeddingEngine(VectorStoreManager.EMBEDDING_MODEL)
+        return self._query_embedding_engine
 
     def initialize_projects_directory(self) -> None:
         """Create projects directory and projects.json if they don't exist."""
         os.makedirs(self.projects_dir, exist_ok=True)
         if not os.path.exists(self.projects_file):
-            self._save_projects({})
+            with self._projects_lock:
+                if not os.path.exists(self.projects_file):
+                    self._save_projects({})
 
-    def _load_projects(self) -> Dict:
-        """Load projects from projects.json."""
+    def _load_projects(self, include_reserved: bool = False) -> Dict:
+        """
+        Load projects from projects.json. Names reserved by a create that
+        has not finished (see create_project) are left out unless
+        `include_reserved` is set.
+        """
         try:
             with open(self.projects_file, 'r') as f:
-                return json.load(f)
+                projects = json.load(f)
         except FileNotFoundError:
             return {}
+        if include_reserved:
+            return projects
+        return {name: metadata for name, metadata in projects.items() if "creating" not in metadata}
 
     def _save_projects(self, projects: Dict) -> None:
-        """Save projects to projects.json."""
-        with open(self.projects_file, 'w') as f:
-            json.dump(projects, f, indent=4)
+        """
+        Save projects to projects.json. The file is replaced in one step, so
+        readers see either the old or the new version, never part of one.
+        """
+        fd, temp_path = tempfile.mkstemp(dir=self.projects_dir, prefix=".projects.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(projects, f, indent=4)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.projects_file)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    @contextmanager
+    def _modify_projects(self) -> Iterator[Dict]:
+        """
+        Load projects.json to change it, saving it when the block exits
+        without an error. Other processes' changes are not lost because
+        the file is locked from the load to the save.
+        """
+        with self._projects_lock:
+            projects = self._load_projects(include_reserved=True)
+            yield projects
+            self._save_projects(projects)
 
-    def create_project(self, name: str, repository_path: str) -> bool:
+    def _get_vector_store(self, name: str) -> "VectorStoreManager":
+        """Return the resident vector store of a project, opening it if needed."""
+        from vector_store.vector_store_manager import VectorStoreManager
+        engine = self.query_embedding_engine
+
+        evicted = []
+        with self._open_lock:
+            vector_store = self._open_vector_stores.pop(name, None)
+            if vector_store is None:
+                cache_size = self.query_cache_config.get("size")
+                vector_store = VectorStoreManager(
+                    name,
+                    embedding_engine=engine,
+                    query_cache_size=1024 if cache_size is None else cache_size,
+                    persist_query_cache=bool(self.query_cache_config.get("persist"))
+                )
+            self._open_vector_stores[name] = vector_store
+            while len(self._open_vector_stores) > self.max_open_projects:
+                evicted.append(self._open_vector_stores.popitem(last=False)[1])
+        # Closed outside the lock, since each waits for its searches in progress
+        for store in evicted:
+            store.release()
+        return vector_store
+
+    def _close_vector_store(self, name: str) -> None:
+        """Drop a project's resident vector store, closing it once its searches finish."""
+        with self._open_lock:
+            vector_store = self._open_vector_stores.pop(name, None)
+        if vector_store is not None:
+            vector_store.release()
+
+    def open_projects(self) -> List[str]:
+        """Return the names of projects whose indexes are resident, oldest first."""
+        with self._open_lock:
+            return list(self._open_vector_stores)
+
+    def _create_indexing_vector_store(self, name: str) -> "VectorStoreManager":
+        """Create a vector store manager configured for indexing."""
+        from vector_store.vector_store_manager import VectorStoreManager
+        return VectorStoreManager(
+            name,
+            embedding_batch_size=self.embedding_config.get("batch_size") or 32,
+            embedding_workers=self.embedding_config.get("workers") or 0
+        )
+
+    def create_project(self, name: str, repository_path: str, workers: Optional[int] = None,
+                       index_config: Optional[Dict] = None) -> bool:
         """
         Create a new project and process its repository.
+        `workers` sets the number of file reading threads and `index_config`
+        the FAISS index type and parameters (see IndexConfig).
         Returns True if successful, False otherwise.
         """
         if not os.path.exists(repository_path):
             print(f"Error: Repository path '{repository_path}' does not exist.")
             return False
 
-        projects = self._load_projects()
-        if name in projects:
-            print(f"Error: Project '{name}' already exists.")
+        # Checked and reserved in one step, so concurrent creates of a name cannot both build it
+        reservation = uuid.uuid4().hex
+        with self._modify_projects() as projects:
+            existing = projects.get(name)
+            if existing is None:
+                projects[name] = {"repository_path": repository_path, "creating": reservation}
+        if existing is not None:
+            if "creating" in existing:
+                print(f"Error: Project '{name}' is being created (delete it if that run was interrupted).")
+            else:
+                print(f"Error: Project '{name}' already exists.")
             return False
 
+        created = False
         try:
-            # Process repository files
-            file_processor = FileProcessor()
-            documents = file_processor.process_directory(repository_path)
-
-            if not documents:
-                print(f"Warning: No valid text files found in '{repository_path}'")
-                return False
-
-            # Create and populate vector store
-            vector_store = VectorStoreManager(name)
-            vector_store.create_or_update_vector_store(documents)
-
-            # Save project metadata
-            projects[name] = {
-                "repository_path": repository_path,
-                "created_at": datetime.now().isoformat(),
-                "last_updated": datetime.now().isoformat(),
-                "document_count": len(documents)
-            }
-            self._save_projects(projects)
-
-            print(f"Successfully created project '{name}' with {len(documents)} documents.")
+            from utils.file_processor import FileProcessor
+            from utils.git_changes import git_state
+            from vector_store.ann_index import IndexConfig
+
+            # Taken before the scan, so changes made while indexing show up in the next update
+            git = git_state(repository_path)
+
+            # Stream repository files straight into a new vector store
+            file_processor = FileProcessor(max_workers=workers)
+            vector_store = self._create_indexing_vector_store(name)
+            # Held until the metadata is saved, so it describes the index that was published
+            with vector_store.write_lock():
+                try:
+                    with instrumentation.span("project.create", project=name):
+                        document_count = vector_store.create_or_update_vector_store(
+                            (document for _, document in file_processor.scan_directory(repository_path)),
+                            IndexConfig.from_dict(index_config or {})
+                        )
+                finally:
+                    vector_store.close()
+                print(file_processor.format_scan_stats())
+                print(vector_store.format_embedding_stats())
+
+                if not document_count:
+                    print(f"Warning: No valid text files found in '{repository_path}'")
+                    return False
+
+                # Save project metadata, replacing the reservation
+                with self._modify_projects() as projects:
+                    projects[name] = {
+                        "repository_path": repository_path,
+                        "created_at": datetime.now().isoformat(),
+                        "last_updated": datetime.now().isoformat(),
+                        "document_count": document_count
+                    }
+                    if git is not None:
+                        projects[name]["git"] = {"commit": git.commit, "dirty": sorted(git.dirty)}
+
+                created = True
+
+            print(f"Successfully created project '{name}' with {document_count} documents.")
             return True
 
         except Exception as e:
             print(f"Error creating project: {str(e)}")
             return False
+        finally:
+            if not created:
+                self._release_reservation(name, reservation)
+
+    def _release_reservation(self, name: str, reservation: str) -> None:
+        """Free a name reserved by create_project, unless it was deleted and reserved again since."""
+        with self._modify_projects() as projects:
+            if projects.get(name, {}).get("creating") == reservation:
+                del projects[name]
 
-    def update_project(self, name: str) -> bool:
+    def update_project(self, name: str, workers: Optional[int] = None) -> bool:
         """
-        Update an existing project by reprocessing its repository.
+        Update an existing project, re-indexing only the files that changed
+        since the last run. `workers` sets the number of file reading threads.
+
+        For git working trees the candidate files come from git (changes
+        since the indexed commit, uncommitted and untracked files) instead
+        of a walk of the whole tree; other directories, and repositories
+        whose indexed commit is gone, are walked.
         Returns True if successful, False otherwise.
         """
         projects = self._load_projects()
@@ -99,48 +326,234 @@ class ProjectManager:
             return False
 
         try:
-            # Process repository files
-            file_processor = FileProcessor()
-            documents = file_processor.process_directory(repository_path)
+            from utils.file_processor import FileProcessor
+            from utils.git_changes import GitState, changes_since, git_state
+
+            file_processor = FileProcessor(max_workers=workers)
+            vector_store = self._create_indexing_vector_store(name)
+            # Held from reading the manifest until the metadata is saved, so
+            # concurrent updates of the project apply one after the other
+            with vector_store.write_lock():
+                manifest = vector_store.load_manifest()
+                git = git_state(repository_path)
+
+                if manifest is None:
+                    # Indexes built before manifests existed need one full rebuild
+                    try:
+                        with instrumentation.span("project.update", project=name, rebuild=True):
+                            # Keeping the index type the store was created with
+                            document_count = vector_store.create_or_update_vector_store(
+                                (document for _, document in file_processor.scan_directory(repository_path)),
+                                vector_store.load_index_config()
+                            )
+                    finally:
+                        vector_store.close()
+                    print(file_processor.format_scan_stats())
+                    print(vector_store.format_embedding_stats())
+
+                    if not document_count:
+                        print(f"Warning: No valid text files found in '{repository_path}'")
+                        return False
+
+                    summary = f"{document_count} documents"
+                else:
+                    # Reloaded under the lock, in case an update finished while we waited for it
+                    indexed = self._load_projects().get(name, {}).get("git")
+                    changes = None
+                    if git is not None and indexed is not None:
+                        changes = changes_since(repository_path, GitState(indexed["commit"], set(indexed["dirty"])))
+                    if changes is not None:
+                        print(f"Checking {len(changes.changed)} files changed since commit {indexed['commit'][:12]} "
+                              f"and {len(changes.deleted)} deleted")
+                        documents, deleted_paths = self._collect_path_changes(
+                            file_processor, repository_path, manifest, changes.changed, changes.deleted)
+                    else:
+                        documents, deleted_paths = self._collect_changes(file_processor, repository_path, manifest)
+                    try:
+                        with instrumentation.span("project.update", project=name) as span:
+                            stats = vector_store.apply_changes(documents, deleted_paths)
+                            span.set(**stats)
+                    finally:
+                        vector_store.close()
+                    print(file_processor.format_scan_stats())
+                    print(vector_store.format_embedding_stats())
+                    document_count = len(vector_store.manifest.files)
+
+                    if not document_count:
+                        print(f"Warning: No valid text files found in '{repository_path}'")
+                        return False
+
+                    summary = (f"{document_count} documents ({stats['indexed']} re-indexed, "
+                               f"{stats['removed']} removed)")
+
+                self._record_update(name, document_count, git)
+            print(f"Successfully updated project '{name}' with {summary}.")
+            return True
 
-            if not documents:
-                print(f"Warning: No valid text files found in '{repository_path}'")
-                return False
+        except Exception as e:
+            print(f"Error updating project: {str(e)}")
+            return False
 
-            # Update vector store
-            vector_store = VectorStoreManager(name)
-            vector_store.create_or_update_vector_store(documents)
+    @staticmethod
+    def _collect_changes(file_processor: "FileProcessor", repository_path: str,
+                         manifest: "IndexManifest") -> Tuple[Iterator[Dict], Iterator[str]]:
+        """
+        Compare the repository against an index manifest.
+
+        Returns two lazy iterators: the documents that are new or possibly
+        modified, and the relative paths of indexed files that no longer
+        exist. The second one is only meaningful once the first is exhausted.
+        """
+        seen = set()
+
+        def changed_documents() -> Iterator[Dict]:
+            # Files whose size and mtime match the manifest are not read again
+            for relative_path, document in file_processor.scan_directory(repository_path, manifest.is_unchanged):
+                seen.add(relative_path)
+                if document is not None:
+                    yield document
+
+        def deleted_paths() -> Iterator[str]:
+            yield from manifest.paths() - seen
+
+        return changed_documents(), deleted_paths()
 
-            # Update project metadata
+    @staticmethod
+    def _collect_path_changes(file_processor: "FileProcessor", repository_path: str, manifest: "IndexManifest",
+                              changed: Set[str], deleted: Set[str] = frozenset()) -> Tuple[Iterator[Dict], Iterator[str]]:
+        """
+        Like _collect_changes, but only for the given paths (from git or a
+        file watcher). Changed files that are gone, excluded or no longer
+        text are deleted from the index along with the deleted paths; a
+        deleted directory removes every indexed file under it.
+        """
+        candidates = {path.replace("/", os.sep) for path in changed}
+        seen = set()
+
+        def changed_documents() -> Iterator[Dict]:
+            for relative_path, document in file_processor.scan_paths(repository_path, sorted(candidates),
+                                                                     manifest.is_unchanged):
+                seen.add(relative_path)
+                if document is not None:
+                    yield document
+
+        def deleted_paths() -> Iterator[str]:
+            gone = {path.replace("/", os.sep) for path in deleted} | (candidates - seen)
+            for path in manifest.paths():
+                parent = path
+                while parent and parent not in gone:
+                    parent = os.path.dirname(parent)
+                if parent:
+                    yield path
+
+        return changed_documents(), deleted_paths()
+
+    def _record_update(self, name: str, document_count: int, git: Optional["GitState"]) -> None:
+        """Store the metadata of an updated project: time, size and the indexed git commit."""
+        with self._modify_projects() as projects:
+            if name not in projects:
+                return
             projects[name]["last_updated"] = datetime.now().isoformat()
-            projects[name]["document_count"] = len(documents)
-            self._save_projects(projects)
+            projects[name]["document_count"] = document_count
+            if git is not None:
+                projects[name]["git"] = {"commit": git.commit, "dirty": sorted(git.dirty)}
+            else:
+                projects[name].pop("git", None)
+
+    def watch_project(self, name: str, workers: Optional[int] = None, debounce: float = 0.5,
+                      max_delay: float = 10.0, polling: bool = False, poll_interval: float = 2.0,
+                      stop: Optional[threading.Event] = None) -> bool:
+        """
+        Keep a project's index up to date as its files change, until
+        interrupted (or `stop` is set).
+
+        The project is first updated as by update_project. Then the
+        repository is watched with inotify, or by polling every
+        `poll_interval` seconds where inotify is unavailable or `polling` is
+        set; bursts of changes are coalesced until `debounce` seconds pass
+        without one (at most `max_delay` seconds) and applied as one
+        incremental update. Each update is saved like one by `update`, so
+        other processes (e.g. `serve`) keep querying and pick it up.
+        Returns True if watching ended normally, False on a setup error.
+        """
+        if not self.update_project(name, workers=workers):
+            return False
+        repository_path = self._load_projects()[name]["repository_path"]
 
-            print(f"Successfully updated project '{name}' with {len(documents)} documents.")
-            return True
+        from utils.file_processor import FileProcessor
+        from utils.file_watcher import create_watcher
+        from utils.git_changes import git_state
 
-        except Exception as e:
-            print(f"Error updating project: {str(e)}")
+        file_processor = FileProcessor(max_workers=workers)
+        path_filter = file_processor.path_filter.for_root(repository_path, file_processor.use_gitignore)
+        vector_store = self._create_indexing_vector_store(name)
+        try:
+            watcher = create_watcher(repository_path, path_filter, polling=polling, interval=poll_interval)
+        except OSError as e:
+            print(f"Error watching '{repository_path}': {str(e)}")
+            vector_store.close()
             return False
 
+        print(f"Watching '{repository_path}' with {watcher.kind} (Ctrl+C to stop)")
+        rescan = False
+        try:
+            for paths, needs_rescan in watcher.batches(debounce, max_delay, stop):
+                started = time.perf_counter()
+                rescan = rescan or needs_rescan
+                try:
+                    # An update run meanwhile (e.g. by `update`) published a
+                    # newer manifest, which load_manifest picks up
+                    with vector_store.write_lock():
+                        git = git_state(repository_path)
+                        manifest = vector_store.load_manifest()
+                        if rescan:
+                            documents, deleted_paths = self._collect_changes(file_processor, repository_path,
+                                                                             manifest)
+                        else:
+                            documents, deleted_paths = self._collect_path_changes(file_processor, repository_path,
+                                                                                  manifest, paths)
+                        with instrumentation.span("project.watch_update", project=name, paths=len(paths)) as span:
+                            stats = vector_store.apply_changes(documents, deleted_paths)
+                            span.set(**stats)
+                        self._record_update(name, len(vector_store.manifest.files), git)
+                    rescan = False
+                except Exception as e:
+                    # Retry with a full comparison on the next change
+                    print(f"Error updating project: {str(e)}")
+                    vector_store.manifest = None
+                    rescan = True
+                    continue
+                print(f"[{datetime.now():%H:%M:%S}] {stats['indexed']} re-indexed, {stats['removed']} removed, "
+                      f"{stats['unchanged']} unchanged ({time.perf_counter() - started:.2f}s)")
+        except KeyboardInterrupt:
+            pass
+        finally:
+            watcher.close()
+            vector_store.close()
+        return True
+
     def delete_project(self, name: str) -> bool:
         """
-        Delete a project and its associated vector store.
+        Delete a project and its associated vector store, or free the name
+        of one whose creation was interrupted.
         Returns True if successful, False otherwise.
         """
-        projects = self._load_projects()
+        projects = self._load_projects(include_reserved=True)
         if name not in projects:
             print(f"Error: Project '{name}' does not exist.")
             return False
 
         try:
             # Delete vector store
+            from vector_store.vector_store_manager import VectorStoreManager
+
+            self._close_vector_store(name)
             vector_store = VectorStoreManager(name)
             vector_store.delete_vector_store()
 
             # Remove project from projects.json
-            del projects[name]
-            self._save_projects(projects)
+            with self._modify_projects() as projects:
+                projects.pop(name, None)
 
             print(f"Successfully deleted project '{name}'.")
             return True
@@ -153,76 +566,111 @@ class ProjectManager:
         """Return a list of all projects and their metadata."""
         return list(self._load_projects().items())
 
-    def search_project(self, name: str, query: str, k: int = 5) -> List[Dict]:
+    def search_project(self, name: str, query: str, k: int = 5,
+                       nprobe: Optional[int] = None, ef_search: Optional[int] = None,
+                       mode: str = "vector") -> List[Dict]:
         """
         Search for similar documents in a project.
-        Returns k most similar documents.
+        Returns k most similar documents. `nprobe` and `ef_search` override
+        the approximate index search parameters stored at creation; `mode`
+        is "vector" or "hybrid" (vector and BM25 rankings fused).
+        Raises ProjectNotFoundError (a KeyError) for an unknown project and
+        ValueError for an invalid mode or a project without a vector store.
         """
-        projects = self._load_projects()
-        if name not in projects:
-            print(f"Error: Project '{name}' does not exist.")
-            return []
-
-        try:
-            vector_store = VectorStoreManager(name)
-            results = vector_store.similarity_search(query, k=k)
-            
-            # Format results
-            formatted_results = []
-            for doc in results:
-                formatted_results.append({
-                    "source": doc.metadata["source"],
-                    "content": doc.page_content,
-                })
-            
-            return formatted_results
+        return self.search_project_batch(name, [query], k, nprobe=nprobe, ef_search=ef_search, mode=mode)[0]
 
-        except Exception as e:
-            print(f"Error searching project: {str(e)}")
-            return []
-
-    def ask_question(self, name: str, question: str, k: int = 3) -> Dict[str, str]:
+    def search_project_batch(self, name: str, queries: List[str], k: int = 5,
+                             nprobe: Optional[int] = None, ef_search: Optional[int] = None,
+                             mode: str = "vector") -> List[List[Dict]]:
         """
-        Ask a question about the code in a project.
-        
-        Args:
-            name (str): Project name
-            question (str): Question about the code
-            k (int): Number of similar documents to use as context
-            
-        Returns:
-            Dict[str, str]: Dictionary containing the answer and sources used
+        Search a project for many queries with one batched embedding call
+        and one multi-query index search.
+        Returns the k most similar documents of each query, in query order.
+        Raises like search_project.
         """
         projects = self._load_projects()
         if name not in projects:
+            raise ProjectNotFoundError(f"Project '{name}' does not exist")
+
+        with instrumentation.span("project.search", project=name, queries=len(queries)):
+            vector_store = self._get_vector_store(name)
+            results = vector_store.similarity_search_batch(queries, k=k, nprobe=nprobe, ef_search=ef_search,
+                                                           mode=mode)
+
+        # Format results
+        return [
+            [{"source": doc.metadata["source"], "content": doc.page_content} for doc in docs]
+            for docs in results
+        ]
+
+    def _answer_from_documents(self, question: str, docs: List["Document"], use_cache: bool = True,
+                               on_token: Optional[Callable[[str], None]] = None,
+                               started: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Answer a question with the LLM, using the given documents as context.
+        The documents, best match first, are packed into a context that
+        fits the model's window (see ContextBuilder). With `use_cache` the
+        answer cache is consulted first, if enabled, and with `on_token` the
+        answer is streamed to it as it is generated. Timings are measured
+        from `started` (default: now).
+        """
+        started = started if started is not None else time.perf_counter()
+        if not docs:
             return {
-                "answer": f"Error: Project '{name}' does not exist.",
+                "answer": "No relevant code found to answer the question.",
                 "sources": []
             }
 
         try:
-            # Get relevant documents from vector store
-            vector_store = VectorStoreManager(name)
-            docs = vector_store.similarity_search(question, k=k)
-            
-            if not docs:
-                return {
-                    "answer": "No relevant code found to answer the question.",
-                    "sources": []
-                }
-            
-            # Combine document contents for context
-            context = "\n\n".join(doc.page_content for doc in docs)
-            
+            from llm_providers.base_provider import LLMProviderError
+            from utils.context_builder import ContextBuilder
+
+            # Pack the best matching content into the model's token budget
+            provider = (self.answer_cache if use_cache else None) or self.llm_provider
+            with instrumentation.span("context.build", chunks=len(docs)) as span:
+                budget = ContextBuilder.budget_for(provider.context_window, provider.template + question,
+                                                   max_tokens=self.max_context_tokens)
+                built = ContextBuilder(budget).build(docs)
+                context = built["context"]
+                span.set(tokens=built["tokens"])
+
             # Get answer from LLM
-            answer = self.llm_provider.ask_question(question, context)
-            
+            first_token = None
+            with instrumentation.span("llm.generate", stream=on_token is not None):
+                try:
+                    if on_token is None:
+                        answer = provider.ask_question(question, context)
+                    else:
+                        tokens = []
+                        for token in provider.ask_question_stream(question, context):
+                            if first_token is None:
+                                first_token = time.perf_counter() - started
+                            tokens.append(token)
+                            on_token(token)
+                        answer = "".join(tokens).strip()
+                except LLMProviderError as e:
+                    # Reported as the answer; the answer cache did not keep it
+                    answer = str(e)
+                    if on_token is not None:
+                        on_token(answer)
+            total = time.perf_counter() - started
+
             # Format sources
-            sources = [{"file": doc.metadata["source"], "content": doc.page_content} for doc in docs]
-            
+            sources = [{"file": doc.metadata["source"], "content": doc.page_content} for doc in built["documents"]]
+
             return {
                 "answer": answer,
-                "sources": sources
+                "sources": sources,
+                "context": {
+                    "tokens": built["tokens"],
+                    "budget": built["budget"],
+                    "chunks": len(built["documents"]),
+                    "retrieved": built["retrieved"]
+                },
+                "timings": {
+                    "first_token": first_token if first_token is not None else total,
+                    "total": total
+                }
             }
 
         except Exception as e:
@@ -230,3 +678,69 @@ class ProjectManager:
                 "answer": f"Error asking question: {str(e)}",
                 "sources": []
             }
+
+    def _ask_questions(self, name: str, questions: List[str], k: int, use_cache: bool,
+                       on_token: Optional[Callable[[str], None]] = None,
+                       mode: str = "vector") -> List[Dict[str, Any]]:
+        projects = self._load_projects()
+        if name not in projects:
+            return [{
+                "answer": f"Error: Project '{name}' does not exist.",
+                "sources": []
+            } for _ in questions]
+
+        with instrumentation.span("project.ask", project=name, questions=len(questions)):
+            started = time.perf_counter()
+            try:
+                # Get relevant documents from vector store
+                vector_store = self._get_vector_store(name)
+                results = vector_store.similarity_search_batch(questions, k=k, group_by_source=False, mode=mode)
+            except Exception as e:
+                return [{
+                    "answer": f"Error asking question: {str(e)}",
+                    "sources": []
+                } for _ in questions]
+            retrieval = time.perf_counter() - started
+
+            answers = []
+            for question, docs in zip(questions, results):
+                # Each question is timed from its own LLM call plus the shared retrieval
+                answers.append(self._answer_from_documents(question, docs, use_cache=use_cache, on_token=on_token,
+                                                           started=time.perf_counter() - retrieval))
+            return answers
+
+    def ask_question(self, name: str, question: str, k: int = 3, use_cache: bool = True,
+                     on_token: Optional[Callable[[str], None]] = None,
+                     mode: str = "vector") -> Dict[str, Any]:
+        """
+        Ask a question about the code in a project.
+        
+        Args:
+            name (str): Project name
+            question (str): Question about the code
+            k (int): Number of similar documents to use as context
+            use_cache (bool): Reuse a cached answer to a similar question
+                asked with the same context
+            on_token (Callable[[str], None]): Called with each piece of the
+                answer as the provider streams it
+            mode (str): Retrieval mode, "vector" or "hybrid"
+            
+        Returns:
+            Dict[str, Any]: Dictionary containing the answer, the sources used
+                and the seconds to the first token and to the full answer
+        """
+        return self._ask_questions(name, [question], k, use_cache, on_token, mode)[0]
+
+    def ask_question_batch(self, name: str, questions: List[str], k: int = 3,
+                           use_cache: bool = True, mode: str = "vector") -> List[Dict[str, Any]]:
+        """
+        Ask many questions about the code in a project.
+
+        Context for all questions is retrieved with one batched embedding
+        call and one multi-query index search; the LLM is then asked each
+        question in turn.
+
+        Returns:
+            List[Dict[str, Any]]: Answer, sources and timings of each question, in order
+        """
+        return self._ask_questions(name, questions, k, use_cache, mode=mode)
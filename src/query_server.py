@@ -0,0 +1,316 @@
+import http.client
+import json
+import os
+import socket
+import socketserver
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import urlparse
+
+from project_manager import ProjectManager
+from utils import instrumentation
+
+
+class QueryRequestHandler(BaseHTTPRequestHandler):
+    """
+    JSON API over a resident ProjectManager.
+
+    Endpoints:
+        GET  /health    Server status, the projects currently loaded and answer cache stats
+        GET  /projects  Project metadata, as returned by `list`
+        GET  /metrics   Stage latency histograms in the Prometheus text format
+        POST /search    {"project", "query", "k", "nprobe", "ef_search", "mode"} -> {"results": [...]}
+        POST /ask       {"project", "question", "k", "use_cache", "stream", "mode"} -> {"answer", "sources", "timings"}
+                        With "stream": true the reply is chunked JSON lines: {"token"} per
+                        piece of the answer, then the full result
+        POST /search_batch  {"project", "queries", "k", "nprobe", "ef_search", "mode"} -> {"results": [[...], ...]}
+        POST /ask_batch     {"project", "questions", "k", "use_cache", "mode"} -> {"answers": [{"answer", "sources"}, ...]}
+
+    "mode" selects the retrieval: "vector" (default) or "hybrid". Malformed
+    requests get a 400 and failures while handling them a 500, both with
+    {"error"}; a stream that fails ends with an {"error"} line.
+    """
+
+    server_version = "rag-code"
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def project_manager(self) -> ProjectManager:
+        return self.server.project_manager
+
+    def _send_json(self, status: int, payload: Any) -> None:
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _start_json_stream(self) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+    def _write_json_line(self, payload: Any) -> None:
+        line = (json.dumps(payload) + "\n").encode('utf-8')
+        self.wfile.write(f"{len(line):X}\r\n".encode('ascii') + line + b"\r\n")
+        self.wfile.flush()
+
+    def _end_json_stream(self) -> None:
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def _read_json(self) -> Dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_GET(self) -> None:
+        if self.path == "/health":
+            self._send_json(200, {
+                "status": "ok",
+                "open_projects": self.project_manager.open_projects(),
+                "answer_cache": self.project_manager.answer_cache_stats()
+            })
+        elif self.path == "/projects":
+            self._send_json(200, {"projects": self.project_manager.list_projects()})
+        elif self.path == "/metrics":
+            body = self.server.metrics.export().encode('utf-8')
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self._send_json(404, {"error": f"Unknown endpoint '{self.path}'"})
+
+    def do_POST(self) -> None:
+        try:
+            request = self._read_json()
+        except (ValueError, json.JSONDecodeError) as e:
+            self._send_json(400, {"error": f"Invalid JSON body: {str(e)}"})
+            return
+
+        streaming = False
+        try:
+            if self.path == "/search":
+                results = self.project_manager.search_project(
+                    request["project"], request["query"], int(request.get("k", 5)),
+                    nprobe=request.get("nprobe"), ef_search=request.get("ef_search"),
+                    mode=request.get("mode", "vector")
+                )
+                self._send_json(200, {"results": results})
+            elif self.path == "/ask" and request.get("stream"):
+                project, question, k = request["project"], request["question"], int(request.get("k", 3))
+                self._start_json_stream()
+                streaming = True
+                result = self.project_manager.ask_question(
+                    project, question, k,
+                    use_cache=bool(request.get("use_cache", True)),
+                    on_token=lambda token: self._write_json_line({"token": token}),
+                    mode=request.get("mode", "vector")
+                )
+                self._write_json_line(result)
+                self._end_json_stream()
+            elif self.path == "/ask":
+                result = self.project_manager.ask_question(
+                    request["project"], request["question"], int(request.get("k", 3)),
+                    use_cache=bool(request.get("use_cache", True)),
+                    mode=request.get("mode", "vector")
+                )
+                self._send_json(200, result)
+            elif self.path == "/search_batch":
+                results = self.project_manager.search_project_batch(
+                    request["project"], list(request["queries"]), int(request.get("k", 5)),
+                    nprobe=request.get("nprobe"), ef_search=request.get("ef_search"),
+                    mode=request.get("mode", "vector")
+                )
+                self._send_json(200, {"results": results})
+            elif self.path == "/ask_batch":
+                answers = self.project_manager.ask_question_batch(
+                    request["project"], list(request["questions"]), int(request.get("k", 3)),
+                    use_cache=bool(request.get("use_cache", True)),
+                    mode=request.get("mode", "vector")
+                )
+                self._send_json(200, {"answers": answers})
+            else:
+                self._send_json(404, {"error": f"Unknown endpoint '{self.path}'"})
+        except (KeyError, ValueError, TypeError) as e:
+            self._send_error(streaming, 400, f"Invalid request: {str(e)}")
+        except Exception as e:
+            self._send_error(streaming, 500, f"Error handling request: {str(e)}")
+
+    def _send_error(self, streaming: bool, status: int, message: str) -> None:
+        # A stream has already sent its 200 status, so the error ends it instead
+        if streaming:
+            self._write_json_line({"error": message})
+            self._end_json_stream()
+        else:
+            self._send_json(status, {"error": message})
+
+    def address_string(self) -> str:
+        # Unix socket peers have no (host, port) address
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+
+class _ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def get_request(self):
+        request, _ = super().get_request()
+        return request, ("unix", 0)
+
+
+class QueryServer:
+    """
+    Long-lived query server.
+
+    Keeps the embeddings model, the LLM provider and an LRU of project
+    indexes loaded in a single ProjectManager so each search or ask only
+    pays for the query itself. Stage timings are collected for /metrics.
+    """
+
+    def __init__(self, project_manager: ProjectManager, host: str = "127.0.0.1",
+                 port: int = 8765, socket_path: Optional[str] = None):
+        """
+        Initialize the server.
+
+        Args:
+            project_manager: Manager whose models and indexes stay resident
+            host: Interface to listen on for HTTP
+            port: TCP port to listen on for HTTP
+            socket_path: Listen on this Unix socket instead of TCP
+        """
+        self.project_manager = project_manager
+        self.socket_path = socket_path
+        if socket_path:
+            if os.path.exists(socket_path):
+                os.remove(socket_path)
+            self.httpd = _ThreadingUnixHTTPServer(socket_path, QueryRequestHandler)
+            self.address = f"unix://{socket_path}"
+        else:
+            self.httpd = ThreadingHTTPServer((host, port), QueryRequestHandler)
+            self.address = f"http://{host}:{self.httpd.server_address[1]}"
+        self.httpd.project_manager = project_manager
+        self.httpd.metrics = (instrumentation.find_sink(instrumentation.PrometheusSink)
+                              or instrumentation.add_sink(instrumentation.PrometheusSink()))
+
+    def serve_forever(self) -> None:
+        """Serve requests until interrupted."""
+        try:
+            self.httpd.serve_forever()
+        finally:
+            self.httpd.server_close()
+            if self.socket_path and os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+
+    def shutdown(self) -> None:
+        self.httpd.shutdown()
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path: str, timeout: float):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self) -> None:
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class QueryClient:
+    """Thin client for a QueryServer, mirroring ProjectManager's query methods."""
+
+    def __init__(self, address: str, timeout: float = 600):
+        """
+        Initialize the client.
+
+        Args:
+            address: Server address, either http://host:port or unix:///path/to/socket
+            timeout: Seconds to wait for a response
+        """
+        parsed = urlparse(address)
+        if parsed.scheme == "unix":
+            self._connect = lambda: _UnixHTTPConnection(parsed.path, timeout)
+        elif parsed.scheme == "http":
+            self._connect = lambda: http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=timeout)
+        else:
+            raise ValueError(f"Unsupported server address: {address}")
+
+    def _request(self, method: str, path: str, payload: Optional[Dict] = None) -> Dict:
+        connection = self._connect()
+        try:
+            body = json.dumps(payload).encode('utf-8') if payload is not None else None
+            headers = {"Content-Type": "application/json"} if body is not None else {}
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            data = json.loads(response.read() or b"{}")
+            if response.status != 200:
+                raise RuntimeError(data.get("error", f"Server returned HTTP {response.status}"))
+            return data
+        finally:
+            connection.close()
+
+    def search_project(self, name: str, query: str, k: int = 5,
+                       nprobe: Optional[int] = None, ef_search: Optional[int] = None,
+                       mode: str = "vector") -> List[Dict]:
+        payload = {"project": name, "query": query, "k": k, "nprobe": nprobe, "ef_search": ef_search,
+                   "mode": mode}
+        return self._request("POST", "/search", payload)["results"]
+
+    def _stream_request(self, path: str, payload: Dict, on_token: Callable[[str], None]) -> Dict:
+        """POST a streaming request, passing {"token"} lines to on_token and returning the final line."""
+        connection = self._connect()
+        try:
+            connection.request("POST", path, body=json.dumps(payload).encode('utf-8'),
+                               headers={"Content-Type": "application/json"})
+            response = connection.getresponse()
+            if response.status != 200:
+                data = json.loads(response.read() or b"{}")
+                raise RuntimeError(data.get("error", f"Server returned HTTP {response.status}"))
+            result = {}
+            for line in response:
+                message = json.loads(line)
+                if set(message) == {"error"}:
+                    raise RuntimeError(message["error"])
+                if set(message) == {"token"}:
+                    on_token(message["token"])
+                else:
+                    result = message
+            return result
+        finally:
+            connection.close()
+
+    def ask_question(self, name: str, question: str, k: int = 3, use_cache: bool = True,
+                     on_token: Optional[Callable[[str], None]] = None,
+                     mode: str = "vector") -> Dict[str, Any]:
+        try:
+            payload = {"project": name, "question": question, "k": k, "use_cache": use_cache, "mode": mode}
+            if on_token is not None:
+                payload["stream"] = True
+                return self._stream_request("/ask", payload, on_token)
+            return self._request("POST", "/ask", payload)
+        except Exception as e:
+            return {
+                "answer": f"Error asking question: {str(e)}",
+                "sources": []
+            }
+
+    def search_project_batch(self, name: str, queries: List[str], k: int = 5,
+                             nprobe: Optional[int] = None, ef_search: Optional[int] = None,
+                             mode: str = "vector") -> List[List[Dict]]:
+        payload = {"project": name, "queries": queries, "k": k, "nprobe": nprobe, "ef_search": ef_search,
+                   "mode": mode}
+        return self._request("POST", "/search_batch", payload)["results"]
+
+    def ask_question_batch(self, name: str, questions: List[str], k: int = 3,
+                           use_cache: bool = True, mode: str = "vector") -> List[Dict[str, Any]]:
+        try:
+            payload = {"project": name, "questions": questions, "k": k, "use_cache": use_cache, "mode": mode}
+            return self._request("POST", "/ask_batch", payload)["answers"]
+        except Exception as e:
+            return [{
+                "answer": f"Error asking question: {str(e)}",
+                "sources": []
+            } for _ in questions]
@@ -1,20 +1,191 @@
 import argparse
+import contextlib
+import logging
 import sys
 import json
+from typing import List
 from project_manager import ProjectManager
+from utils import instrumentation
+
+def run_query_command(args, project_manager) -> None:
+    """Run `search` or `ask` against a ProjectManager or a QueryClient."""
+    if args.command == 'search':
+        try:
+            results = project_manager.search_project(args.name, args.query, args.k,
+                                                     nprobe=args.nprobe, ef_search=args.ef_search,
+                                                     mode=args.search_mode)
+        except Exception as e:
+            print(f"Error searching project: {str(e)}")
+            results = []
+        if results:
+            print(f"\nSearch results for '{args.query}' in project '{args.name}':")
+            print("-" * 50)
+            for i, result in enumerate(results, 1):
+                print(f"\n{i}. File: {result['source']}")
+                print("Content:")
+                print(result['content'])
+                print("-" * 50)
+        else:
+            print("No results found.")
+
+    elif args.command == 'ask':
+        streamed = []
+
+        def print_token(token: str) -> None:
+            if not streamed:
+                print("\nAnswer:")
+                print("-" * 50)
+            streamed.append(token)
+            print(token, end="", flush=True)
+
+        result = project_manager.ask_question(args.name, args.question, args.k, use_cache=not args.no_cache,
+                                              on_token=None if args.no_stream else print_token,
+                                              mode=args.search_mode)
+        if streamed:
+            print()
+        if result["answer"]:
+            if not streamed:
+                print("\nAnswer:")
+                print("-" * 50)
+                print(result["answer"])
+            print("\nSources used:")
+            print("-" * 50)
+            for source in result["sources"]:
+                print(f"\nFile: {source['file']}")
+                print("Relevant content:")
+                print(source['content'])
+                print("-" * 50)
+            if result.get("context"):
+                print(f"\nContext: {result['context']['tokens']} tokens of a {result['context']['budget']} token budget "
+                      f"({result['context']['chunks']} of {result['context']['retrieved']} retrieved chunks)")
+            if result.get("timings"):
+                print(f"Time to first token: {result['timings']['first_token']:.2f}s "
+                      f"(full answer: {result['timings']['total']:.2f}s)")
+        else:
+            print("Could not generate an answer.")
+
+def read_batch_items(stream, field: str) -> list:
+    """Read JSONL batch input: objects carrying `field` (plus any ids to echo back) or bare strings."""
+    items = []
+    for line_number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        item = json.loads(line)
+        if isinstance(item, str):
+            item = {field: item}
+        if not isinstance(item, dict) or field not in item:
+            raise ValueError(f"Line {line_number}: expected a string or an object with a '{field}' field")
+        items.append(item)
+    return items
+
+def run_batch_command(args, project_manager) -> None:
+    """Run a JSONL batch of searches or questions against a ProjectManager or a QueryClient."""
+    field = "query" if args.mode == 'search' else "question"
+    k = args.k or (5 if args.mode == 'search' else 3)
+
+    try:
+        if args.input and args.input != '-':
+            with open(args.input, 'r') as f:
+                items = read_batch_items(f, field)
+        else:
+            items = read_batch_items(sys.stdin, field)
+    except (OSError, ValueError) as e:
+        print(f"Error reading batch input: {str(e)}", file=sys.stderr)
+        sys.exit(1)
+
+    texts = [item[field] for item in items]
+    # Keep progress and error messages out of JSONL written to stdout
+    with contextlib.redirect_stdout(sys.stderr):
+        if args.mode == 'search':
+            try:
+                results = project_manager.search_project_batch(args.name, texts, k,
+                                                               nprobe=args.nprobe, ef_search=args.ef_search,
+                                                               mode=args.search_mode)
+            except Exception as e:
+                print(f"Error searching project: {str(e)}")
+                results = [[] for _ in texts]
+            outputs = [dict(item, results=result) for item, result in zip(items, results)]
+        else:
+            answers = project_manager.ask_question_batch(args.name, texts, k, use_cache=not args.no_cache,
+                                                         mode=args.search_mode)
+            outputs = [dict(item, **answer) for item, answer in zip(items, answers)]
+
+    output = open(args.output, 'w') if args.output and args.output != '-' else sys.stdout
+    try:
+        for line in outputs:
+            output.write(json.dumps(line) + "\n")
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+def start_tracing(args) -> List[instrumentation.SpanSink]:
+    """Register the span sinks selected by the tracing options."""
+    sinks = []
+    if args.profile:
+        sinks.append(instrumentation.TreeSink())
+    if args.trace_log:
+        logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stderr)
+        sinks.append(instrumentation.LogSink())
+    if args.trace_json:
+        sinks.append(instrumentation.JsonSink(args.trace_json))
+    if args.metrics_file:
+        sinks.append(instrumentation.PrometheusSink(args.metrics_file))
+    for sink in sinks:
+        instrumentation.add_sink(sink)
+    return sinks
+
+def stop_tracing(sinks: List[instrumentation.SpanSink]) -> None:
+    """Print the timing tree of --profile and flush every sink."""
+    for sink in sinks:
+        instrumentation.remove_sink(sink)
+        if isinstance(sink, instrumentation.TreeSink):
+            print("\nTiming:", file=sys.stderr)
+            print(sink.format_tree() or "(no stages recorded)", file=sys.stderr)
+        sink.close()
 
 def main():
     parser = argparse.ArgumentParser(description='Local Repository RAG System')
+    parser.add_argument('--profile', action='store_true', help='Print a per-stage timing tree when the command ends')
+    parser.add_argument('--profile-output', metavar='FILE',
+                        help='Also write a cProfile profile (pstats format, e.g. for snakeviz) to FILE')
+    parser.add_argument('--trace-log', action='store_true', help='Log every timed stage to stderr')
+    parser.add_argument('--trace-json', metavar='FILE', help='Append the timed stages of each operation to FILE as JSON lines')
+    parser.add_argument('--metrics-file', metavar='FILE', help='Write stage latency histograms in the Prometheus text format to FILE')
     subparsers = parser.add_subparsers(dest='command', help='Commands')
 
     # Create project command
     create_parser = subparsers.add_parser('create', help='Create a new project')
     create_parser.add_argument('name', help='Project name')
     create_parser.add_argument('path', help='Path to local repository')
+    create_parser.add_argument('--workers', type=int, help='Number of threads used to read files')
+    create_parser.add_argument('--embed-batch-size', type=int, help='Number of chunks per embedding batch (default: 32)')
+    create_parser.add_argument('--embed-workers', type=int, help='Number of embedding processes (default: embed in-process)')
+    create_parser.add_argument('--index-type', default='auto', choices=['auto', 'flat', 'hnsw', 'ivf', 'ivfpq'],
+                               help='FAISS index type (default: auto, chosen by corpus size)')
+    create_parser.add_argument('--nprobe', type=int, help='Default IVF lists visited per search (default: 16)')
+    create_parser.add_argument('--ef-search', type=int, help='Default HNSW search depth (default: 64)')
 
     # Update project command
     update_parser = subparsers.add_parser('update', help='Update an existing project')
     update_parser.add_argument('name', help='Project name')
+    update_parser.add_argument('--workers', type=int, help='Number of threads used to read files')
+    update_parser.add_argument('--embed-batch-size', type=int, help='Number of chunks per embedding batch (default: 32)')
+    update_parser.add_argument('--embed-workers', type=int, help='Number of embedding processes (default: embed in-process)')
+
+    # Watch project command
+    watch_parser = subparsers.add_parser('watch', help='Re-index a project continuously as its files change')
+    watch_parser.add_argument('name', help='Project name')
+    watch_parser.add_argument('--workers', type=int, help='Number of threads used to read files')
+    watch_parser.add_argument('--embed-batch-size', type=int, help='Number of chunks per embedding batch (default: 32)')
+    watch_parser.add_argument('--embed-workers', type=int, help='Number of embedding processes (default: embed in-process)')
+    watch_parser.add_argument('--debounce', type=float, default=0.5,
+                              help='Seconds without changes before a burst is indexed (default: 0.5)')
+    watch_parser.add_argument('--max-delay', type=float, default=10.0,
+                              help='Longest a burst of changes is held back, in seconds (default: 10)')
+    watch_parser.add_argument('--poll', action='store_true', help='Poll for changes instead of using inotify')
+    watch_parser.add_argument('--poll-interval', type=float, default=2.0,
+                              help='Seconds between polls when polling (default: 2)')
 
     # Delete project command
     delete_parser = subparsers.add_parser('delete', help='Delete a project')
@@ -28,21 +199,102 @@ def main():
     search_parser.add_argument('name', help='Project name')
     search_parser.add_argument('query', help='Search query')
     search_parser.add_argument('-k', type=int, default=5, help='Number of results to return')
+    search_parser.add_argument('--nprobe', type=int, help='IVF lists visited (overrides the project default)')
+    search_parser.add_argument('--ef-search', type=int, help='HNSW search depth (overrides the project default)')
+    search_parser.add_argument('--search-mode', choices=['vector', 'hybrid'], default='vector',
+                               help='Retrieval: vector similarity only (vector, default) or BM25 and vector rankings fused (hybrid)')
+    search_parser.add_argument('--query-cache-size', type=int, help='Number of search results cached per project (default: 1024, 0 disables)')
+    search_parser.add_argument('--persist-query-cache', action='store_true', help='Keep cached search results on disk for later runs')
+    search_parser.add_argument('--server', help='Send the query to a running server (http://host:port or unix:///path)')
 
     # Ask question command
     ask_parser = subparsers.add_parser('ask', help='Ask a question about the code')
     ask_parser.add_argument('name', help='Project name')
     ask_parser.add_argument('question', help='Question about the code')
     ask_parser.add_argument('-k', type=int, default=3, help='Number of context documents to use')
+    ask_parser.add_argument('--search-mode', choices=['vector', 'hybrid'], default='vector',
+                            help='Retrieval: vector similarity only (vector, default) or BM25 and vector rankings fused (hybrid)')
     ask_parser.add_argument('--provider', default='ollama', help='LLM provider to use (default: ollama)')
     ask_parser.add_argument('--model', help='Model name for the provider (default depends on provider)')
+    ask_parser.add_argument('--max-context-tokens', type=int,
+                            help="Maximum tokens of code sent as context (default: fit the model's context window)")
+    ask_parser.add_argument('--no-stream', action='store_true', help='Print the answer only once it is complete')
+    ask_parser.add_argument('--no-cache', action='store_true', help="Always ask the LLM, bypassing the server's answer cache (with --server)")
+    ask_parser.add_argument('--query-cache-size', type=int, help='Number of search results cached per project (default: 1024, 0 disables)')
+    ask_parser.add_argument('--persist-query-cache', action='store_true', help='Keep cached search results on disk for later runs')
     ask_parser.add_argument('--config', type=json.loads, help='Additional provider configuration as JSON')
+    ask_parser.add_argument('--server', help='Send the question to a running server (http://host:port or unix:///path)')
+
+    # Batch command
+    batch_parser = subparsers.add_parser('batch', help='Run many searches or questions from a JSONL file')
+    batch_parser.add_argument('name', help='Project name')
+    batch_parser.add_argument('mode', choices=['search', 'ask'], help='Run searches or ask questions')
+    batch_parser.add_argument('--input', help='JSONL file with one {"query"} or {"question"} per line (default: stdin)')
+    batch_parser.add_argument('--output', help='File to write JSONL results to (default: stdout)')
+    batch_parser.add_argument('-k', type=int, help='Number of results or context documents (default: 5 for search, 3 for ask)')
+    batch_parser.add_argument('--nprobe', type=int, help='IVF lists visited (overrides the project default)')
+    batch_parser.add_argument('--ef-search', type=int, help='HNSW search depth (overrides the project default)')
+    batch_parser.add_argument('--search-mode', choices=['vector', 'hybrid'], default='vector',
+                              help='Retrieval: vector similarity only (vector, default) or BM25 and vector rankings fused (hybrid)')
+    batch_parser.add_argument('--provider', default='ollama', help='LLM provider to use (default: ollama)')
+    batch_parser.add_argument('--model', help='Model name for the provider (default depends on provider)')
+    batch_parser.add_argument('--max-context-tokens', type=int,
+                              help="Maximum tokens of code sent as context (default: fit the model's context window)")
+    batch_parser.add_argument('--no-cache', action='store_true', help='Always ask the LLM, bypassing the answer cache')
+    batch_parser.add_argument('--query-cache-size', type=int, help='Number of search results cached per project (default: 1024, 0 disables)')
+    batch_parser.add_argument('--persist-query-cache', action='store_true', help='Keep cached search results on disk for later runs')
+    batch_parser.add_argument('--config', type=json.loads, help='Additional provider configuration as JSON')
+    batch_parser.add_argument('--server', help='Send the batch to a running server (http://host:port or unix:///path)')
+
+    # Serve command
+    serve_parser = subparsers.add_parser('serve', help='Serve search and ask with models and indexes kept in memory')
+    serve_parser.add_argument('--host', default='127.0.0.1', help='Interface to listen on (default: 127.0.0.1)')
+    serve_parser.add_argument('--port', type=int, default=8765, help='Port to listen on (default: 8765)')
+    serve_parser.add_argument('--socket', help='Listen on this Unix socket instead of TCP')
+    serve_parser.add_argument('--max-open-projects', type=int, default=8, help='Number of project indexes kept loaded (default: 8)')
+    serve_parser.add_argument('--provider', default='ollama', help='LLM provider to use (default: ollama)')
+    serve_parser.add_argument('--model', help='Model name for the provider (default depends on provider)')
+    serve_parser.add_argument('--max-context-tokens', type=int,
+                              help="Maximum tokens of code sent as context (default: fit the model's context window)")
+    serve_parser.add_argument('--answer-cache-size', type=int, help='Number of LLM answers cached (default: 1024, 0 disables)')
+    serve_parser.add_argument('--answer-cache-ttl', type=float, help='Seconds a cached answer stays valid (default: 3600)')
+    serve_parser.add_argument('--answer-similarity', type=float,
+                              help='Minimum cosine similarity for a question to reuse a cached answer (default: 0.95)')
+    serve_parser.add_argument('--query-cache-size', type=int, help='Number of search results cached per project (default: 1024, 0 disables)')
+    serve_parser.add_argument('--persist-query-cache', action='store_true', help='Keep cached search results on disk for later runs')
+    serve_parser.add_argument('--config', type=json.loads, help='Additional provider configuration as JSON')
 
     args = parser.parse_args()
 
-    # Configure LLM if using ask command
+    sinks = start_tracing(args)
+    profiler = None
+    if args.profile_output:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        run_command(args, parser)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(args.profile_output)
+        stop_tracing(sinks)
+
+def run_command(args, parser) -> None:
+    """Run the parsed command."""
+    # Queries sent to a server skip loading anything locally
+    if getattr(args, 'server', None):
+        from query_server import QueryClient
+        project_manager = QueryClient(args.server)
+        if args.command == 'batch':
+            run_batch_command(args, project_manager)
+        else:
+            run_query_command(args, project_manager)
+        return
+
+    # Configure LLM if using ask, batch or serve command
     llm_config = None
-    if args.command == 'ask':
+    if args.command in ('ask', 'batch', 'serve'):
         llm_config = {
             "provider": args.provider,
             "config": {
@@ -53,15 +305,63 @@ def main():
         if args.config:
             llm_config["config"].update(args.config)
 
+    # Configure the embedding engine if indexing
+    embedding_config = None
+    if args.command in ('create', 'update', 'watch'):
+        embedding_config = {
+            "batch_size": args.embed_batch_size,
+            "workers": args.embed_workers
+        }
+
+    # Configure the query result cache if searching
+    query_cache_config = None
+    if args.command in ('search', 'ask', 'batch', 'serve'):
+        query_cache_config = {
+            "size": args.query_cache_size,
+            "persist": args.persist_query_cache
+        }
+
+    # Configure the answer cache where questions can repeat: across requests
+    # to the server and within a batch. A one-shot ask never reuses it
+    answer_cache_config = None
+    if args.command == 'serve':
+        answer_cache_config = {
+            "enabled": args.answer_cache_size != 0,
+            "max_entries": args.answer_cache_size,
+            "ttl_seconds": args.answer_cache_ttl,
+            "similarity_threshold": args.answer_similarity
+        }
+    elif args.command == 'batch':
+        answer_cache_config = {"enabled": True}
+
     # Initialize project manager
-    project_manager = ProjectManager(llm_config=llm_config)
+    project_manager = ProjectManager(
+        llm_config=llm_config,
+        embedding_config=embedding_config,
+        max_open_projects=getattr(args, 'max_open_projects', 8),
+        query_cache_config=query_cache_config,
+        answer_cache_config=answer_cache_config,
+        max_context_tokens=getattr(args, 'max_context_tokens', None)
+    )
 
     if args.command == 'create':
-        success = project_manager.create_project(args.name, args.path)
+        index_config = {
+            "index_type": args.index_type,
+            "nprobe": args.nprobe,
+            "ef_search": args.ef_search
+        }
+        success = project_manager.create_project(args.name, args.path, workers=args.workers,
+                                                 index_config=index_config)
         sys.exit(0 if success else 1)
 
     elif args.command == 'update':
-        success = project_manager.update_project(args.name)
+        success = project_manager.update_project(args.name, workers=args.workers)
+        sys.exit(0 if success else 1)
+
+    elif args.command == 'watch':
+        success = project_manager.watch_project(args.name, workers=args.workers, debounce=args.debounce,
+                                                max_delay=args.max_delay, polling=args.poll,
+                                                poll_interval=args.poll_interval)
         sys.exit(0 if success else 1)
 
     elif args.command == 'delete':
@@ -83,34 +383,20 @@ def main():
                 print(f"Documents: {metadata['document_count']}")
                 print("-" * 50)
 
-    elif args.command == 'search':
-        results = project_manager.search_project(args.name, args.query, args.k)
-        if results:
-            print(f"\nSearch results for '{args.query}' in project '{args.name}':")
-            print("-" * 50)
-            for i, result in enumerate(results, 1):
-                print(f"\n{i}. File: {result['source']}")
-                print("Content:")
-                print(result['content'])
-                print("-" * 50)
-        else:
-            print("No results found.")
+    elif args.command in ('search', 'ask'):
+        run_query_command(args, project_manager)
 
-    elif args.command == 'ask':
-        result = project_manager.ask_question(args.name, args.question, args.k)
-        if result["answer"]:
-            print("\nAnswer:")
-            print("-" * 50)
-            print(result["answer"])
-            print("\nSources used:")
-            print("-" * 50)
-            for source in result["sources"]:
-                print(f"\nFile: {source['file']}")
-                print("Relevant content:")
-                print(source['content'])
-                print("-" * 50)
-        else:
-            print("Could not generate an answer.")
+    elif args.command == 'batch':
+        run_batch_command(args, project_manager)
+
+    elif args.command == 'serve':
+        from query_server import QueryServer
+        server = QueryServer(project_manager, host=args.host, port=args.port, socket_path=args.socket)
+        print(f"Serving on {server.address} (Ctrl+C to stop)")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
 
     else:
         parser.print_help()
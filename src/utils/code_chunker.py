@@ -0,0 +1,261 @@
+import ast
+import io
+import re
+from typing import List, NamedTuple, Optional, Tuple
+
+# Line ranges below are 0-based and end-exclusive; chunks report them
+# 1-based and inclusive, like editors and tracebacks do
+Unit = Tuple[int, int, Optional[str]]
+
+_BRACE_SYMBOL = re.compile(
+    r"\b(?:class|interface|struct|enum|namespace|function)\s+([A-Za-z_$][\w$]*)"
+    r"|\b(?:const|let|var)\s+([A-Za-z_$][\w$]*)\s*=\s*(?:async\s*)?(?:function\b|\([^)]*\)\s*=>|[A-Za-z_$][\w$]*\s*=>)"
+    r"|([A-Za-z_$~][\w$:~]*)\s*\([^;{]*\)\s*(?:const\s*)?(?:throws\s+[\w.,\s]+)?\{?\s*$"
+)
+_NOT_SYMBOLS = {"if", "for", "while", "switch", "catch", "return", "else", "do", "try", "sizeof", "new"}
+_INDENT_DEFINITION = re.compile(r"(?:async\s+def|def|class)\s+([A-Za-z_]\w*)")
+
+
+class CodeChunk(NamedTuple):
+    text: str
+    start_index: int
+    line_start: int
+    line_end: int
+    symbol: Optional[str]
+
+
+class CodeChunker:
+    """
+    Splits source files on function and class boundaries.
+
+    Python is parsed with `ast`; brace languages (JavaScript, Java, C++)
+    are split where the brace depth returns to the enclosing level, and
+    Python that does not parse falls back to splitting at unindented
+    definitions. Consecutive small units are packed together up to
+    `max_chars`; units larger than that are split at their nested
+    definitions and, failing that, at line boundaries. Chunks cover the
+    file without overlap, so consecutive chunks of a file are adjacent.
+    """
+
+    PYTHON_EXTENSIONS = {".py"}
+    BRACE_EXTENSIONS = {".js", ".java", ".cpp", ".h", ".hpp"}
+    # Source code averages about this many characters per WordPiece token
+    CHARS_PER_TOKEN = 3.2
+
+    def __init__(self, max_chars: int = 800):
+        """
+        Initialize the chunker.
+
+        Args:
+            max_chars: Maximum characters of a chunk; see for_model to fit
+                the input length of an embedding model
+        """
+        self.max_chars = max_chars
+
+    @classmethod
+    def for_model(cls, max_tokens: int) -> "CodeChunker":
+        """
+        A chunker whose chunks fit an embedding model that truncates its
+        input at `max_tokens` tokens (two of them are special tokens), so
+        the end of a chunk is never cut off before it is embedded.
+        """
+        return cls(max_chars=int((max_tokens - 2) * cls.CHARS_PER_TOKEN))
+
+    def supports(self, extension: str) -> bool:
+        """Check whether files with this extension are split by syntax."""
+        return extension in self.PYTHON_EXTENSIONS or extension in self.BRACE_EXTENSIONS
+
+    def split(self, content: str, extension: str) -> List[CodeChunk]:
+        """Split the content of a file with the given extension into chunks."""
+        # Only "\n" ends a line, as for ast and editors; str.splitlines
+        # would also split at form feeds, \x85, \u2028 and the like
+        lines = io.StringIO(content).readlines()
+        if extension in self.PYTHON_EXTENSIONS:
+            try:
+                tree = ast.parse(content)
+            except (SyntaxError, ValueError):
+                units = self._indent_units(lines, 0, len(lines))
+            else:
+                units = self._python_units(tree.body, lines, 0, len(lines), "")
+        else:
+            units = self._brace_units(lines, 0, len(lines), "")
+        return self._pack(lines, units)
+
+    def _size(self, lines: List[str], start: int, end: int) -> int:
+        return sum(len(line) for line in lines[start:end])
+
+    def _cover(self, lines: List[str], start: int, end: int, definitions: List[Unit]) -> List[Unit]:
+        """Turn definitions into units covering start..end, the code in between becoming unnamed units."""
+        units = []
+        position = start
+        for def_start, def_end, symbol in definitions:
+            if def_start > position:
+                units.append((position, def_start, None))
+            units.append((def_start, def_end, symbol))
+            position = def_end
+        if position < end:
+            units.append((position, end, None))
+        return units
+
+    def _python_units(self, nodes: List[ast.stmt], lines: List[str], start: int, end: int,
+                      prefix: str) -> List[Unit]:
+        definitions = []
+        for node in nodes:
+            if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                continue
+            # Decorators belong to the definition they decorate
+            def_start = min([node.lineno] + [d.lineno for d in node.decorator_list]) - 1
+            definitions.append((max(def_start, start), min(node.end_lineno, end), prefix + node.name, node))
+
+        units = []
+        for unit in self._cover(lines, start, end, [d[:3] for d in definitions]):
+            node = next((d[3] for d in definitions if d[:3] == unit), None)
+            if node is None or self._size(lines, unit[0], unit[1]) <= self.max_chars:
+                units.append(unit)
+                continue
+            # Too large: split at nested definitions, e.g. the methods of a class
+            body_start = node.body[0].lineno - 1
+            if isinstance(node.body[0], ast.Expr) and isinstance(getattr(node.body[0], "value", None), ast.Constant):
+                # Keep the docstring with the signature
+                body_start = node.body[0].end_lineno
+            body_start = max(body_start, unit[0] + 1)
+            nested = self._python_units(node.body, lines, body_start, unit[1], unit[2] + ".")
+            if not any(symbol for _, _, symbol in nested):
+                units.extend(self._line_units(lines, unit))
+                continue
+            units.append((unit[0], body_start, unit[2]))
+            # Code between nested definitions still belongs to this one
+            units.extend((s, e, symbol or unit[2]) for s, e, symbol in nested)
+        return units
+
+    def _indent_units(self, lines: List[str], start: int, end: int) -> List[Unit]:
+        definitions = []
+        for number in range(start, end):
+            match = _INDENT_DEFINITION.match(lines[number])
+            if not match:
+                continue
+            def_start = number
+            while def_start > start and lines[def_start - 1].startswith("@"):
+                def_start -= 1
+            # A definition runs until the next unindented, non-blank line
+            def_end = number + 1
+            while def_end < end and (not lines[def_end].strip() or lines[def_end][0] in " \t)]}#"):
+                def_end += 1
+            if definitions and def_start < definitions[-1][1]:
+                continue
+            definitions.append((def_start, def_end, match.group(1)))
+        return self._cover(lines, start, end, definitions)
+
+    def _brace_units(self, lines: List[str], start: int, end: int, prefix: str) -> List[Unit]:
+        """
+        Split where the brace depth returns to the level it had at `start`.
+        Symbols are qualified with `prefix`, e.g. "Account." for methods.
+        """
+        units = []
+        unit_start = start
+        depth = 0
+        opened = False
+        for number in range(start, end):
+            code = self._code_of(lines[number])
+            for char in code:
+                if char == "{":
+                    depth += 1
+                    opened = True
+                elif char == "}":
+                    depth = max(depth - 1, 0)
+            # A unit ends with a closed block, a statement or a blank line
+            if depth == 0 and (opened or not code.strip() or code.rstrip().endswith(";")):
+                units.append(self._brace_unit(lines, unit_start, number + 1, prefix))
+                unit_start = number + 1
+                opened = False
+        if unit_start < end:
+            units.append(self._brace_unit(lines, unit_start, end, prefix))
+
+        split = []
+        for unit in units:
+            if self._size(lines, unit[0], unit[1]) <= self.max_chars:
+                split.append(unit)
+                continue
+            # Too large: split the inside of the block, e.g. the methods of a class
+            body_start = next((n + 1 for n in range(unit[0], unit[1]) if "{" in self._code_of(lines[n])), unit[1])
+            body_end = unit[1] - 1 if body_start < unit[1] - 1 else unit[1]
+            nested_prefix = unit[2] + "." if unit[2] else prefix
+            nested = self._brace_units(lines, body_start, body_end, nested_prefix) if body_start < body_end else []
+            if len(nested) <= 1:
+                split.extend(self._line_units(lines, unit))
+                continue
+            split.append((unit[0], body_start, unit[2]))
+            split.extend((s, e, symbol or unit[2]) for s, e, symbol in nested)
+            if body_end < unit[1]:
+                split.append((body_end, unit[1], unit[2]))
+        return split
+
+    @staticmethod
+    def _code_of(line: str) -> str:
+        """Strip string literals and line comments, whose braces do not count."""
+        line = re.sub(r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'|`(?:\\.|[^`\\])*`', '""', line)
+        return line.split("//", 1)[0]
+
+    def _brace_unit(self, lines: List[str], start: int, end: int, prefix: str) -> Unit:
+        """Name a brace unit after the declaration opening its block, qualified with `prefix`."""
+        for line in lines[start:end]:
+            code = self._code_of(line).strip()
+            if not code or code.startswith(("/*", "*", "#", "@")):
+                continue
+            match = _BRACE_SYMBOL.search(code)
+            symbol = next((group for group in match.groups() if group), None) if match else None
+            if symbol and symbol not in _NOT_SYMBOLS:
+                return start, end, prefix + symbol
+            if "{" in code:
+                break
+        return start, end, None
+
+    def _line_units(self, lines: List[str], unit: Unit) -> List[Unit]:
+        """Split a unit without nested structure at line boundaries."""
+        units = []
+        start, end, symbol = unit
+        piece_start = start
+        size = 0
+        for number in range(start, end):
+            if size and size + len(lines[number]) > self.max_chars:
+                units.append((piece_start, number, symbol))
+                piece_start = number
+                size = 0
+            size += len(lines[number])
+        units.append((piece_start, end, symbol))
+        return units
+
+    def _pack(self, lines: List[str], units: List[Unit]) -> List[CodeChunk]:
+        """Merge consecutive units into chunks of at most max_chars."""
+        offsets = [0]
+        for line in lines:
+            offsets.append(offsets[-1] + len(line))
+
+        chunks = []
+        current = None
+        for start, end, symbol in units:
+            if start >= end:
+                continue
+            if current is not None and offsets[end] - offsets[current[0]] <= self.max_chars:
+                current[1] = end
+                if symbol and symbol not in current[2]:
+                    current[2].append(symbol)
+                continue
+            if current is not None:
+                chunks.extend(self._chunks_of(lines, offsets, current))
+            current = [start, end, [symbol] if symbol else []]
+        if current is not None:
+            chunks.extend(self._chunks_of(lines, offsets, current))
+        return chunks
+
+    def _chunks_of(self, lines: List[str], offsets: List[int], packed: list) -> List[CodeChunk]:
+        start, end, symbols = packed
+        text = "".join(lines[start:end])
+        if not text.strip():
+            return []
+        symbol = ", ".join(symbols) or None
+        if len(text) <= self.max_chars:
+            return [CodeChunk(text, offsets[start], start + 1, end, symbol)]
+        # A single line longer than a chunk, e.g. minified code
+        return [CodeChunk(text[i:i + self.max_chars], offsets[start] + i, start + 1, end, symbol)
+                for i in range(0, len(text), self.max_chars)]
@@ -0,0 +1,161 @@
+from typing import Callable, Dict, List, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from langchain.docstore.document import Document
+
+# Tokens left free for the model's answer
+DEFAULT_ANSWER_TOKENS = 512
+
+# Without tiktoken, assume about 3 characters per token, which does not
+# undercount code (identifiers and punctuation tokenize densely)
+FALLBACK_CHARS_PER_TOKEN = 3
+
+_encoder = None
+
+
+def count_tokens(text: str) -> int:
+    """
+    Count the tokens of a text with tiktoken's cl100k_base encoding when it
+    is installed, or estimate them from its length otherwise.
+    """
+    global _encoder
+    if _encoder is None:
+        try:
+            import tiktoken
+            _encoder = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _encoder = False
+    if _encoder:
+        return len(_encoder.encode(text, disallowed_special=()))
+    return -(-len(text) // FALLBACK_CHARS_PER_TOKEN)
+
+
+class ContextBuilder:
+    """
+    Packs retrieved chunks into an LLM context within a token budget.
+
+    Chunks are deduplicated, overlapping or adjacent chunks of the same file
+    (the text splitter overlaps consecutive chunks) are merged into one
+    block, and blocks are added best match first until the budget is used.
+    The packed blocks are then ordered by file and position so the context
+    reads like the source.
+    """
+
+    def __init__(self, max_tokens: int, token_counter: Callable[[str], int] = count_tokens):
+        """
+        Initialize the builder.
+
+        Args:
+            max_tokens: Token budget of the context
+            token_counter: Counts the tokens of a text
+        """
+        self.max_tokens = max(0, max_tokens)
+        self.count_tokens = token_counter
+
+    @staticmethod
+    def budget_for(context_window: int, prompt_overhead: str = "",
+                   answer_tokens: int = DEFAULT_ANSWER_TOKENS,
+                   max_tokens: Optional[int] = None) -> int:
+        """
+        Compute the context budget of a model: its context window minus
+        the prompt around the context and the room kept for the answer,
+        capped at `max_tokens` if given.
+        """
+        budget = context_window - count_tokens(prompt_overhead) - answer_tokens
+        if max_tokens is not None:
+            budget = min(budget, max_tokens)
+        return max(0, budget)
+
+    @staticmethod
+    def _merge_blocks(ranked: List["Document"]) -> List[Dict]:
+        """
+        Merge chunks into blocks of contiguous text per file.
+        Each block keeps the best (lowest) rank of its chunks.
+        """
+        blocks = []
+        seen = set()
+        by_source = {}
+        for rank, doc in enumerate(ranked):
+            key = (doc.metadata.get("source"), doc.page_content)
+            if key in seen:
+                continue
+            seen.add(key)
+            by_source.setdefault(doc.metadata.get("source"), []).append((rank, doc))
+
+        for source, chunks in by_source.items():
+            positioned = sorted((c for c in chunks if c[1].metadata.get("start_index") is not None),
+                                key=lambda c: c[1].metadata["start_index"])
+            unpositioned = [c for c in chunks if c[1].metadata.get("start_index") is None]
+
+            current = None
+            for rank, doc in positioned:
+                start = doc.metadata["start_index"]
+                end = start + len(doc.page_content)
+                if current is not None and start <= current["end"]:
+                    # Overlapping or directly adjacent: append only the new text
+                    if end > current["end"]:
+                        current["text"] += doc.page_content[current["end"] - start:]
+                        current["end"] = end
+                    current["rank"] = min(current["rank"], rank)
+                    current["chunks"].append(doc)
+                    continue
+                current = {"source": source, "start": start, "end": end, "text": doc.page_content,
+                           "rank": rank, "chunks": [doc]}
+                blocks.append(current)
+
+            # Chunks indexed without positions are only deduplicated by containment
+            for rank, doc in unpositioned:
+                if any(doc.page_content in block["text"] for block in blocks if block["source"] == source):
+                    continue
+                blocks.append({"source": source, "start": None, "end": None, "text": doc.page_content,
+                               "rank": rank, "chunks": [doc]})
+        return blocks
+
+    def _truncate(self, text: str, max_tokens: int) -> str:
+        """Cut a text down to at most max_tokens, keeping its beginning."""
+        low, high = 0, len(text)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self.count_tokens(text[:middle]) <= max_tokens:
+                low = middle
+            else:
+                high = middle - 1
+        return text[:low]
+
+    def build(self, ranked: List["Document"]) -> Dict:
+        """
+        Build the context from chunks ordered best match first.
+
+        Returns:
+            Dict: "context" text, "documents" used, "tokens" used,
+                "budget" and the number of chunks "retrieved"
+        """
+        blocks = sorted(self._merge_blocks(ranked), key=lambda block: block["rank"])
+        packed = []
+        used = 0
+        for block in blocks:
+            text = f"File: {block['source']}\n{block['text']}"
+            tokens = self.count_tokens(text)
+            separator = 2 if packed else 0
+            if used + separator + tokens > self.max_tokens:
+                if packed:
+                    # Smaller, lower ranked blocks may still fit
+                    continue
+                # Always send (the start of) the best match
+                text = self._truncate(text, self.max_tokens)
+                tokens = self.count_tokens(text)
+                if not text:
+                    break
+            block["formatted"] = text
+            packed.append(block)
+            used += separator + tokens
+
+        packed.sort(key=lambda block: (str(block["source"]), block["start"] if block["start"] is not None else -1))
+        context = "\n\n".join(block["formatted"] for block in packed)
+        return {
+            "context": context,
+            "documents": [doc for block in packed for doc in block["chunks"]],
+            "tokens": self.count_tokens(context) if context else 0,
+            "budget": self.max_tokens,
+            "retrieved": len(ranked)
+        }
@@ -0,0 +1,96 @@
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class FileLock:
+    """
+    Exclusive lock shared by every process that locks the same path,
+    through flock on POSIX and msvcrt.locking on Windows. The lock is
+    advisory: it only keeps out other FileLock users. The thread holding it
+    may acquire it again, and threads sharing one FileLock wait for each
+    other like processes do.
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: Lock file, created on first use; its content is never used
+        """
+        self.path = path
+        self._thread_lock = threading.RLock()
+        self._fd = None
+        self._depth = 0
+
+    def _lock_fd(self, fd: int, blocking: bool) -> bool:
+        if fcntl is not None:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return False
+            return True
+        while True:
+            try:
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+                return True
+            except OSError:
+                if not blocking:
+                    return False
+                threading.Event().wait(0.05)
+
+    def _open_locked(self, blocking: bool):
+        """Open and lock the lock file; None if it is held elsewhere and not `blocking`."""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        while True:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                if not self._lock_fd(fd, blocking):
+                    os.close(fd)
+                    return None
+                # The file may have been deleted (e.g. with its store) while
+                # we waited, in which case a new one may be locked by others
+                if fcntl is None or os.path.samestat(os.fstat(fd), os.stat(self.path)):
+                    return fd
+            except FileNotFoundError:
+                pass
+            except BaseException:
+                os.close(fd)
+                raise
+            os.close(fd)
+
+    def acquire(self, blocking: bool = True) -> bool:
+        """Take the lock, waiting for it unless `blocking` is False; returns whether it was taken."""
+        if not self._thread_lock.acquire(blocking):
+            return False
+        if self._depth == 0:
+            try:
+                fd = self._open_locked(blocking)
+            except BaseException:
+                self._thread_lock.release()
+                raise
+            if fd is None:
+                self._thread_lock.release()
+                return False
+            self._fd = fd
+        self._depth += 1
+        return True
+
+    def release(self) -> None:
+        self._depth -= 1
+        if self._depth == 0:
+            # Closing the descriptor releases the lock
+            os.close(self._fd)
+            self._fd = None
+        self._thread_lock.release()
+
+    def __enter__(self) -> "FileLock":
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.release()
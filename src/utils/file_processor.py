@@ -1,8 +1,23 @@
+import codecs
 import os
-from typing import List, Dict, Set
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Set, Iterable, Iterator, Tuple, Optional, Union, Callable
 import magic
 
+from utils import instrumentation
+from utils.path_filter import PathFilter
+
 class FileProcessor:
+    # Files larger than this are skipped without being read
+    MAX_FILE_SIZE = 1024 * 1024
+    # Bytes read to tell text from binary; the same buffer starts the full read
+    SNIFF_SIZE = 8192
+    # Ways a file can be classified, cheapest first
+    DETECTION_TIERS = ("size", "extension", "sniff", "magic")
+
     # File extensions to process
     SUPPORTED_EXTENSIONS = {
         '.txt', '.py', '.js', '.java', '.cpp', '.h', '.hpp', 
@@ -118,7 +133,10 @@ class FileProcessor:
     def __init__(self, 
                  excluded_dirs: Set[str] = None, 
                  excluded_files: Set[str] = None,
-                 supported_extensions: Set[str] = None):
+                 supported_extensions: Set[str] = None,
+                 max_workers: Optional[int] = None,
+                 use_gitignore: bool = True,
+                 max_file_size: Optional[int] = None):
         """
         Initialize FileProcessor with optional custom exclusion patterns.
         
@@ -126,41 +144,122 @@ class FileProcessor:
             excluded_dirs: Set of directory patterns to exclude
             excluded_files: Set of file patterns to exclude
             supported_extensions: Set of file extensions to process
+            max_workers: Number of threads used to stat, sniff and read files
+                (defaults to the ThreadPoolExecutor default)
+            use_gitignore: Also skip files ignored by the repository's .gitignore files
+            max_file_size: Skip files larger than this many bytes (default:
+                MAX_FILE_SIZE, 0 for no limit)
         """
         self.excluded_dirs = excluded_dirs if excluded_dirs is not None else self.DEFAULT_EXCLUDED_DIRS
         self.excluded_files = excluded_files if excluded_files is not None else self.DEFAULT_EXCLUDED_FILES
         self.supported_extensions = supported_extensions if supported_extensions is not None else self.SUPPORTED_EXTENSIONS
+        self.max_workers = max_workers or min(32, (os.cpu_count() or 1) + 4)
+        self.use_gitignore = use_gitignore
+        self.max_file_size = max_file_size if max_file_size is not None else self.MAX_FILE_SIZE
+        self.path_filter = PathFilter(self.excluded_dirs, self.excluded_files)
+        self._text_suffixes = tuple(self.supported_extensions)
 
-    def should_exclude_path(self, path: str) -> bool:
-        """Check if a path should be excluded based on exclusion patterns."""
-        path_parts = path.split(os.sep)
-        
-        # Check if any part of the path matches excluded directories
-        for part in path_parts:
-            if part in self.excluded_dirs:
-                return True
-        
-        # Check if the file matches any excluded patterns
-        for pattern in self.excluded_files:
-            if pattern.startswith('*.'):
-                if path.endswith(pattern[1:]):  # Handle extension patterns
-                    return True
-            elif pattern in path:  # Handle exact matches
-                return True
-                
-        return False
+        # libmagic handles are not thread-safe, so each worker thread gets its own
+        self._thread_local = threading.local()
+        self._stats_lock = threading.Lock()
+        # Number of files classified by each detection tier
+        self.detection_counts = Counter()
+        self.last_scan_stats = {}
 
-    def is_text_file(self, file_path: str) -> bool:
-        """Check if a file is a text file using python-magic."""
-        try:
-            if self.should_exclude_path(file_path):
-                return False
-                
+    def _get_magic(self) -> magic.Magic:
+        """Return the libmagic handle of the calling thread, creating it once."""
+        mime = getattr(self._thread_local, "mime", None)
+        if mime is None:
             mime = magic.Magic(mime=True)
-            file_type = mime.from_file(file_path)
-            return file_type.startswith('text/') or any(file_path.endswith(ext) for ext in self.supported_extensions)
+            self._thread_local.mime = mime
+        return mime
+
+    def should_exclude_path(self, path: str, is_dir: bool = False) -> bool:
+        """
+        Check if a path, relative to the repository root, should be excluded
+        based on exclusion patterns (.gitignore files are only applied while
+        walking a repository).
+        """
+        return self.path_filter.is_excluded(path, is_dir)
+
+    def _sniff(self, head: bytes) -> Tuple[str, bool]:
+        """
+        Classify a file from its first bytes: NUL bytes mean binary and valid
+        UTF-8 means text. Anything else is left to libmagic.
+        Returns the deciding tier and whether the file is text.
+        """
+        if b"\0" in head:
+            return "sniff", False
+        try:
+            # Not final, so a multi-byte character cut off at the end is fine
+            codecs.getincrementaldecoder("utf-8")().decode(head)
+            return "sniff", True
+        except UnicodeDecodeError:
+            pass
+        try:
+            return "magic", self._get_magic().from_buffer(head).startswith('text/')
         except Exception:
+            return "magic", False
+
+    def _classify_and_read(self, file_path: str, size: int, read: bool,
+                           timings: Optional[Dict[str, float]] = None) -> Tuple[bool, Optional[str]]:
+        """
+        Classify a file as text or binary, cheapest test first: the size
+        cap, the extension allowlist, a sniff of the first SNIFF_SIZE bytes
+        and, for files that are neither binary nor UTF-8, libmagic on that
+        same buffer. With `read`, the content of text files is read in the
+        same open, continuing after the sniffed bytes.
+
+        Returns:
+            (is text, content or None); the content is "" if it cannot be read
+        """
+        start = time.perf_counter()
+        detected = None
+        tier = None
+        if self.max_file_size and size > self.max_file_size:
+            tier, is_text = "size", False
+        elif file_path.endswith(self._text_suffixes):
+            tier, is_text = "extension", True
+
+        content = None
+        try:
+            if tier is not None and not (is_text and read):
+                return is_text, None
+            with open(file_path, 'rb') as file:
+                head = file.read(self.SNIFF_SIZE)
+                if tier is None:
+                    tier, is_text = self._sniff(head)
+                detected = time.perf_counter()
+                if not (is_text and read):
+                    return is_text, None
+                data = head + file.read()
+            # Files only libmagic recognized as text may use another encoding
+            content = data.decode('utf-8', errors='replace' if tier == "magic" else 'strict')
+            return is_text, content
+        except (OSError, UnicodeDecodeError) as e:
+            if tier is None:
+                tier, is_text = "sniff", False
+            print(f"Error reading file {file_path}: {str(e)}")
+            return is_text, ""
+        finally:
+            end = time.perf_counter()
+            with self._stats_lock:
+                self.detection_counts[tier] += 1
+                if timings is not None:
+                    detected = detected or end
+                    timings["detect"] += detected - start
+                    timings["read"] += end - detected
+
+    def is_text_file(self, file_path: str) -> bool:
+        """
+        Check if a file is a text file (see _classify_and_read for the
+        tiers). Exclusion patterns are applied by the directory walk, not here.
+        """
+        try:
+            size = os.path.getsize(file_path)
+        except OSError:
             return False
+        return self._classify_and_read(file_path, size, read=False)[0]
 
     @staticmethod
     def read_file_content(file_path: str) -> str:
@@ -172,26 +271,163 @@ class FileProcessor:
             print(f"Error reading file {file_path}: {str(e)}")
             return ""
 
-    def process_directory(self, directory_path: str) -> List[Dict[str, str]]:
+    def read_document(self, file_path: str, relative_path: str, stat: Optional[os.stat_result] = None,
+                      timings: Optional[Dict[str, float]] = None) -> Optional[Dict[str, Union[str, int, float]]]:
         """
-        Process all text files in a directory recursively.
-        Returns a list of dictionaries containing file paths and their contents.
+        Read a text file into a document dictionary, classifying it in the
+        same pass (`stat` saves a call if the caller already has it).
+        Returns None if the file is binary, empty or cannot be read.
         """
-        documents = []
-        
+        if stat is None:
+            try:
+                stat = os.stat(file_path)
+            except OSError as e:
+                print(f"Error reading file {file_path}: {str(e)}")
+                return None
+
+        _, content = self._classify_and_read(file_path, stat.st_size, read=True, timings=timings)
+        if not content:
+            return None
+
+        return {
+            "path": relative_path,
+            "content": content,
+            "size": stat.st_size,
+            "mtime": stat.st_mtime
+        }
+
+    def iter_candidate_files(self, directory_path: str) -> Iterator[Tuple[str, str]]:
+        """
+        Walk a directory, skipping excluded directories and files and,
+        with `use_gitignore`, those ignored by its .gitignore files.
+        Yields (file path, path relative to directory_path) for every file found.
+        """
+        path_filter = self.path_filter.for_root(directory_path, self.use_gitignore)
         for root, dirs, files in os.walk(directory_path):
+            relative_root = os.path.relpath(root, directory_path)
+            relative_root = "" if relative_root == "." else relative_root.replace(os.sep, "/")
+            path_filter.enter_directory(relative_root, files)
+
             # Modify dirs in-place to skip excluded directories
-            dirs[:] = [d for d in dirs if not self.should_exclude_path(os.path.join(root, d))]
-            
+            dirs[:] = [d for d in dirs if not path_filter.excludes_entry(relative_root, d, True)]
+
             for file in files:
-                file_path = os.path.join(root, file)
-                if self.is_text_file(file_path):
-                    content = self.read_file_content(file_path)
-                    if content:
-                        relative_path = os.path.relpath(file_path, directory_path)
-                        documents.append({
-                            "path": relative_path,
-                            "content": content
-                        })
-        
-        return documents
+                if path_filter.excludes_entry(relative_root, file, False):
+                    continue
+                relative_path = f"{relative_root}/{file}" if relative_root else file
+                yield os.path.join(root, file), relative_path.replace("/", os.sep)
+
+    def _scan_file(self, file_path: str, relative_path: str,
+                   is_unchanged: Optional[Callable[[str, int, float], bool]],
+                   timings: Dict[str, float]) -> Optional[Tuple[str, Optional[Dict]]]:
+        """Classify and read a single file; runs on a worker thread."""
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return None
+        if is_unchanged is not None and is_unchanged(relative_path, stat.st_size, stat.st_mtime):
+            return relative_path, None
+
+        document = self.read_document(file_path, relative_path, stat, timings)
+        if document:
+            return relative_path, document
+        return None
+
+    def scan_directory(self, directory_path: str,
+                       is_unchanged: Optional[Callable[[str, int, float], bool]] = None
+                       ) -> Iterator[Tuple[str, Optional[Dict]]]:
+        """
+        Concurrently discover and read the text files of a directory.
+
+        The walk runs on the calling thread while a thread pool stats, sniffs
+        and reads files; at most a few files per worker are in flight at once.
+
+        Args:
+            directory_path: Directory to scan recursively
+            is_unchanged: Optional callback (relative path, size, mtime) -> bool;
+                files it accepts are reported without being read
+
+        Yields:
+            (relative path, document) for every text file, in walk order.
+            The document is None for files reported unchanged.
+        """
+        return self._scan(self.iter_candidate_files(directory_path), is_unchanged)
+
+    def scan_paths(self, directory_path: str, relative_paths: Iterable[str],
+                   is_unchanged: Optional[Callable[[str, int, float], bool]] = None
+                   ) -> Iterator[Tuple[str, Optional[Dict]]]:
+        """
+        Like scan_directory, but for the given files of a directory only
+        (e.g. those git reports as changed). Paths that no longer exist, are
+        not files or are excluded, .gitignore files included, are skipped.
+        """
+        path_filter = self.path_filter.for_root(directory_path, self.use_gitignore)
+
+        def candidates() -> Iterator[Tuple[str, str]]:
+            for relative_path in relative_paths:
+                file_path = os.path.join(directory_path, relative_path)
+                if not path_filter.is_excluded(relative_path) and os.path.isfile(file_path):
+                    yield file_path, relative_path.replace("/", os.sep)
+
+        return self._scan(candidates(), is_unchanged)
+
+    def _scan(self, candidates: Iterator[Tuple[str, str]],
+              is_unchanged: Optional[Callable[[str, int, float], bool]]) -> Iterator[Tuple[str, Optional[Dict]]]:
+        start_time = time.perf_counter()
+        stats = {"files_scanned": 0, "documents": 0, "unchanged": 0}
+        self.last_scan_stats = stats
+        self.detection_counts = Counter()
+        max_in_flight = self.max_workers * 4
+        # Time spent walking, and in total across workers detecting and reading files
+        timings = {"walk": 0.0, "detect": 0.0, "read": 0.0}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="file-scan") as executor:
+            pending = deque()
+            exhausted = False
+
+            while pending or not exhausted:
+                while not exhausted and len(pending) < max_in_flight:
+                    walk_start = time.perf_counter()
+                    try:
+                        file_path, relative_path = next(candidates)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    finally:
+                        timings["walk"] += time.perf_counter() - walk_start
+                    stats["files_scanned"] += 1
+                    pending.append(executor.submit(self._scan_file, file_path, relative_path, is_unchanged, timings))
+
+                if pending:
+                    result = pending.popleft().result()
+                    if result is not None:
+                        if result[1] is None:
+                            stats["unchanged"] += 1
+                        else:
+                            stats["documents"] += 1
+                        yield result
+
+        stats["elapsed"] = time.perf_counter() - start_time
+        stats["files_per_sec"] = stats["files_scanned"] / stats["elapsed"] if stats["elapsed"] else 0.0
+        stats["detection"] = {tier: self.detection_counts[tier] for tier in self.DETECTION_TIERS}
+        instrumentation.record("files.walk", timings["walk"], files=stats["files_scanned"])
+        instrumentation.record("files.detect", timings["detect"], workers=self.max_workers, **stats["detection"])
+        instrumentation.record("files.read", timings["read"], documents=stats["documents"])
+
+    def format_scan_stats(self) -> str:
+        """Describe the throughput of the last scan."""
+        stats = self.last_scan_stats
+        summary = (f"Scanned {stats.get('files_scanned', 0)} files in {stats.get('elapsed', 0.0):.2f}s "
+                   f"({stats.get('files_per_sec', 0.0):.1f} files/sec, {self.max_workers} workers)")
+        detection = stats.get("detection")
+        if detection:
+            summary += "; classified by " + ", ".join(f"{tier}: {count}" for tier, count in detection.items())
+        return summary
+
+    def process_directory(self, directory_path: str) -> List[Dict[str, str]]:
+        """
+        Process all text files in a directory recursively.
+        Returns a list of dictionaries containing file paths, their contents,
+        size and modification time.
+        """
+        return [document for _, document in self.scan_directory(directory_path)]
@@ -0,0 +1,244 @@
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, Iterator, Optional, Set, Tuple
+
+from utils.path_filter import PathFilter
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+IN_EXCL_UNLINK = 0x04000000
+IN_ISDIR = 0x40000000
+
+WATCH_MASK = (IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+              | IN_ONLYDIR | IN_DONT_FOLLOW | IN_EXCL_UNLINK)
+EVENT_HEADER = struct.Struct("iIII")
+
+
+class Watcher(ABC):
+    """
+    Reports the files of a directory tree that changed, as paths relative
+    to its root. Paths of deleted directories are reported too; files
+    under them are gone.
+    """
+
+    kind = "watcher"
+
+    def __init__(self, root: str, path_filter: PathFilter):
+        """
+        Args:
+            root: Directory to watch recursively
+            path_filter: Exclusion rules for `root` (see PathFilter.for_root)
+        """
+        self.root = root
+        self.path_filter = path_filter
+
+    @abstractmethod
+    def wait(self, timeout: float) -> Tuple[Set[str], bool]:
+        """
+        Wait up to `timeout` seconds for changes.
+
+        Returns:
+            (changed relative paths, whether the whole tree must be rescanned
+            because events were lost or exclusion rules changed)
+        """
+
+    def close(self) -> None:
+        pass
+
+    def _relevant(self, relative_path: str, is_dir: bool = False) -> bool:
+        return not self.path_filter.is_excluded(relative_path, is_dir)
+
+    def _reset_filter(self) -> None:
+        # .gitignore rules are cached, so changed ones need a fresh filter
+        self.path_filter = self.path_filter.for_root(self.root, self.path_filter.use_gitignore)
+
+    def batches(self, debounce: float = 0.5, max_delay: float = 10.0,
+                stop: Optional[threading.Event] = None) -> Iterator[Tuple[Set[str], bool]]:
+        """
+        Yield changes in batches: after the first change, events are
+        coalesced until none arrived for `debounce` seconds, or for at most
+        `max_delay` seconds in total, so a burst such as a branch switch
+        becomes one batch. Runs until `stop` is set.
+        """
+        while stop is None or not stop.is_set():
+            paths, rescan = self.wait(1.0)
+            if not paths and not rescan:
+                continue
+            first = time.monotonic()
+            while time.monotonic() - first < max_delay:
+                more, more_rescan = self.wait(debounce)
+                if not more and not more_rescan:
+                    break
+                paths |= more
+                rescan = rescan or more_rescan
+            yield paths, rescan
+
+
+class InotifyWatcher(Watcher):
+    """Linux inotify, through libc with ctypes; one watch per directory."""
+
+    kind = "inotify"
+
+    def __init__(self, root: str, path_filter: PathFilter):
+        super().__init__(root, path_filter)
+        libc_name = ctypes.util.find_library("c") or "libc.so.6"
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(self._libc, "inotify_init1"):
+            raise OSError(errno.ENOSYS, "inotify is not available")
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._directories: Dict[int, str] = {}
+        try:
+            self._watch_tree("")
+        except OSError:
+            self.close()
+            raise
+
+    def _add_watch(self, relative_dir: str) -> None:
+        path = os.path.join(self.root, relative_dir) if relative_dir else self.root
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            error = ctypes.get_errno()
+            if error in (errno.ENOENT, errno.ENOTDIR, errno.EACCES):
+                return
+            # ENOSPC: the fs.inotify.max_user_watches limit is reached
+            raise OSError(error, f"Cannot watch {path}: {os.strerror(error)}")
+        self._directories[wd] = relative_dir
+
+    def _watch_tree(self, relative_dir: str) -> Set[str]:
+        """Watch a directory and the directories under it; returns the files found."""
+        files = set()
+        top = os.path.join(self.root, relative_dir) if relative_dir else self.root
+        for directory, dirs, names in os.walk(top):
+            relative = os.path.relpath(directory, self.root)
+            relative = "" if relative == "." else relative
+            dirs[:] = [d for d in dirs if self._relevant(os.path.join(relative, d), True)]
+            self._add_watch(relative)
+            files.update(os.path.join(relative, name) for name in names
+                         if self._relevant(os.path.join(relative, name)))
+        return files
+
+    def _read_events(self) -> Tuple[Set[str], bool]:
+        changed, rescan = set(), False
+        while True:
+            try:
+                data = os.read(self._fd, 65536)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+                offset += EVENT_HEADER.size
+                name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+                offset += length
+
+                if mask & IN_Q_OVERFLOW:
+                    rescan = True
+                    continue
+                if mask & IN_IGNORED:
+                    self._directories.pop(wd, None)
+                    continue
+                directory = self._directories.get(wd)
+                if directory is None or not name:
+                    continue
+                relative_path = os.path.join(directory, name) if directory else name
+                is_dir = bool(mask & IN_ISDIR)
+                if not self._relevant(relative_path, is_dir):
+                    continue
+                if name == PathFilter.GITIGNORE:
+                    self._reset_filter()
+                    rescan = True
+                if is_dir and mask & (IN_CREATE | IN_MOVED_TO):
+                    # Files may have been written before the watch was added
+                    changed |= self._watch_tree(relative_path)
+                else:
+                    changed.add(relative_path)
+        return changed, rescan
+
+    def wait(self, timeout: float) -> Tuple[Set[str], bool]:
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return set(), False
+        return self._read_events()
+
+    def close(self) -> None:
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+class PollingWatcher(Watcher):
+    """Compares the size and mtime of every file at a fixed interval."""
+
+    kind = "polling"
+
+    def __init__(self, root: str, path_filter: PathFilter, interval: float = 2.0):
+        super().__init__(root, path_filter)
+        self.interval = interval
+        self._snapshot = self._take_snapshot()
+        self._next_poll = time.monotonic() + interval
+
+    def _take_snapshot(self) -> Dict[str, Tuple[int, int]]:
+        snapshot = {}
+        for directory, dirs, names in os.walk(self.root):
+            relative = os.path.relpath(directory, self.root)
+            relative = "" if relative == "." else relative
+            dirs[:] = [d for d in dirs if self._relevant(os.path.join(relative, d), True)]
+            for name in names:
+                relative_path = os.path.join(relative, name)
+                if not self._relevant(relative_path):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(directory, name))
+                except OSError:
+                    continue
+                snapshot[relative_path] = (stat.st_size, stat.st_mtime_ns)
+        return snapshot
+
+    def wait(self, timeout: float) -> Tuple[Set[str], bool]:
+        delay = self._next_poll - time.monotonic()
+        if delay > timeout:
+            time.sleep(timeout)
+            return set(), False
+        time.sleep(max(delay, 0))
+        self._next_poll = time.monotonic() + self.interval
+
+        old = self._snapshot
+        self._reset_filter()
+        self._snapshot = self._take_snapshot()
+        changed = {path for path, entry in self._snapshot.items() if old.get(path) != entry}
+        changed |= old.keys() - self._snapshot.keys()
+        rescan = any(os.path.basename(path) == PathFilter.GITIGNORE for path in changed)
+        return changed, rescan
+
+
+def create_watcher(root: str, path_filter: PathFilter, polling: bool = False,
+                   interval: float = 2.0) -> Watcher:
+    """
+    Watch `root` with inotify where available, otherwise (or with
+    `polling`) by polling every `interval` seconds.
+    """
+    if not polling and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(root, path_filter)
+        except OSError as e:
+            print(f"inotify unavailable ({str(e)}), polling every {interval:g}s instead")
+    return PollingWatcher(root, path_filter, interval)
@@ -0,0 +1,100 @@
+import os
+import subprocess
+from typing import List, NamedTuple, Optional, Set
+
+GIT_TIMEOUT = 60
+
+
+class GitState(NamedTuple):
+    """Commit checked out in a working tree and the paths that differ from it."""
+    commit: str
+    # Modified, added, deleted and untracked paths, relative to the directory
+    dirty: Set[str]
+
+
+class GitChanges(NamedTuple):
+    """Paths, relative to the directory, that may differ from an earlier state."""
+    changed: Set[str]
+    deleted: Set[str]
+
+
+def _git(directory: str, *args: str) -> Optional[bytes]:
+    """Run a local git command in `directory`; None if git is missing or the command fails."""
+    try:
+        result = subprocess.run(["git", "-C", directory, *args], capture_output=True, timeout=GIT_TIMEOUT)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return result.stdout if result.returncode == 0 else None
+
+
+def _paths(output: bytes) -> List[str]:
+    return [os.fsdecode(path) for path in output.split(b"\0") if path]
+
+
+def _diff(directory: str, commit: str) -> Optional[GitChanges]:
+    """Tracked files that differ between `commit` and the working tree, staged or not."""
+    output = _git(directory, "diff", "--name-status", "-z", "-M", "--relative", "--no-ext-diff", commit, "--")
+    if output is None:
+        return None
+    changes = GitChanges(set(), set())
+    fields = _paths(output)
+    i = 0
+    while i < len(fields):
+        status = fields[i][0]
+        if status in "RC":
+            # Renames and copies list the old path, then the new one
+            old, new = fields[i + 1], fields[i + 2]
+            if status == "R":
+                changes.deleted.add(old)
+            changes.changed.add(new)
+            i += 3
+        else:
+            (changes.deleted if status == "D" else changes.changed).add(fields[i + 1])
+            i += 2
+    return changes
+
+
+def _untracked(directory: str) -> Optional[Set[str]]:
+    # Only .gitignore files, as PathFilter reads: files ignored through
+    # .git/info/exclude or core.excludesFile are indexed, so they are listed
+    output = _git(directory, "ls-files", "--others", "--exclude-per-directory=.gitignore", "-z")
+    return set(_paths(output)) if output is not None else None
+
+
+def git_state(directory: str) -> Optional[GitState]:
+    """
+    The commit checked out in the git working tree containing `directory`
+    and the paths under it that differ from that commit. None if it is not
+    in a git repository (with at least one commit) or git is not installed.
+    """
+    output = _git(directory, "rev-parse", "--verify", "-q", "HEAD^{commit}")
+    if not output:
+        return None
+    commit = output.decode().strip()
+    changes = _diff(directory, commit)
+    untracked = _untracked(directory)
+    if changes is None or untracked is None:
+        return None
+    # Deleted paths too: restoring one later leaves no diff against the commit
+    return GitState(commit, changes.changed | changes.deleted | untracked)
+
+
+def changes_since(directory: str, state: GitState) -> Optional[GitChanges]:
+    """
+    Paths under `directory` that may have changed since `state` was taken:
+    files changed between its commit and the working tree (including
+    uncommitted changes), untracked files, and files that were dirty
+    (changed or deleted) back then, since what was indexed for them is not
+    the committed content. Renamed files count as deleted and changed.
+
+    Returns None if the change set cannot be computed, e.g. the commit no
+    longer exists after a rebase; callers should fall back to a full walk.
+    """
+    if _git(directory, "cat-file", "-e", f"{state.commit}^{{commit}}") is None:
+        return None
+    changes = _diff(directory, state.commit)
+    untracked = _untracked(directory)
+    if changes is None or untracked is None:
+        return None
+    changed = changes.changed | untracked | set(state.dirty)
+    return GitChanges(changed, changes.deleted - changed)
@@ -0,0 +1,296 @@
+import json
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+_sinks: List["SpanSink"] = []
+_local = threading.local()
+_children_lock = threading.Lock()
+
+
+class Span:
+    """A timed stage, with the stages it contained as children."""
+
+    __slots__ = ("name", "attributes", "start", "duration", "children", "parent", "thread", "_started")
+
+    def __init__(self, name: str, attributes: Dict, parent: Optional["Span"]):
+        self.name = name
+        self.attributes = attributes
+        self.parent = parent
+        self.children: List[Span] = []
+        self.thread = threading.current_thread().name
+        self.start = time.time()
+        self.duration = 0.0
+        self._started = None
+
+    def set(self, **attributes) -> None:
+        """Add attributes, e.g. result counts only known at the end of the stage."""
+        self.attributes.update(attributes)
+
+    def __enter__(self) -> "Span":
+        _stack().append(self)
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.duration = time.perf_counter() - self._started
+        if exc_type is not None:
+            self.attributes["error"] = exc_type.__name__
+        stack = _stack()
+        if stack and stack[-1] is self:
+            stack.pop()
+        _finish(self)
+
+    def to_dict(self) -> Dict:
+        return {
+            "name": self.name,
+            "start": self.start,
+            "duration_ms": round(self.duration * 1000, 3),
+            "thread": self.thread,
+            "attributes": self.attributes,
+            "children": [child.to_dict() for child in self.children],
+        }
+
+
+class _NoopSpan:
+    """Stands in for a span while no sink is registered."""
+
+    def set(self, **attributes) -> None:
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class _Attached:
+    """Makes a span the current parent on the calling thread."""
+
+    def __init__(self, parent: Optional[Span]):
+        self.parent = parent
+
+    def __enter__(self) -> None:
+        if self.parent is not None:
+            _stack().append(self.parent)
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        stack = _stack()
+        if self.parent is not None and stack and stack[-1] is self.parent:
+            stack.pop()
+
+
+def _stack() -> List[Span]:
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+def _finish(span: Span) -> None:
+    if span.parent is not None:
+        with _children_lock:
+            span.parent.children.append(span)
+        return
+    for sink in list(_sinks):
+        sink.record(span)
+
+
+def enabled() -> bool:
+    """Check whether any sink is registered."""
+    return bool(_sinks)
+
+
+def current_span() -> Optional[Span]:
+    """The innermost open span of the calling thread, if any."""
+    stack = getattr(_local, "stack", None)
+    return stack[-1] if stack else None
+
+
+def span(name: str, **attributes):
+    """
+    Time a block as a span: `with span("vector_store.search", k=5): ...`.
+
+    Spans opened while another is open on the same thread become its
+    children, and each finished tree is handed to every registered sink.
+    With no sink registered a shared no-op object is returned, so
+    instrumented code costs next to nothing.
+    """
+    if not _sinks:
+        return _NOOP_SPAN
+    return Span(name, attributes, current_span())
+
+
+def attach(parent: Optional[Span]) -> _Attached:
+    """Continue the tree of `parent` (from current_span() on another thread) on this thread."""
+    return _Attached(parent if _sinks else None)
+
+
+def record(name: str, seconds: float, **attributes) -> None:
+    """Add a finished span of the given duration under the current span."""
+    if not _sinks:
+        return
+    finished = Span(name, attributes, current_span())
+    finished.start -= seconds
+    finished.duration = seconds
+    _finish(finished)
+
+
+def add_sink(sink: "SpanSink") -> "SpanSink":
+    _sinks.append(sink)
+    return sink
+
+
+def remove_sink(sink: "SpanSink") -> None:
+    if sink in _sinks:
+        _sinks.remove(sink)
+
+
+def find_sink(sink_type: type) -> Optional["SpanSink"]:
+    """Return the first registered sink of a type."""
+    return next((sink for sink in _sinks if isinstance(sink, sink_type)), None)
+
+
+class SpanSink(ABC):
+    """Receives every finished tree of spans (its root span)."""
+
+    @abstractmethod
+    def record(self, span: Span) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class LogSink(SpanSink):
+    """Logs each span of a tree as one line, indented by depth."""
+
+    def __init__(self, logger: Optional[logging.Logger] = None, level: int = logging.INFO):
+        self.logger = logger or logging.getLogger("rag_code.spans")
+        self.level = level
+
+    def record(self, span: Span) -> None:
+        def log(node: Span, depth: int) -> None:
+            attributes = " ".join(f"{key}={value}" for key, value in node.attributes.items())
+            self.logger.log(self.level, "%s%s %.1fms %s", "  " * depth, node.name, node.duration * 1000, attributes)
+            for child in node.children:
+                log(child, depth + 1)
+        log(span, 0)
+
+
+class JsonSink(SpanSink):
+    """Appends each tree of spans to a file as one JSON line."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "a")
+
+    def record(self, span: Span) -> None:
+        line = json.dumps(span.to_dict(), default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class PrometheusSink(SpanSink):
+    """
+    Aggregates span durations per name into Prometheus histograms, exported
+    in the text exposition format by `export()`.
+    """
+
+    BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0, 120.0)
+
+    def __init__(self, path: Optional[str] = None, prefix: str = "rag_code"):
+        """
+        Args:
+            path: File the metrics are written to on close()
+            prefix: Prefix of the metric names
+        """
+        self.path = path
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._counts = defaultdict(lambda: [0] * (len(self.BUCKETS) + 1))
+        self._sums = defaultdict(float)
+
+    def record(self, span: Span) -> None:
+        with self._lock:
+            self._add(span)
+
+    def _add(self, span: Span) -> None:
+        counts = self._counts[span.name]
+        for i, bound in enumerate(self.BUCKETS):
+            if span.duration <= bound:
+                counts[i] += 1
+        counts[-1] += 1
+        self._sums[span.name] += span.duration
+        for child in span.children:
+            self._add(child)
+
+    def export(self) -> str:
+        metric = f"{self.prefix}_span_duration_seconds"
+        lines = [f"# HELP {metric} Duration of instrumented stages.", f"# TYPE {metric} histogram"]
+        with self._lock:
+            for name in sorted(self._counts):
+                counts = self._counts[name]
+                for bound, count in zip(self.BUCKETS, counts):
+                    lines.append(f'{metric}_bucket{{span="{name}",le="{bound}"}} {count}')
+                lines.append(f'{metric}_bucket{{span="{name}",le="+Inf"}} {counts[-1]}')
+                lines.append(f'{metric}_sum{{span="{name}"}} {self._sums[name]:.6f}')
+                lines.append(f'{metric}_count{{span="{name}"}} {counts[-1]}')
+        return "\n".join(lines) + "\n"
+
+    def close(self) -> None:
+        if self.path:
+            with open(self.path, "w") as f:
+                f.write(self.export())
+
+
+class TreeSink(SpanSink):
+    """
+    Keeps the span trees of a run and formats them as one timing tree,
+    merging spans with the same name and parent (e.g. embedding batches).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.roots: List[Span] = []
+
+    def record(self, span: Span) -> None:
+        with self._lock:
+            self.roots.append(span)
+
+    @staticmethod
+    def _merge(spans: List[Span]) -> List[Dict]:
+        merged = {}
+        for node in spans:
+            entry = merged.setdefault(node.name, {"name": node.name, "count": 0, "seconds": 0.0, "children": []})
+            entry["count"] += 1
+            entry["seconds"] += node.duration
+            entry["children"].extend(node.children)
+        for entry in merged.values():
+            entry["children"] = TreeSink._merge(entry["children"])
+        return list(merged.values())
+
+    def format_tree(self) -> str:
+        lines = []
+
+        def add(entries: List[Dict], depth: int) -> None:
+            for entry in entries:
+                count = f" x{entry['count']}" if entry["count"] > 1 else ""
+                lines.append(f"{'  ' * depth}{entry['name']}{count}  {entry['seconds'] * 1000:.1f}ms")
+                add(entry["children"], depth + 1)
+
+        with self._lock:
+            add(self._merge(self.roots), 0)
+        return "\n".join(lines)
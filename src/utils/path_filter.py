@@ -0,0 +1,267 @@
+import fnmatch
+import os
+import re
+from typing import Dict, Iterable, List, Optional, Pattern, Tuple
+
+GLOB_CHARS = re.compile(r"[*?\[]")
+
+
+class _NameMatcher:
+    """
+    Matches names against shell globs. Literal names and "*.ext" globs are
+    looked up in sets, other "*suffix", "prefix*" and "*infix*" globs are
+    checked with str.endswith, str.startswith and substring tests, and only
+    the remaining globs go through one combined regex.
+    """
+
+    def __init__(self, patterns: Iterable[str]):
+        patterns = set(patterns)
+        self.names = {pattern for pattern in patterns if not GLOB_CHARS.search(pattern)}
+        suffixes = {pattern[1:] for pattern in patterns
+                    if pattern.startswith("*") and not GLOB_CHARS.search(pattern[1:])}
+        self.extensions = {suffix for suffix in suffixes if suffix.rfind(".") == 0}
+        self.suffixes = tuple(sorted(suffixes - self.extensions))
+        self.prefixes = tuple(sorted(pattern[:-1] for pattern in patterns
+                                     if pattern.endswith("*") and not GLOB_CHARS.search(pattern[:-1])))
+        self.infixes = tuple(sorted(pattern[1:-1] for pattern in patterns
+                                    if len(pattern) > 2 and pattern[0] == pattern[-1] == "*"
+                                    and not GLOB_CHARS.search(pattern[1:-1])))
+        globs = sorted(pattern for pattern in patterns if GLOB_CHARS.search(pattern)
+                       and pattern[1:] not in suffixes and pattern[:-1] not in self.prefixes
+                       and pattern[1:-1] not in self.infixes)
+        self.regex = re.compile("|".join(fnmatch.translate(pattern) for pattern in globs)) if globs else None
+
+    def match(self, name: str) -> bool:
+        if name in self.names:
+            return True
+        dot = name.rfind(".")
+        if dot >= 0 and name[dot:] in self.extensions:
+            return True
+        if name.endswith(self.suffixes) or name.startswith(self.prefixes):
+            return True
+        for infix in self.infixes:
+            if infix in name:
+                return True
+        return self.regex is not None and self.regex.match(name) is not None
+
+
+def _translate_gitignore(pattern: str) -> str:
+    """Translate one gitignore pattern (without "!" and trailing "/") into a regex."""
+    # A slash anywhere but at the end anchors the pattern to the .gitignore's directory
+    anchored = "/" in pattern
+    pattern = pattern.lstrip("/")
+    out = [] if anchored else ["(?:.*/)?"]
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i) and i == 0:
+            out.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("/**/", i):
+            out.append("/(?:.*/)?")
+            i += 4
+        elif pattern.startswith("/**", i) and i + 3 == len(pattern):
+            out.append("/.*")
+            i += 3
+        elif pattern[i] == "*":
+            out.append("[^/]*")
+            while i < len(pattern) and pattern[i] == "*":
+                i += 1
+        elif pattern[i] == "?":
+            out.append("[^/]")
+            i += 1
+        elif pattern[i] == "[":
+            end = pattern.find("]", i + 2)
+            if end == -1:
+                out.append(re.escape("["))
+                i += 1
+            else:
+                body = pattern[i + 1:end]
+                if body[0] == "!":
+                    body = "^" + body[1:]
+                out.append("[" + body.replace("\\", "\\\\") + "]")
+                i = end + 1
+        elif pattern[i] == "\\" and i + 1 < len(pattern):
+            out.append(re.escape(pattern[i + 1]))
+            i += 2
+        else:
+            out.append(re.escape(pattern[i]))
+            i += 1
+    return "".join(out)
+
+
+class GitIgnoreRules:
+    """
+    The rules of one .gitignore file, compiled into two regexes (one for
+    directories, one for files, which dir-only rules do not apply to).
+    Rules are tried last first, so the first alternative that matches is
+    the rule git would apply.
+    """
+
+    def __init__(self, lines: Iterable[str]):
+        self.rules: List[Tuple[str, bool, bool]] = []
+        for line in lines:
+            line = line.rstrip("\n")
+            if line.endswith("\\ "):
+                line = line[:-2].rstrip() + "\\ "
+            else:
+                line = line.rstrip()
+            if not line or line.startswith("#"):
+                continue
+            negate = line.startswith("!")
+            if negate:
+                line = line[1:]
+            elif line.startswith(("\\!", "\\#")):
+                line = line[1:]
+            dir_only = line.endswith("/")
+            line = line.rstrip("/")
+            if line:
+                self.rules.append((_translate_gitignore(line), negate, dir_only))
+
+        self._dirs = self._compile([i for i in range(len(self.rules))])
+        self._files = self._compile([i for i, (_, _, dir_only) in enumerate(self.rules) if not dir_only])
+
+    def _compile(self, indexes: List[int]) -> Optional[Pattern]:
+        if not indexes:
+            return None
+        return re.compile("|".join(f"(?P<r{i}>{self.rules[i][0]})" for i in reversed(indexes)))
+
+    @classmethod
+    def from_file(cls, path: str) -> "GitIgnoreRules":
+        with open(path, encoding="utf-8", errors="replace") as f:
+            return cls(f.readlines())
+
+    def match(self, relative_path: str, is_dir: bool) -> Optional[bool]:
+        """
+        Match a "/"-separated path relative to the .gitignore's directory.
+        Returns True if it is ignored, False if a "!" rule re-includes it and
+        None if no rule matches.
+        """
+        regex = self._dirs if is_dir else self._files
+        found = regex.fullmatch(relative_path) if regex is not None else None
+        if found is None:
+            return None
+        return not self.rules[int(found.lastgroup[1:])][1]
+
+
+class PathFilter:
+    """
+    Compiled exclusion patterns, optionally combined with the .gitignore
+    files of a repository.
+
+    Directory patterns apply to every component of a path and file patterns
+    to file names. Plain names and "*.ext" patterns are looked up in a set
+    and a tuple of suffixes; the remaining globs are combined into one
+    regex. Patterns containing "/" (e.g. "docs/_build") match consecutive
+    components. Paths are relative to the repository root, so the
+    directories above it (e.g. a repository under /tmp) never exclude it.
+    """
+
+    GITIGNORE = ".gitignore"
+
+    def __init__(self, excluded_dirs: Iterable[str] = (), excluded_files: Iterable[str] = (),
+                 root: Optional[str] = None, use_gitignore: bool = True):
+        """
+        Args:
+            excluded_dirs: Directory names or globs
+            excluded_files: File names or globs
+            root: Repository root; its .gitignore files are honored if `use_gitignore`
+            use_gitignore: Honor .gitignore files under `root`
+        """
+        patterns = {pattern.strip("/") for pattern in excluded_dirs}
+        nested = {pattern for pattern in patterns if "/" in pattern}
+        self._dirs = _NameMatcher(patterns - nested)
+        self._files = _NameMatcher(excluded_files)
+        self._nested_regex = (re.compile("|".join(f"(?:^|/){_translate_gitignore(pattern)}(?:/|$)"
+                                                  for pattern in sorted(nested)))
+                              if nested else None)
+
+        self.root = root
+        self.use_gitignore = use_gitignore and root is not None
+        # Rules of each directory's .gitignore (None if it has none), and
+        # the chain of rules that applies inside each directory, deepest first
+        self._gitignores: Dict[str, Optional[GitIgnoreRules]] = {}
+        self._chains: Dict[str, List[Tuple[str, GitIgnoreRules]]] = {}
+
+    def for_root(self, root: str, use_gitignore: bool = True) -> "PathFilter":
+        """A filter with the same compiled patterns for the repository at `root`."""
+        clone = object.__new__(PathFilter)
+        clone.__dict__.update(self.__dict__)
+        clone.root = root
+        clone.use_gitignore = use_gitignore
+        clone._gitignores = {}
+        clone._chains = {}
+        return clone
+
+    def _excluded_name(self, name: str, is_dir: bool) -> bool:
+        return self._dirs.match(name) or (not is_dir and self._files.match(name))
+
+    def _gitignore_rules(self, directory: str, present: Optional[bool] = None) -> Optional[GitIgnoreRules]:
+        """The .gitignore rules of a directory ("" for the root), loaded once."""
+        if directory not in self._gitignores:
+            path = os.path.join(self.root, directory, self.GITIGNORE)
+            rules = None
+            if present or (present is None and os.path.isfile(path)):
+                try:
+                    rules = GitIgnoreRules.from_file(path)
+                except OSError:
+                    pass
+            self._gitignores[directory] = rules
+        return self._gitignores[directory]
+
+    def _chain(self, directory: str) -> List[Tuple[str, GitIgnoreRules]]:
+        """(base directory, rules) of every .gitignore applying inside `directory`, deepest first."""
+        chain = self._chains.get(directory)
+        if chain is None:
+            parent = self._chain(directory.rpartition("/")[0]) if directory else []
+            rules = self._gitignore_rules(directory)
+            chain = [(directory, rules)] + parent if rules is not None else parent
+            self._chains[directory] = chain
+        return chain
+
+    def _ignored(self, directory: str, relative_path: str, is_dir: bool) -> bool:
+        for base, rules in self._chain(directory):
+            matched = rules.match(relative_path[len(base) + 1:] if base else relative_path, is_dir)
+            if matched is not None:
+                return matched
+        return False
+
+    def excludes_entry(self, directory: str, name: str, is_dir: bool) -> bool:
+        """
+        Check one entry of a directory whose ancestors were already checked,
+        as a top-down walk does.
+
+        Args:
+            directory: "/"-separated path of the directory relative to the root ("" for the root)
+            name: Name of the entry
+            is_dir: Whether the entry is a directory
+        """
+        if self._excluded_name(name, is_dir):
+            return True
+        relative_path = f"{directory}/{name}" if directory else name
+        if self._nested_regex is not None and self._nested_regex.search(relative_path):
+            return True
+        return self.use_gitignore and self._ignored(directory, relative_path, is_dir)
+
+    def enter_directory(self, directory: str, names: Iterable[str]) -> None:
+        """Tell the filter which files a walked directory holds, saving a stat for its .gitignore."""
+        if self.use_gitignore and directory not in self._gitignores:
+            self._gitignore_rules(directory, present=self.GITIGNORE in names)
+
+    def is_excluded(self, relative_path: str, is_dir: bool = False) -> bool:
+        """Check a path relative to the root, including every directory above it."""
+        relative_path = relative_path.replace(os.sep, "/")
+        parts = [part for part in relative_path.split("/") if part and part != "."]
+        last = len(parts) - 1
+        for i, part in enumerate(parts):
+            if self._excluded_name(part, is_dir or i < last):
+                return True
+        if self._nested_regex is not None and self._nested_regex.search("/".join(parts)):
+            return True
+        if self.use_gitignore:
+            directory = ""
+            for i, part in enumerate(parts):
+                path = f"{directory}/{part}" if directory else part
+                if self._ignored(directory, path, is_dir or i < last):
+                    return True
+                directory = path
+        return False
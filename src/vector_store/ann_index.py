@@ -0,0 +1,182 @@
+import json
+import math
+import os
+from typing import Any, Dict, Optional
+
+import faiss
+import numpy as np
+
+INDEX_TYPES = ("auto", "flat", "hnsw", "ivf", "ivfpq")
+
+# Corpus sizes at which "auto" switches to an approximate index
+AUTO_HNSW_MIN_VECTORS = 50_000
+AUTO_IVFPQ_MIN_VECTORS = 1_000_000
+
+# Largest sample used to train IVF centroids and PQ codebooks
+MAX_TRAINING_VECTORS = 256 * 1024
+
+
+class IndexConfig:
+    """
+    FAISS index type of a vector store plus its build and search parameters.
+
+    Stored with each generation of the index as index_config.json so
+    updates rebuild the same kind of index and searches default to the
+    tuned parameters.
+    """
+
+    FILENAME = "index_config.json"
+
+    def __init__(self, index_type: str = "auto", nlist: Optional[int] = None,
+                 pq_m: Optional[int] = None, hnsw_m: int = 32, ef_construction: int = 80,
+                 nprobe: int = 16, ef_search: int = 64):
+        """
+        Initialize an index configuration.
+
+        Args:
+            index_type: One of INDEX_TYPES; "auto" picks by corpus size
+            nlist: Number of IVF centroids (default: about 4 * sqrt(N))
+            pq_m: Number of PQ sub-quantizers (default: one per 8 dimensions)
+            hnsw_m: Neighbors per HNSW node
+            ef_construction: HNSW build-time search depth
+            nprobe: IVF lists visited per query
+            ef_search: HNSW search depth per query
+        """
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"Unsupported index type: {index_type}")
+        self.index_type = index_type
+        self.nlist = nlist
+        self.pq_m = pq_m
+        self.hnsw_m = hnsw_m
+        self.ef_construction = ef_construction
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(self.__dict__)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "IndexConfig":
+        return cls(**{key: value for key, value in data.items() if value is not None})
+
+    @classmethod
+    def load(cls, directory: str) -> "IndexConfig":
+        """Load the configuration of a store; stores without one use flat indexes."""
+        try:
+            with open(os.path.join(directory, cls.FILENAME), 'r') as f:
+                return cls.from_dict(json.load(f))
+        except FileNotFoundError:
+            return cls("flat")
+
+    def save(self, directory: str) -> None:
+        # Replaced in one step, since searches in other processes may be loading it
+        path = os.path.join(directory, self.FILENAME)
+        with open(path + ".tmp", 'w') as f:
+            json.dump(self.to_dict(), f, indent=4)
+        os.replace(path + ".tmp", path)
+
+    def resolve_type(self, vector_count: int) -> str:
+        """Return the concrete index type to build for a corpus size."""
+        if self.index_type != "auto":
+            return self.index_type
+        if vector_count < AUTO_HNSW_MIN_VECTORS:
+            return "flat"
+        if vector_count < AUTO_IVFPQ_MIN_VECTORS:
+            return "hnsw"
+        return "ivfpq"
+
+
+def _default_nlist(vector_count: int) -> int:
+    # FAISS wants at least 39 training points per centroid
+    return max(1, min(int(4 * math.sqrt(vector_count)), vector_count // 39))
+
+
+def _default_pq_m(dimension: int) -> int:
+    # One 8-bit code per 8 dimensions, using a divisor of the dimension
+    m = max(1, dimension // 8)
+    while dimension % m:
+        m -= 1
+    return m
+
+
+def index_type_of(index: faiss.Index) -> str:
+    """Return the INDEX_TYPES name of a built index."""
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivfpq"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivf"
+    return "flat"
+
+
+def build_index(vectors: np.ndarray, config: IndexConfig) -> faiss.Index:
+    """
+    Build an L2 index of the configured type over the given vectors.
+    Row i of `vectors` keeps position i in the index.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    count, dimension = vectors.shape
+    # Quantizers cannot be trained on an empty corpus
+    index_type = config.resolve_type(count) if count else "flat"
+
+    if index_type == "flat":
+        index = faiss.IndexFlatL2(dimension)
+    elif index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dimension, config.hnsw_m)
+        index.hnsw.efConstruction = config.ef_construction
+    else:
+        nlist = min(config.nlist or _default_nlist(count), max(1, count))
+        quantizer = faiss.IndexFlatL2(dimension)
+        if index_type == "ivf":
+            index = faiss.IndexIVFFlat(quantizer, dimension, nlist)
+        else:
+            # 8-bit codes need 256 training points; small corpora get fewer bits
+            nbits = max(1, min(8, int(math.log2(count))))
+            index = faiss.IndexIVFPQ(quantizer, dimension, nlist, config.pq_m or _default_pq_m(dimension), nbits)
+
+        training = vectors
+        if count > MAX_TRAINING_VECTORS:
+            sample = np.random.default_rng(0).choice(count, MAX_TRAINING_VECTORS, replace=False)
+            training = vectors[np.sort(sample)]
+        index.train(training)
+
+    if count:
+        index.add(vectors)
+    return index
+
+
+def reconstruct_all(index: faiss.Index) -> np.ndarray:
+    """Return every vector of an index in position order (decoded for PQ)."""
+    if isinstance(index, faiss.IndexIVF):
+        index.make_direct_map()
+    if index.ntotal == 0:
+        return np.zeros((0, index.d), dtype=np.float32)
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def to_flat(index: faiss.Index) -> faiss.Index:
+    """Return a flat copy of an index, keeping vector positions."""
+    return build_index(reconstruct_all(index), IndexConfig("flat"))
+
+
+def search_parameters(index: faiss.Index, nprobe: Optional[int] = None,
+                      ef_search: Optional[int] = None,
+                      selector: Optional[faiss.IDSelector] = None) -> Optional[faiss.SearchParameters]:
+    """
+    Build per-query search parameters for an index. Passing them to
+    index.search leaves the shared index untouched, so concurrent queries
+    can use different settings. `selector` restricts the positions that
+    can be returned.
+    """
+    if isinstance(index, faiss.IndexIVF) and (nprobe or selector is not None):
+        params = faiss.SearchParametersIVF(nprobe=min(nprobe or index.nprobe, index.nlist))
+    elif isinstance(index, faiss.IndexHNSW) and (ef_search or selector is not None):
+        params = faiss.SearchParametersHNSW(efSearch=ef_search or index.hnsw.efSearch)
+    elif selector is not None:
+        params = faiss.SearchParameters()
+    else:
+        return None
+    if selector is not None:
+        params.sel = selector
+    return params
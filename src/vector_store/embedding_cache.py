@@ -0,0 +1,217 @@
+import hashlib
+import os
+import re
+import sqlite3
+import time
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+class EmbeddingCache:
+    """
+    On-disk cache of chunk embeddings keyed by (model name, chunk text hash).
+
+    Vectors live in a memory-mapped float32 file preallocated for
+    ``max_entries`` rows; a SQLite index maps text hashes to rows and keeps
+    the last access time used for LRU eviction once the file is full. The
+    cache is meant to be shared by every project using the same model.
+    """
+
+    VECTORS_FILE = "vectors.f32"
+    INDEX_FILE = "index.sqlite"
+
+    def __init__(self, cache_dir: str, model_name: str, max_entries: int = 500_000):
+        """
+        Initialize the cache for one embeddings model.
+
+        Args:
+            cache_dir: Root directory shared by all cached models
+            model_name: Name of the embeddings model the vectors belong to
+            max_entries: Maximum number of vectors kept before evicting
+        """
+        self.model_name = model_name
+        self.directory = os.path.join(cache_dir, re.sub(r'[^A-Za-z0-9_.-]', '_', model_name))
+        self.vectors_path = os.path.join(self.directory, self.VECTORS_FILE)
+        self.max_entries = max_entries
+        os.makedirs(self.directory, exist_ok=True)
+
+        self.connection = sqlite3.connect(
+            os.path.join(self.directory, self.INDEX_FILE),
+            timeout=30,
+            isolation_level=None,
+            check_same_thread=False
+        )
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS entries (
+                hash TEXT PRIMARY KEY,
+                row INTEGER NOT NULL UNIQUE,
+                last_used REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+        """)
+        self._vectors = None
+
+    @staticmethod
+    def hash_text(text: str) -> str:
+        """Return the cache key of a chunk text."""
+        return hashlib.sha256(text.encode('utf-8', errors='surrogatepass')).hexdigest()
+
+    def _get_meta(self, key: str) -> Optional[int]:
+        row = self.connection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _open_vectors(self, dimension: Optional[int] = None) -> Optional[np.memmap]:
+        """Map the vector file, creating it on first write."""
+        if self._vectors is not None:
+            return self._vectors
+
+        stored_dimension = self._get_meta("dimension")
+        capacity = self._get_meta("capacity")
+        if stored_dimension is None:
+            if dimension is None:
+                return None
+            capacity = self.max_entries
+            # Truncating creates a sparse file, so the preallocation is free
+            with open(self.vectors_path, 'wb') as f:
+                f.truncate(capacity * dimension * 4)
+            self.connection.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('dimension', ?), ('capacity', ?)",
+                (dimension, capacity)
+            )
+            stored_dimension = dimension
+
+        self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode='r+',
+                                  shape=(capacity, stored_dimension))
+        return self._vectors
+
+    def _lookup(self, hashes: Sequence[str]) -> List[tuple]:
+        """Return (hash, row) pairs for the hashes present in the index."""
+        unique = list(set(hashes))
+        rows = []
+        # Stay below SQLite's limit on bound parameters per statement
+        for start in range(0, len(unique), 500):
+            batch = unique[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            rows.extend(self.connection.execute(
+                f"SELECT hash, row FROM entries WHERE hash IN ({placeholders})", batch
+            ).fetchall())
+        return rows
+
+    def get_many(self, hashes: Sequence[str]) -> Dict[str, np.ndarray]:
+        """Return the cached vectors for the given hashes that are present."""
+        vectors = self._open_vectors()
+        if vectors is None or not hashes:
+            return {}
+
+        # Rows are read under the write lock, so another process's put_many
+        # cannot evict a row and overwrite its vector between the lookup
+        # and the copy
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            found = {
+                text_hash: np.array(vectors[row])
+                for text_hash, row in self._lookup(hashes)
+            }
+
+            if found:
+                now = time.time()
+                self.connection.executemany(
+                    "UPDATE entries SET last_used = ? WHERE hash = ?",
+                    [(now, text_hash) for text_hash in found]
+                )
+            self.connection.execute("COMMIT")
+        except Exception:
+            self.connection.execute("ROLLBACK")
+            raise
+        return found
+
+    def put_many(self, hashes: Sequence[str], embeddings: Sequence[Sequence[float]]) -> None:
+        """Store vectors, evicting the least recently used rows when full."""
+        if not hashes:
+            return
+
+        now = time.time()
+
+        # The write lock also serializes creation of the vector file
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            vectors = self._open_vectors(len(embeddings[0]))
+            capacity = vectors.shape[0]
+
+            pending = {}
+            for text_hash, embedding in zip(hashes, embeddings):
+                pending.setdefault(text_hash, embedding)
+            existing = {text_hash for text_hash, _ in self._lookup(list(pending))}
+            new_items = [(h, e) for h, e in pending.items() if h not in existing][:capacity]
+            if not new_items:
+                self.connection.execute("COMMIT")
+                return
+
+            # Rows below the high-water mark are always occupied: entries are
+            # only ever removed by eviction, which hands the row straight over
+            next_row = self._get_meta("next_row") or 0
+            rows = list(range(next_row, min(capacity, next_row + len(new_items))))
+            self.connection.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('next_row', ?)",
+                (next_row + len(rows),)
+            )
+            shortfall = len(new_items) - len(rows)
+            if shortfall > 0:
+                evicted = self.connection.execute(
+                    "SELECT hash, row FROM entries ORDER BY last_used LIMIT ?", (shortfall,)
+                ).fetchall()
+                self.connection.executemany(
+                    "DELETE FROM entries WHERE hash = ?", [(h,) for h, _ in evicted]
+                )
+                rows.extend(row for _, row in evicted)
+
+            for (text_hash, embedding), row in zip(new_items, rows):
+                vectors[row] = np.asarray(embedding, dtype=np.float32)
+            vectors.flush()
+            self.connection.executemany(
+                "INSERT INTO entries (hash, row, last_used) VALUES (?, ?, ?)",
+                [(text_hash, row, now) for (text_hash, _), row in zip(new_items, rows)]
+            )
+            self.connection.execute("COMMIT")
+        except Exception:
+            self.connection.execute("ROLLBACK")
+            raise
+
+    def __len__(self) -> int:
+        return self.connection.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that consults an EmbeddingCache before the model."""
+
+    def __init__(self, embeddings: Embeddings, cache: EmbeddingCache):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.hits = 0
+        self.misses = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts, computing only those missing from the cache."""
+        hashes = [EmbeddingCache.hash_text(text) for text in texts]
+        cached = self.cache.get_many(hashes)
+
+        missing = {}
+        for text_hash, text in zip(hashes, texts):
+            if text_hash not in cached and text_hash not in missing:
+                missing[text_hash] = text
+
+        if missing:
+            computed = self.embeddings.embed_documents(list(missing.values()))
+            self.cache.put_many(list(missing), computed)
+            cached.update(zip(missing, (np.asarray(v, dtype=np.float32) for v in computed)))
+
+        self.misses += len(missing)
+        self.hits += len(texts) - len(missing)
+        return [cached[text_hash].tolist() for text_hash in hashes]
+
+    def embed_query(self, text: str) -> List[float]:
+        """Queries are embedded directly; they are rarely repeated verbatim."""
+        return self.embeddings.embed_query(text)
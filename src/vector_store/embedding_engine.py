@@ -0,0 +1,147 @@
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, TYPE_CHECKING
+
+from langchain_core.embeddings import Embeddings
+
+from utils import instrumentation
+
+if TYPE_CHECKING:
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+# Model loaded once per worker process by _init_worker
+_worker_model = None
+
+
+def _load_model(model_name: str, device: str, batch_size: int) -> "HuggingFaceEmbeddings":
+    # Importing langchain_huggingface pulls in torch, so it waits for the first model load
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    return HuggingFaceEmbeddings(
+        model_name=model_name,
+        model_kwargs={'device': device},
+        encode_kwargs={'batch_size': batch_size}
+    )
+
+
+def _init_worker(model_name: str, device: str, batch_size: int, threads: int) -> None:
+    """Process pool initializer: split the cores between workers and load the model."""
+    global _worker_model
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    _worker_model = _load_model(model_name, device, batch_size)
+
+
+def _embed_in_worker(texts: List[str]) -> List[List[float]]:
+    return _worker_model.embed_documents(texts)
+
+
+class EmbeddingEngine(Embeddings):
+    """
+    Batched embedding engine for sentence-transformers models.
+
+    Texts are sorted by length before being cut into batches so each batch
+    pads to a similar length. With ``workers`` > 1 the batches are sharded
+    across a pool of processes that each load the model once; otherwise
+    they are embedded in-process.
+    """
+
+    def __init__(self, model_name: str, batch_size: int = 32, workers: int = 0, device: str = 'cpu'):
+        """
+        Initialize the engine. Models are loaded on first use.
+
+        Args:
+            model_name: sentence-transformers model to load
+            batch_size: Number of texts per forward pass
+            workers: Number of embedding processes; 0 or 1 embeds in-process
+            device: Torch device used by every model instance
+        """
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.workers = workers if workers and workers > 1 else 0
+        self.device = device
+        self._model = None
+        self._pool = None
+        # Concurrent first queries (e.g. in `serve`) must load the model once
+        self._load_lock = threading.Lock()
+        self.stats = {"chunks": 0, "seconds": 0.0}
+
+    @property
+    def model(self) -> "HuggingFaceEmbeddings":
+        """In-process model, used for queries and when no pool is configured."""
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    with instrumentation.span("embedding.load_model", model=self.model_name):
+                        self._model = _load_model(self.model_name, self.device, self.batch_size)
+        return self._model
+
+    @property
+    def preferred_batch_size(self) -> int:
+        """Number of texts per call that keeps every worker busy."""
+        return self.batch_size * max(1, self.workers) * 4
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            threads = max(1, (os.cpu_count() or 1) // self.workers)
+            # Spawned rather than forked: torch does not survive a fork once initialized
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.model_name, self.device, self.batch_size, threads)
+            )
+        return self._pool
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts in length-sorted batches, returning vectors in input order."""
+        if not texts:
+            return []
+
+        start_time = time.perf_counter()
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        batches = [
+            [texts[i] for i in order[start:start + self.batch_size]]
+            for start in range(0, len(order), self.batch_size)
+        ]
+
+        if self.workers:
+            batch_vectors = self._get_pool().map(_embed_in_worker, batches)
+        else:
+            batch_vectors = (self.model.embed_documents(batch) for batch in batches)
+
+        vectors = [None] * len(texts)
+        position = 0
+        for batch_result in batch_vectors:
+            for vector in batch_result:
+                vectors[order[position]] = vector
+                position += 1
+
+        self.stats["chunks"] += len(texts)
+        self.stats["seconds"] += time.perf_counter() - start_time
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.model.embed_query(text)
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embed many queries in one in-process call, without counting them as indexed chunks."""
+        if not texts:
+            return []
+        return self.model.embed_documents(texts)
+
+    def chunks_per_second(self) -> float:
+        return self.stats["chunks"] / self.stats["seconds"] if self.stats["seconds"] else 0.0
+
+    def close(self) -> None:
+        """Shut down the worker pool, if one was started."""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
@@ -0,0 +1,106 @@
+import os
+import shutil
+import uuid
+from typing import Iterable, Optional
+
+# A vector store directory holds one subdirectory per saved generation of
+# the index, and CURRENT names the one being served. Writers build a new
+# generation next to the current one and switch CURRENT to it with an
+# atomic rename, so readers always open a complete generation and keep
+# using it, through their open files, until they choose to reopen.
+# CURRENT also holds a random token written at publication, since
+# generation numbers start over when a store is deleted and created again.
+CURRENT_FILE = "CURRENT"
+GENERATION_PREFIX = "gen-"
+# The current generation and the one before it, which readers may still be opening
+KEEP_GENERATIONS = 2
+
+
+def _generation_number(name: str) -> Optional[int]:
+    if name.startswith(GENERATION_PREFIX) and name[len(GENERATION_PREFIX):].isdigit():
+        return int(name[len(GENERATION_PREFIX):])
+    return None
+
+
+def current_version(directory: str) -> Optional[str]:
+    """
+    Contents of CURRENT: the name of the generation a store serves and the
+    token of its publication, unique to it. None if it has none (yet).
+    """
+    try:
+        with open(os.path.join(directory, CURRENT_FILE), 'r') as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def current_generation(directory: str) -> Optional[str]:
+    """Name of the generation a store serves, or None if it has none (yet)."""
+    version = current_version(directory)
+    return version.split()[0] if version else None
+
+
+def current_directory(directory: str) -> str:
+    """
+    Directory holding the files of the current generation of a store:
+    the store directory itself for stores written before generations.
+    """
+    name = current_generation(directory)
+    return os.path.join(directory, name) if name else directory
+
+
+def begin_generation(directory: str) -> str:
+    """
+    Create the directory of the next generation of a store and return it.
+    Generations left unpublished by an interrupted writer are discarded.
+    Callers must hold the store's writer lock.
+    """
+    current = _generation_number(current_generation(directory) or "") or 0
+    os.makedirs(directory, exist_ok=True)
+    for name in os.listdir(directory):
+        number = _generation_number(name)
+        if number is not None and number > current:
+            shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+    path = os.path.join(directory, f"{GENERATION_PREFIX}{current + 1:06d}")
+    os.makedirs(path)
+    return path
+
+
+def publish_generation(directory: str, generation_path: str, obsolete_files: Iterable[str] = ()) -> None:
+    """
+    Make a generation created by begin_generation the current one, then
+    delete generations older than the last KEEP_GENERATIONS and the
+    `obsolete_files` of the store directory itself (those of a store
+    written before generations). Readers that opened an older generation
+    keep reading it through their open files.
+    """
+    pointer = os.path.join(directory, CURRENT_FILE)
+    with open(pointer + ".tmp", 'w') as f:
+        f.write(f"{os.path.basename(generation_path)} {uuid.uuid4().hex}\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(pointer + ".tmp", pointer)
+
+    numbers = sorted(number for number in map(_generation_number, os.listdir(directory)) if number is not None)
+    for number in numbers[:-KEEP_GENERATIONS]:
+        shutil.rmtree(os.path.join(directory, f"{GENERATION_PREFIX}{number:06d}"), ignore_errors=True)
+    for name in obsolete_files:
+        path = os.path.join(directory, name)
+        if os.path.isfile(path):
+            os.remove(path)
+
+
+def link_files(source: str, target: str, names: Iterable[str]) -> None:
+    """
+    Carry unchanged files over to a new generation. Files of a published
+    generation are never modified, so they are hard-linked where the file
+    system allows it and copied otherwise.
+    """
+    for name in names:
+        source_path = os.path.join(source, name)
+        if not os.path.exists(source_path):
+            continue
+        try:
+            os.link(source_path, os.path.join(target, name))
+        except OSError:
+            shutil.copyfile(source_path, os.path.join(target, name))
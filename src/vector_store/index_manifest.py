@@ -0,0 +1,90 @@
+import hashlib
+import json
+import os
+from typing import Dict, List, Optional, Set
+
+
+class IndexManifest:
+    """
+    Per-project record of every file stored in a vector store.
+
+    For each indexed file the manifest keeps its size, modification time,
+    content hash and the ids of the chunks it produced, so an update can
+    skip unchanged files and delete exactly the vectors of stale ones.
+    """
+
+    FILENAME = "manifest.json"
+    VERSION = 1
+
+    def __init__(self, directory: str, files: Optional[Dict[str, Dict]] = None):
+        """
+        Initialize a manifest stored in the given vector store directory.
+
+        Args:
+            directory: Vector store directory holding the manifest file
+            files: Existing file entries keyed by relative path
+        """
+        self.directory = directory
+        self.path = os.path.join(directory, self.FILENAME)
+        self.files = files if files is not None else {}
+
+    @classmethod
+    def load(cls, directory: str) -> Optional["IndexManifest"]:
+        """Load the manifest from a directory, or None if there is no usable one."""
+        try:
+            with open(os.path.join(directory, cls.FILENAME), 'r') as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+        if data.get("version") != cls.VERSION:
+            return None
+        return cls(directory, data.get("files", {}))
+
+    def save(self, directory: Optional[str] = None) -> None:
+        """Write the manifest to disk, in `directory` if given, which it then belongs to."""
+        if directory is not None:
+            self.directory = directory
+            self.path = os.path.join(directory, self.FILENAME)
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.path, 'w') as f:
+            json.dump({"version": self.VERSION, "files": self.files}, f)
+
+    @staticmethod
+    def hash_content(content: str) -> str:
+        """Return the hex digest used to detect content changes."""
+        return hashlib.sha256(content.encode('utf-8', errors='surrogatepass')).hexdigest()
+
+    def is_unchanged(self, path: str, size: int, mtime: float) -> bool:
+        """Check whether a file's size and mtime match the recorded entry."""
+        entry = self.files.get(path)
+        return entry is not None and entry["size"] == size and entry["mtime"] == mtime
+
+    def has_content(self, path: str, content_hash: str) -> bool:
+        """Check whether a file was indexed with exactly this content."""
+        entry = self.files.get(path)
+        return entry is not None and entry["hash"] == content_hash
+
+    def record(self, path: str, size: Optional[int], mtime: Optional[float],
+               content_hash: str, chunk_ids: List[str]) -> None:
+        """Record a file and the ids of the chunks stored for it."""
+        self.files[path] = {
+            "size": size,
+            "mtime": mtime,
+            "hash": content_hash,
+            "chunk_ids": chunk_ids
+        }
+
+    def touch(self, path: str, size: Optional[int], mtime: Optional[float]) -> None:
+        """Refresh the stat information of a file whose content did not change."""
+        self.files[path]["size"] = size
+        self.files[path]["mtime"] = mtime
+
+    def remove(self, path: str) -> List[str]:
+        """Forget a file and return the ids of its chunks."""
+        entry = self.files.pop(path, None)
+        return entry["chunk_ids"] if entry else []
+
+    def paths(self) -> Set[str]:
+        """Return the relative paths of all indexed files."""
+        return set(self.files)
@@ -0,0 +1,535 @@
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import faiss
+import numpy as np
+from langchain.docstore.document import Document
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import Embeddings
+
+from vector_store.ann_index import IndexConfig, build_index, search_parameters, to_flat
+from vector_store.generations import current_version, link_files
+from vector_store.lexical_index import LexicalIndex
+
+FORMAT_VERSION = 1
+
+# Files of one generation of a vector store (see vector_store.generations);
+# stores written before generations keep them in the store directory itself
+VECTORS_FILE = "vectors.f32"
+INDEX_FILE = "index.faiss"
+CHUNKS_FILE = "chunks.sqlite"
+META_FILE = "store.json"
+STORE_FILES = (VECTORS_FILE, INDEX_FILE, CHUNKS_FILE, META_FILE)
+
+# Written by FAISS.save_local before this format existed
+LEGACY_DOCSTORE_FILE = "index.pkl"
+
+
+def _replace(path: str, write) -> None:
+    """Write a file through a temporary sibling so readers never see it half written."""
+    tmp_path = path + ".tmp"
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def read_meta(directory: str) -> Optional[Dict]:
+    """Return the metadata of a stored index, or None if there is none."""
+    try:
+        with open(os.path.join(directory, META_FILE), 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def is_legacy_store(directory: str) -> bool:
+    """Check for a pickled store saved by FAISS.save_local."""
+    return (read_meta(directory) is None
+            and os.path.exists(os.path.join(directory, LEGACY_DOCSTORE_FILE)))
+
+
+def store_version(directory: str) -> Optional[str]:
+    """
+    Identify what a store currently serves, so resident readers can tell
+    that it was rewritten: its current generation and publication token
+    (see generations.current_version), or the mtime of store.json for
+    stores written before generations. None if there is no store.
+    """
+    version = current_version(directory)
+    if version is not None:
+        return version
+    try:
+        return f"mtime:{os.path.getmtime(os.path.join(directory, META_FILE))}"
+    except OSError:
+        return None
+
+
+# Vectors copied out of an in-memory index at a time when saving it
+SAVE_BLOCK_SIZE = 65536
+
+# Incremental updates leave the vectors of deleted chunks in place as dead
+# rows; past this share of the rows the store is compacted and reindexed
+COMPACT_DEAD_FRACTION = 0.2
+# IVF centroids are retrained once the store grew this much since training
+RETRAIN_GROWTH = 2.0
+
+_CREATE_CHUNKS = "CREATE TABLE chunks (position INTEGER PRIMARY KEY, id TEXT UNIQUE, content TEXT, metadata TEXT)"
+_INSERT_CHUNK = "INSERT INTO chunks VALUES (?, ?, ?, ?)"
+
+
+def _write_vectors(path: str, index: faiss.Index) -> None:
+    """Write every vector of an index in position order, a block at a time."""
+    if isinstance(index, faiss.IndexIVF):
+        index.make_direct_map()
+    with open(path, 'wb') as f:
+        for start in range(0, index.ntotal, SAVE_BLOCK_SIZE):
+            index.reconstruct_n(start, min(SAVE_BLOCK_SIZE, index.ntotal - start)).tofile(f)
+
+
+def _write_index(directory: str, count: int, dimension: int, config: IndexConfig) -> str:
+    """
+    Build the approximate index `config` asks for from the vectors already
+    written to `directory`, or remove a stale one for flat stores.
+    Returns the index type.
+    """
+    index_type = config.resolve_type(count) if count else "flat"
+    index_path = os.path.join(directory, INDEX_FILE)
+    if index_type == "flat":
+        if os.path.exists(index_path):
+            os.remove(index_path)
+    else:
+        vectors = np.memmap(os.path.join(directory, VECTORS_FILE), dtype=np.float32, mode='r',
+                            shape=(count, dimension))
+        index = build_index(vectors, config)
+        _replace(index_path, lambda path: faiss.write_index(index, path))
+    return index_type
+
+
+def next_generation(directory: str) -> int:
+    """
+    Generation number for the next save of the store whose files are in
+    `directory`. Query caches key results by it, so it never goes back to
+    1: a store deleted and created again continues from the clock, and a
+    process still caching results of the deleted one cannot serve them.
+    """
+    previous = (read_meta(directory) or {}).get("generation", 0)
+    return max(previous + 1, time.time_ns() // 1_000_000)
+
+
+def _write_meta(directory: str, generation: Optional[int], count: int, dimension: int, index_type: str,
+                rows: Optional[int] = None, deleted: Iterable[int] = (), trained: Optional[int] = None) -> None:
+    """
+    Write store.json: `count` live chunks out of `rows` vectors (the others
+    are the `deleted` positions), and the number of rows the approximate
+    index was built or trained on.
+    """
+    # Bumped on every save so caches can tell results of an older index apart
+    if generation is None:
+        generation = next_generation(directory)
+    rows = count if rows is None else rows
+    meta = {"format_version": FORMAT_VERSION, "generation": generation, "count": count,
+            "dimension": dimension, "index_type": index_type, "rows": rows,
+            "deleted": sorted(deleted), "trained": rows if trained is None else trained}
+    _replace(os.path.join(directory, META_FILE), lambda path: _write_json(path, meta))
+
+
+def write_store(directory: str, vector_store: FAISS, config: IndexConfig, generation: Optional[int] = None) -> None:
+    """
+    Save an in-memory vector store.
+
+    Raw vectors are always written in position order, so searches can map
+    them and later updates rebuild approximate indexes without loss. An
+    approximate index is only written when `config` resolves to one.
+    `generation` numbers the saved index for caches (default: one more
+    than the store already in `directory`).
+    """
+    os.makedirs(directory, exist_ok=True)
+    count, dimension = vector_store.index.ntotal, vector_store.index.d
+
+    _replace(os.path.join(directory, VECTORS_FILE), lambda path: _write_vectors(path, vector_store.index))
+    index_type = _write_index(directory, count, dimension, config)
+
+    def rows():
+        for position in range(count):
+            chunk_id = vector_store.index_to_docstore_id[position]
+            document = vector_store.docstore.search(chunk_id)
+            yield position, chunk_id, document.page_content, json.dumps(document.metadata)
+
+    def write_chunks(path: str) -> None:
+        if os.path.exists(path):
+            os.remove(path)
+        connection = sqlite3.connect(path)
+        try:
+            connection.execute(_CREATE_CHUNKS)
+            connection.executemany(_INSERT_CHUNK, rows())
+            connection.commit()
+        finally:
+            connection.close()
+
+    _replace(os.path.join(directory, CHUNKS_FILE), write_chunks)
+    _write_meta(directory, generation, count, dimension, index_type)
+
+    legacy_path = os.path.join(directory, LEGACY_DOCSTORE_FILE)
+    if os.path.exists(legacy_path):
+        os.remove(legacy_path)
+
+
+class StoreWriter:
+    """
+    Writes a new store batch by batch, for full builds: vectors are
+    appended to the vector file and chunks inserted into SQLite as they are
+    embedded, so no copy of the corpus is kept in memory. The approximate
+    index, if the configuration asks for one, is built from the mapped
+    vector file by finish().
+
+    Files are written in place, so `directory` must not be served yet
+    (e.g. a generation that is not published).
+    """
+
+    def __init__(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.count = 0
+        self.dimension = None
+        self._vectors = open(os.path.join(directory, VECTORS_FILE), 'wb')
+        self._connection = sqlite3.connect(os.path.join(directory, CHUNKS_FILE))
+        self._connection.execute(_CREATE_CHUNKS)
+
+    def add(self, chunks: List[Document], ids: List[str], vectors: List[List[float]]) -> None:
+        """Append a batch of embedded chunks at the next positions."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        self.dimension = vectors.shape[1]
+        vectors.tofile(self._vectors)
+        self._connection.executemany(_INSERT_CHUNK, (
+            (self.count + offset, chunk_id, chunk.page_content, json.dumps(chunk.metadata))
+            for offset, (chunk, chunk_id) in enumerate(zip(chunks, ids))
+        ))
+        self.count += len(ids)
+
+    def finish(self, config: IndexConfig, generation: Optional[int] = None) -> None:
+        """Close the files, build the configured index and write store.json."""
+        self._vectors.close()
+        self._connection.commit()
+        self.close()
+        index_type = _write_index(self.directory, self.count, self.dimension, config)
+        _write_meta(self.directory, generation, self.count, self.dimension, index_type)
+
+    def close(self) -> None:
+        """Release the files without finishing the store."""
+        self._vectors.close()
+        self._connection.close()
+
+
+class StoreUpdater:
+    """
+    Writes a new generation of a store from the current one, for
+    incremental updates, in time proportional to the change rather than
+    to the store:
+
+    - chunks.sqlite is copied and the removed and added rows are applied
+      to the copy;
+    - vectors.f32 is hard-linked and new vectors are appended to it. Rows
+      are only ever appended to a file shared this way, so older
+      generations, which map a prefix of it, keep reading the same bytes;
+    - the approximate index, if any, is read and extended with the new
+      vectors (positions continue from the last row).
+
+    Vectors of removed chunks stay in place as dead rows, listed in
+    store.json, which searches filter out. Once they make up
+    COMPACT_DEAD_FRACTION of the rows, the configured index type changes
+    (e.g. "auto" crossing a size threshold) or an IVF index outgrew its
+    training by RETRAIN_GROWTH, finish() compacts the store and rebuilds
+    the index from scratch.
+    """
+
+    def __init__(self, current: str, directory: str):
+        """
+        Args:
+            current: Directory of the generation being served
+            directory: Directory of the new, unpublished generation
+        """
+        meta = read_meta(current)
+        if meta is None:
+            raise ValueError("No vector store exists for this project")
+        os.makedirs(directory, exist_ok=True)
+        self.current = current
+        self.directory = directory
+        self.count = meta["count"]
+        self.dimension = meta["dimension"]
+        self.index_type = meta["index_type"]
+        self.rows = meta.get("rows", self.count)
+        self.trained = meta.get("trained", self.rows)
+        self.deleted = set(meta.get("deleted", ()))
+        self._added = []
+
+        shutil.copyfile(os.path.join(current, CHUNKS_FILE), os.path.join(directory, CHUNKS_FILE))
+        link_files(current, directory, [VECTORS_FILE])
+        self._vectors = open(os.path.join(directory, VECTORS_FILE), 'r+b' if self.rows else 'wb')
+        # Drop whatever an interrupted update appended after the last published row
+        self._vectors.truncate(self.rows * (self.dimension or 0) * 4)
+        self._vectors.seek(0, os.SEEK_END)
+        self._connection = sqlite3.connect(os.path.join(directory, CHUNKS_FILE))
+
+    def remove(self, ids: List[str]) -> None:
+        """Remove chunks by id, leaving their vectors as dead rows."""
+        for start in range(0, len(ids), 500):
+            batch = ids[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            positions = [row[0] for row in self._connection.execute(
+                f"SELECT position FROM chunks WHERE id IN ({placeholders})", batch)]
+            self._connection.execute(f"DELETE FROM chunks WHERE id IN ({placeholders})", batch)
+            self.deleted.update(positions)
+            self.count -= len(positions)
+
+    def add(self, chunks: List[Document], ids: List[str], vectors: List[List[float]]) -> None:
+        """Append a batch of embedded chunks after the last row."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        self.dimension = vectors.shape[1]
+        vectors.tofile(self._vectors)
+        self._connection.executemany(_INSERT_CHUNK, (
+            (self.rows + offset, chunk_id, chunk.page_content, json.dumps(chunk.metadata))
+            for offset, (chunk, chunk_id) in enumerate(zip(chunks, ids))
+        ))
+        self._added.append(vectors)
+        self.rows += len(ids)
+        self.count += len(ids)
+
+    def _needs_rebuild(self, config: IndexConfig) -> bool:
+        wanted = config.resolve_type(self.count) if self.count else "flat"
+        if wanted != self.index_type:
+            return True
+        if len(self.deleted) > COMPACT_DEAD_FRACTION * self.rows:
+            return True
+        return self.index_type in ("ivf", "ivfpq") and self.rows > RETRAIN_GROWTH * max(self.trained, 1)
+
+    def _compact(self) -> None:
+        """Rewrite the vectors and chunks of live rows only, renumbered in order."""
+        live = np.array([row[0] for row in self._connection.execute(
+            "SELECT position FROM chunks ORDER BY position")], dtype=np.int64)
+        self._connection.close()
+
+        # Written to new files: the current ones may be shared with older generations
+        vectors_path = os.path.join(self.directory, VECTORS_FILE)
+        if len(live):
+            vectors = np.memmap(vectors_path, dtype=np.float32, mode='r', shape=(self.rows, self.dimension))
+
+            def write_vectors(path: str) -> None:
+                with open(path, 'wb') as f:
+                    for start in range(0, len(live), SAVE_BLOCK_SIZE):
+                        vectors[live[start:start + SAVE_BLOCK_SIZE]].tofile(f)
+
+            _replace(vectors_path, write_vectors)
+            del vectors
+        else:
+            _replace(vectors_path, lambda path: open(path, 'wb').close())
+
+        chunks_path = os.path.join(self.directory, CHUNKS_FILE)
+
+        def write_chunks(path: str) -> None:
+            if os.path.exists(path):
+                os.remove(path)
+            connection = sqlite3.connect(path)
+            try:
+                connection.execute(_CREATE_CHUNKS)
+                connection.execute("ATTACH DATABASE ? AS old", (chunks_path,))
+                connection.execute("INSERT INTO chunks SELECT ROW_NUMBER() OVER (ORDER BY position) - 1, "
+                                   "id, content, metadata FROM old.chunks")
+                connection.commit()
+                connection.execute("DETACH DATABASE old")
+            finally:
+                connection.close()
+
+        _replace(chunks_path, write_chunks)
+        self.rows = self.count
+        self.deleted = set()
+
+    def finish(self, config: IndexConfig, generation: Optional[int] = None) -> bool:
+        """
+        Close the files, bring the approximate index up to date and write
+        store.json. Returns whether the store was compacted and reindexed.
+        """
+        self._vectors.close()
+        self._connection.commit()
+        rebuild = self._needs_rebuild(config)
+        if rebuild:
+            self._compact()
+            self.index_type = _write_index(self.directory, self.count, self.dimension, config)
+            self.trained = self.count
+        else:
+            self._connection.close()
+            if self.index_type != "flat" and self._added:
+                index = faiss.read_index(os.path.join(self.current, INDEX_FILE))
+                index.add(np.concatenate(self._added))
+                _replace(os.path.join(self.directory, INDEX_FILE), lambda path: faiss.write_index(index, path))
+            elif self.index_type != "flat":
+                link_files(self.current, self.directory, [INDEX_FILE])
+        _write_meta(self.directory, generation, self.count, self.dimension or 0, self.index_type,
+                    rows=self.rows, deleted=self.deleted, trained=self.trained)
+        return rebuild
+
+    def close(self) -> None:
+        """Release the files without finishing the store."""
+        self._vectors.close()
+        self._connection.close()
+
+
+def _write_json(path: str, data: Dict) -> None:
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=4)
+
+
+def migrate_legacy_store(directory: str, embeddings: Embeddings) -> None:
+    """Rewrite a pickled FAISS.save_local store in the current format."""
+    # The pickle was written by this tool itself, which is the only reason
+    # it is acceptable to unpickle it here, once
+    vector_store = FAISS.load_local(directory, embeddings, allow_dangerous_deserialization=True)
+    vector_store.index = to_flat(vector_store.index)
+    write_store(directory, vector_store, IndexConfig.load(directory))
+
+
+class StoreReader:
+    """
+    Read-only view of a stored index for searching.
+
+    Flat stores are searched straight from the memory-mapped vector file
+    and IVF indexes are opened with FAISS's mmap flag, so processes serving
+    the same project share one copy in the page cache. HNSW graphs cannot
+    be mapped and are read into memory. Chunk text and metadata stay in
+    SQLite and only the top-k hits of a query are fetched. The lexical
+    index, when the store has one, is opened read-only for hybrid search.
+    """
+
+    # Attempts to open a generation that a writer replaced and deleted meanwhile
+    OPEN_ATTEMPTS = 3
+
+    def __init__(self, directory: str):
+        """
+        Open the current generation of the store in `directory`. The reader
+        keeps serving that generation (its `version`) after writers publish
+        newer ones.
+        """
+        self._connection = None
+        self.lexical = None
+        for attempt in range(self.OPEN_ATTEMPTS):
+            self.version, path = self._resolve(directory)
+            try:
+                self._open(path)
+                break
+            except (OSError, sqlite3.Error, RuntimeError, ValueError):
+                self.close()
+                if attempt + 1 == self.OPEN_ATTEMPTS or store_version(directory) == self.version:
+                    raise
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _resolve(directory: str) -> Tuple[Optional[str], str]:
+        version = current_version(directory)
+        if version is not None:
+            return version, os.path.join(directory, version.split()[0])
+        return store_version(directory), directory
+
+    def _open(self, directory: str) -> None:
+        meta = read_meta(directory)
+        if meta is None:
+            raise ValueError("No vector store exists for this project")
+        self.directory = directory
+        self.count = meta["count"]
+        self.dimension = meta["dimension"]
+        self.index_type = meta["index_type"]
+        self.generation = meta.get("generation", 0)
+        self.rows = meta.get("rows", self.count)
+        # Vectors of chunks removed by incremental updates (see StoreUpdater)
+        self.deleted = np.array(meta.get("deleted", ()), dtype=np.int64)
+        self._selector = None
+        if len(self.deleted):
+            self._deleted_ids = faiss.IDSelectorBatch(self.deleted)
+            self._selector = faiss.IDSelectorNot(self._deleted_ids)
+
+        self.vectors = None
+        if self.rows:
+            self.vectors = np.memmap(os.path.join(directory, VECTORS_FILE), dtype=np.float32,
+                                     mode='r', shape=(self.rows, self.dimension))
+        self.index = None
+        if self.index_type != "flat":
+            self.index = faiss.read_index(os.path.join(directory, INDEX_FILE),
+                                          faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+
+        self._connection = sqlite3.connect(
+            f"file:{os.path.join(directory, CHUNKS_FILE)}?mode=ro", uri=True, check_same_thread=False
+        )
+        if LexicalIndex.exists(directory):
+            self.lexical = LexicalIndex(os.path.join(directory, LexicalIndex.FILENAME), read_only=True)
+
+    def search_positions(self, query_vectors: List[List[float]], k: int, nprobe: Optional[int] = None,
+                         ef_search: Optional[int] = None) -> List[List[int]]:
+        """Return, per query vector, the positions of up to k chunks ordered by distance."""
+        if not self.count:
+            return [[] for _ in query_vectors]
+
+        queries = np.asarray(query_vectors, dtype=np.float32)
+        if self.index is None:
+            # Dead rows can take up to as many places as there are of them
+            _, positions = faiss.knn(queries, self.vectors, min(k + len(self.deleted), self.rows))
+            if len(self.deleted):
+                dead = np.isin(positions, self.deleted)
+                return [[int(position) for position in row[~mask]][:k] for row, mask in zip(positions, dead)]
+        else:
+            params = search_parameters(self.index, nprobe=nprobe, ef_search=ef_search, selector=self._selector)
+            _, positions = self.index.search(queries, k, params=params)
+        return [[int(position) for position in row if position != -1] for row in positions]
+
+    def lexical_search_positions(self, queries: List[str], limit: int) -> List[List[int]]:
+        """Return, per query, the positions of up to `limit` chunks ranked by BM25."""
+        results = []
+        with self._lock:
+            for query in queries:
+                chunk_ids = [chunk_id for chunk_id, _ in self.lexical.search(query, limit)]
+                if not chunk_ids:
+                    results.append([])
+                    continue
+                rows = dict(self._connection.execute(
+                    f"SELECT id, position FROM chunks WHERE id IN ({','.join('?' * len(chunk_ids))})",
+                    chunk_ids
+                ))
+                # Stores saved before generations had their lexical index updated in
+                # place, so it may hold chunks added after this reader was opened
+                results.append([rows[chunk_id] for chunk_id in chunk_ids if chunk_id in rows])
+        return results
+
+    def documents_at(self, rows: List[List[int]]) -> List[List[Document]]:
+        """Fetch the chunks of several position lists with one lookup."""
+        documents = self.fetch({position for row in rows for position in row})
+        return [[documents[position] for position in row] for row in rows]
+
+    def search(self, query_vectors: List[List[float]], k: int, nprobe: Optional[int] = None,
+               ef_search: Optional[int] = None) -> List[List[Document]]:
+        """Return, per query vector, up to k documents ordered by distance."""
+        return self.documents_at(self.search_positions(query_vectors, k, nprobe=nprobe, ef_search=ef_search))
+
+    def fetch(self, positions) -> Dict[int, Document]:
+        """Load the chunks at the given index positions."""
+        positions = list(positions)
+        documents = {}
+        with self._lock:
+            # SQLite limits the number of bound parameters per statement
+            for start in range(0, len(positions), 500):
+                batch = positions[start:start + 500]
+                rows = self._connection.execute(
+                    f"SELECT position, content, metadata FROM chunks WHERE position IN ({','.join('?' * len(batch))})",
+                    batch
+                )
+                for position, content, metadata in rows:
+                    documents[position] = Document(page_content=content, metadata=json.loads(metadata))
+        return documents
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+        if self.lexical is not None:
+            self.lexical.close()
+            self.lexical = None
@@ -0,0 +1,169 @@
+import queue
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from langchain.docstore.document import Document
+from langchain_core.embeddings import Embeddings
+
+from utils import instrumentation
+
+
+class _Done:
+    """Marks the end of a stage's output."""
+
+
+class _Failed:
+    """Carries an exception raised by a background stage."""
+
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+class IngestionPipeline:
+    """
+    Streaming walk -> chunk -> embed -> index pipeline.
+
+    Reading documents and splitting them into chunks run on background
+    threads connected by bounded queues, while the calling thread embeds
+    chunks in fixed-size batches and hands them to `add_batch`. The
+    pipeline itself only holds the queued items, and embedding starts as
+    soon as the first batch of chunks is ready; whether the whole build
+    stays bounded depends on `add_batch` (full builds write each batch to
+    disk, incremental updates add it to the store loaded in memory).
+    """
+
+    def __init__(self, embeddings: Embeddings, batch_size: int = 256, queue_size: int = 8):
+        """
+        Initialize the pipeline.
+
+        Args:
+            embeddings: Model used to embed chunk batches
+            batch_size: Number of chunks embedded and indexed at once
+            queue_size: Maximum items buffered between two stages
+        """
+        self.embeddings = embeddings
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self._stop = threading.Event()
+
+    def _put(self, target: queue.Queue, item) -> bool:
+        """Block until the item is queued; returns False if the pipeline was stopped."""
+        while not self._stop.is_set():
+            try:
+                target.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, source: queue.Queue):
+        """Block until an item arrives; returns None if the pipeline was stopped."""
+        while not self._stop.is_set():
+            try:
+                return source.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return None
+
+    def _read_stage(self, documents: Iterable[Dict], output: queue.Queue,
+                    parent: "instrumentation.Span") -> None:
+        try:
+            with instrumentation.attach(parent):
+                for document in documents:
+                    if not self._put(output, document):
+                        return
+            self._put(output, _Done())
+        except BaseException as e:
+            self._put(output, _Failed(e))
+
+    def _chunk_stage(self, prepare: Callable[[Dict], List[Tuple[Document, str]]],
+                     source: queue.Queue, output: queue.Queue, parent: "instrumentation.Span") -> None:
+        chunking = 0.0
+        try:
+            batch = []
+            while True:
+                item = self._get(source)
+                if item is None:
+                    return
+                if isinstance(item, (_Done, _Failed)):
+                    with instrumentation.attach(parent):
+                        instrumentation.record("ingest.chunk", chunking)
+                    if isinstance(item, _Done) and batch:
+                        self._put(output, batch)
+                    self._put(output, item)
+                    return
+
+                start = time.perf_counter()
+                chunks = prepare(item)
+                chunking += time.perf_counter() - start
+                for chunk in chunks:
+                    batch.append(chunk)
+                    if len(batch) >= self.batch_size:
+                        if not self._put(output, batch):
+                            return
+                        batch = []
+        except BaseException as e:
+            self._put(output, _Failed(e))
+
+    def run(self, documents: Iterable[Dict],
+            prepare: Callable[[Dict], List[Tuple[Document, str]]],
+            add_batch: Callable[[List[Document], List[str], List[List[float]]], None]) -> Dict[str, float]:
+        """
+        Stream documents through the pipeline.
+
+        Args:
+            documents: Documents to ingest; consumed on a background thread
+            prepare: Turns one document into (chunk, chunk id) pairs; runs on
+                the chunking thread and may return an empty list to skip it
+            add_batch: Receives each batch of chunks, ids and embeddings on
+                the calling thread
+
+        Returns:
+            Dict[str, float]: Number of documents and chunks processed and elapsed time
+        """
+        start_time = time.perf_counter()
+        stats = {"documents": 0, "chunks": 0}
+        self._stop.clear()
+
+        def counted(items: Iterable[Dict]) -> Iterable[Dict]:
+            for item in items:
+                stats["documents"] += 1
+                yield item
+
+        document_queue = queue.Queue(maxsize=self.queue_size)
+        batch_queue = queue.Queue(maxsize=self.queue_size)
+        # Spans of the background stages join the caller's tree
+        parent = instrumentation.current_span()
+        threads = [
+            threading.Thread(target=self._read_stage, args=(counted(documents), document_queue, parent),
+                             name="ingest-read", daemon=True),
+            threading.Thread(target=self._chunk_stage, args=(prepare, document_queue, batch_queue, parent),
+                             name="ingest-chunk", daemon=True),
+        ]
+        for thread in threads:
+            thread.start()
+
+        try:
+            while True:
+                item = batch_queue.get()
+                if isinstance(item, _Done):
+                    break
+                if isinstance(item, _Failed):
+                    raise item.error
+
+                chunks = [chunk for chunk, _ in item]
+                ids = [chunk_id for _, chunk_id in item]
+                with instrumentation.span("ingest.embed", chunks=len(chunks)):
+                    vectors = self.embeddings.embed_documents([chunk.page_content for chunk in chunks])
+                with instrumentation.span("ingest.add", chunks=len(chunks)):
+                    add_batch(chunks, ids, vectors)
+                stats["chunks"] += len(chunks)
+        finally:
+            # Unblock the background stages if we are bailing out early
+            self._stop.set()
+            for thread in threads:
+                thread.join()
+
+        stats["elapsed"] = time.perf_counter() - start_time
+        return stats
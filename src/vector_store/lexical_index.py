@@ -0,0 +1,115 @@
+import os
+import re
+import sqlite3
+from typing import Iterable, List, Tuple
+
+_WORD = re.compile(r"[A-Za-z0-9_]+")
+# Pieces of an identifier: "HTTPResponse" -> HTTP, Response; "get_user2" -> get, user, 2
+_PART = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|[0-9]+")
+
+
+def tokenize_code(text: str) -> List[str]:
+    """
+    Split text into lowercase search terms. Each identifier is kept whole
+    and also split into its camelCase / snake_case parts, so `getUserName`
+    matches queries for `getusername`, `user` or `user name`.
+    """
+    tokens = []
+    for word in _WORD.findall(text):
+        tokens.append(word.lower())
+        parts = _PART.findall(word)
+        if len(parts) > 1:
+            tokens.extend(part.lower() for part in parts)
+    return tokens
+
+
+class LexicalIndex:
+    """
+    Persistent BM25 inverted index of chunks, stored as SQLite FTS5.
+
+    Chunks are indexed as their identifier-aware tokens (see tokenize_code)
+    and keyed by chunk id, so they are added and removed in the same pass
+    that updates the vector index. Changes become visible on commit().
+    """
+
+    FILENAME = "lexical.sqlite"
+
+    def __init__(self, path: str, read_only: bool = False):
+        """
+        Open or create a lexical index.
+
+        Args:
+            path: SQLite file of the index
+            read_only: Open an existing index for searching only
+        """
+        self.path = path
+        if read_only:
+            self.connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+            return
+
+        self.connection = sqlite3.connect(path, timeout=30)
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS chunk_ids (rowid INTEGER PRIMARY KEY, chunk_id TEXT NOT NULL UNIQUE);
+            CREATE VIRTUAL TABLE IF NOT EXISTS terms USING fts5(tokens, tokenize="unicode61 tokenchars '_'");
+        """)
+
+    @classmethod
+    def exists(cls, directory: str) -> bool:
+        return os.path.exists(os.path.join(directory, cls.FILENAME))
+
+    def add(self, chunk_ids: List[str], texts: List[str]) -> None:
+        """Index chunks; call commit() to make them searchable."""
+        for chunk_id, text in zip(chunk_ids, texts):
+            cursor = self.connection.execute("INSERT INTO chunk_ids (chunk_id) VALUES (?)", (chunk_id,))
+            self.connection.execute("INSERT INTO terms (rowid, tokens) VALUES (?, ?)",
+                                    (cursor.lastrowid, " ".join(tokenize_code(text))))
+
+    def remove(self, chunk_ids: Iterable[str]) -> None:
+        """Remove chunks by id; call commit() to apply."""
+        chunk_ids = list(chunk_ids)
+        # SQLite limits the number of bound parameters per statement
+        for start in range(0, len(chunk_ids), 500):
+            batch = chunk_ids[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            rowids = [row[0] for row in self.connection.execute(
+                f"SELECT rowid FROM chunk_ids WHERE chunk_id IN ({placeholders})", batch
+            )]
+            self.connection.executemany("DELETE FROM terms WHERE rowid = ?", [(rowid,) for rowid in rowids])
+            self.connection.execute(f"DELETE FROM chunk_ids WHERE chunk_id IN ({placeholders})", batch)
+
+    def search(self, query: str, limit: int) -> List[Tuple[str, float]]:
+        """
+        Return up to `limit` (chunk id, BM25 score) pairs matching any term of
+        the query, best first. Higher scores are better.
+        """
+        terms = dict.fromkeys(tokenize_code(query))
+        if not terms or limit <= 0:
+            return []
+        match = " OR ".join(f'"{term}"' for term in terms)
+        rows = self.connection.execute(
+            "SELECT chunk_ids.chunk_id, bm25(terms) AS score FROM terms "
+            "JOIN chunk_ids ON chunk_ids.rowid = terms.rowid "
+            "WHERE terms MATCH ? ORDER BY score LIMIT ?",
+            (match, limit)
+        )
+        # FTS5 reports BM25 negated so that smaller sorts first
+        return [(chunk_id, -score) for chunk_id, score in rows]
+
+    def commit(self) -> None:
+        self.connection.commit()
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+def reciprocal_rank_fusion(rankings: List[List], limit: int, constant: int = 60) -> List:
+    """
+    Fuse several ranked lists (best first) by reciprocal rank fusion: each
+    item scores the sum of 1 / (constant + rank) over the lists it is in.
+    Returns the `limit` best items.
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (constant + rank + 1)
+    return sorted(scores, key=lambda item: -scores[item])[:limit]
@@ -0,0 +1,139 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+
+def normalize_query(query: str) -> str:
+    """
+    Cache key of a query text: case-folded with whitespace collapsed.
+    The default model (all-MiniLM-L6-v2) is uncased, so this does not
+    change the embedding.
+    """
+    return " ".join(query.split()).casefold()
+
+
+class QueryCache:
+    """
+    LRU cache of query embeddings and search results for one vector store.
+
+    Results are keyed by normalized query, k, search parameters and the
+    generation of the stored index, which every saved generation bumps,
+    so results computed before an update are never served after it. Query
+    embeddings only depend on the text and survive updates.
+
+    With a path, entries are also written through to SQLite and loaded
+    again by the next process, e.g. across one-shot CLI searches.
+    """
+
+    def __init__(self, max_entries: int = 1024, path: Optional[str] = None):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries: Number of result lists (and query embeddings) kept
+            path: SQLite file to persist entries to; in memory only if None
+        """
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._results = OrderedDict()
+        self._vectors = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.connection = None
+        if path:
+            self.connection = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS results (
+                    key TEXT PRIMARY KEY,
+                    query TEXT NOT NULL,
+                    generation INTEGER NOT NULL,
+                    vector BLOB NOT NULL,
+                    positions TEXT NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            """)
+            rows = self.connection.execute(
+                "SELECT key, query, generation, vector, positions FROM results ORDER BY last_used DESC LIMIT ?",
+                (max_entries,)
+            ).fetchall()
+            # Oldest first, so the most recently used entries end up last
+            for key, query, generation, vector, positions in reversed(rows):
+                vector = np.frombuffer(vector, dtype=np.float32).tolist()
+                self._results[tuple(json.loads(key))] = (generation, json.loads(positions))
+                self._vectors[query] = vector
+
+    @staticmethod
+    def _result_key(query: str, k: int, nprobe: Optional[int], ef_search: Optional[int],
+                    generation: int) -> Tuple:
+        return (query, k, nprobe, ef_search, generation)
+
+    def get_vector(self, query: str) -> Optional[List[float]]:
+        """Return the cached embedding of a normalized query."""
+        with self._lock:
+            vector = self._vectors.get(query)
+            if vector is not None:
+                self._vectors.move_to_end(query)
+            return vector
+
+    def get_results(self, query: str, k: int, nprobe: Optional[int], ef_search: Optional[int],
+                    generation: int) -> Optional[List[int]]:
+        """Return the cached result positions of a search, counting the hit or miss."""
+        key = self._result_key(query, k, nprobe, ef_search, generation)
+        with self._lock:
+            entry = self._results.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._results.move_to_end(key)
+            self.hits += 1
+            if self.connection is not None:
+                self.connection.execute("UPDATE results SET last_used = ? WHERE key = ?",
+                                        (time.time(), json.dumps(key)))
+            return entry[1]
+
+    def put(self, query: str, vector: List[float], k: int, nprobe: Optional[int], ef_search: Optional[int],
+            generation: int, positions: List[int]) -> None:
+        """Store the embedding and result positions of a search."""
+        key = self._result_key(query, k, nprobe, ef_search, generation)
+        with self._lock:
+            self._vectors[query] = vector
+            self._vectors.move_to_end(query)
+            self._results[key] = (generation, positions)
+            self._results.move_to_end(key)
+
+            # Results of older generations can never be served again
+            stale = [old for old, (old_generation, _) in self._results.items() if old_generation < generation]
+            for old in stale:
+                del self._results[old]
+            while len(self._results) > self.max_entries:
+                self._results.popitem(last=False)
+            while len(self._vectors) > self.max_entries:
+                self._vectors.popitem(last=False)
+
+            if self.connection is not None:
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)",
+                    (json.dumps(key), query, generation,
+                     np.asarray(vector, dtype=np.float32).tobytes(), json.dumps(positions), time.time())
+                )
+                self.connection.execute("DELETE FROM results WHERE generation < ?", (generation,))
+                self.connection.execute(
+                    "DELETE FROM results WHERE key NOT IN "
+                    "(SELECT key FROM results ORDER BY last_used DESC LIMIT ?)",
+                    (self.max_entries,)
+                )
+
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def close(self) -> None:
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
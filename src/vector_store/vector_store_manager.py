@@ -1,137 +1,704 @@
-from typing import List, Dict
+from typing import List, Dict, Iterable, Iterator, Optional, Tuple, TYPE_CHECKING
+from contextlib import contextmanager
 import os
-from langchain_community.vectorstores import FAISS
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain.text_splitter import RecursiveCharacterTextSplitter, MarkdownTextSplitter
-from langchain.docstore.document import Document
+import shutil
+import threading
+import uuid
+
+from utils import instrumentation
+from utils.file_lock import FileLock
+from vector_store.generations import begin_generation, current_directory, link_files, publish_generation
+from vector_store.index_manifest import IndexManifest
+from vector_store.lexical_index import LexicalIndex, reciprocal_rank_fusion
+from utils.code_chunker import CodeChunker
+
+# langchain, FAISS and the embeddings stack are imported on first use so
+# that constructing a manager (e.g. to delete a store) stays cheap
+if TYPE_CHECKING:
+    from langchain.docstore.document import Document
+    from langchain_core.embeddings import Embeddings
+    from vector_store.embedding_engine import EmbeddingEngine
+    from vector_store.ingestion_pipeline import IngestionPipeline
+    from vector_store.ann_index import IndexConfig
+    from vector_store.index_storage import StoreReader
+    from vector_store.query_cache import QueryCache
 
 class VectorStoreManager:
-    def __init__(self, project_name: str, storage_dir: str = "vector_stores"):
-        """Initialize the vector store manager."""
+    EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+    # Tokens the model embeds (its max_seq_length); the rest of a longer input is dropped
+    EMBEDDING_MAX_TOKENS = 256
+    EMBEDDING_CACHE_DIR = ".embedding_cache"
+    INGEST_BATCH_SIZE = 256
+    QUERY_CACHE_FILE = "query_cache.sqlite"
+    # Held by whichever process is writing the store
+    WRITE_LOCK_FILE = "write.lock"
+    SEARCH_MODES = ("vector", "hybrid")
+    # Candidates taken from each ranking, per result, before fusing them
+    HYBRID_CANDIDATES = 4
+
+    def __init__(self, project_name: str, storage_dir: str = "vector_stores",
+                 use_embedding_cache: bool = True,
+                 embedding_batch_size: int = 32,
+                 embedding_workers: int = 0,
+                 embedding_engine: Optional["EmbeddingEngine"] = None,
+                 query_cache_size: int = 1024,
+                 persist_query_cache: bool = False,
+                 syntax_chunking: bool = True):
+        """
+        Initialize the vector store manager.
+
+        The embeddings model and text splitters are created on first use.
+
+        Args:
+            project_name: Name of the project the vector store belongs to
+            storage_dir: Directory holding all vector stores
+            use_embedding_cache: Reuse chunk embeddings cached on disk, shared
+                across all projects in storage_dir
+            embedding_batch_size: Number of chunks per embedding forward pass
+            embedding_workers: Number of embedding processes (0 embeds in-process)
+            embedding_engine: Existing engine to share, e.g. so a long-lived
+                process loads the model only once for all projects
+            query_cache_size: Number of search results cached in memory
+                (0 disables the query cache)
+            persist_query_cache: Also keep cached searches in the store
+                directory so later processes can reuse them
+            syntax_chunking: Split source code on function and class
+                boundaries (see CodeChunker) instead of by character count
+        """
         self.project_name = project_name
         self.storage_dir = storage_dir
         self.vector_store_path = os.path.join(storage_dir, project_name)
-        
-        # Initialize embeddings model
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-MiniLM-L6-v2",
-            model_kwargs={'device': 'cpu'}
-        )
-        
-        # Initialize text splitters
-        self.default_text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=500,  # Smaller chunks for better granularity
-            chunk_overlap=50,
-            length_function=len,
-            separators=["\n\n", "\n", " ", ""]
-        )
-        
-        self.markdown_splitter = MarkdownTextSplitter(
-            chunk_size=500,
-            chunk_overlap=50
-        )
+        self.use_embedding_cache = use_embedding_cache
+        self.embedding_batch_size = embedding_batch_size
+        self.embedding_workers = embedding_workers
+        self._embedding_engine = embedding_engine
+        self.query_cache_size = query_cache_size
+        self.persist_query_cache = persist_query_cache
+        self._query_cache = None
+        self._embeddings = None
+        self._default_text_splitter = None
+        self._markdown_splitter = None
+        self.code_chunker = CodeChunker.for_model(self.EMBEDDING_MAX_TOKENS) if syntax_chunking else None
         
         # Create storage directory if it doesn't exist
         os.makedirs(self.storage_dir, exist_ok=True)
         
         self.vector_store = None
+        self.manifest = None
+        self.last_ingest_stats = {}
+        self.index_config = None
+        self._reader = None
+        self._load_lock = threading.Lock()
+        # Searches in progress, which release() waits for
+        self._searches = 0
+        self._searches_done = threading.Condition()
+        self._write_lock = FileLock(os.path.join(self.vector_store_path, self.WRITE_LOCK_FILE))
+
+    @property
+    def embedding_engine(self) -> "EmbeddingEngine":
+        """Embedding engine; the model itself is loaded when first used."""
+        if self._embedding_engine is None:
+            from vector_store.embedding_engine import EmbeddingEngine
+            self._embedding_engine = EmbeddingEngine(
+                self.EMBEDDING_MODEL,
+                batch_size=self.embedding_batch_size,
+                workers=self.embedding_workers
+            )
+        return self._embedding_engine
+
+    @property
+    def embeddings(self) -> "Embeddings":
+        """Embeddings used for indexing and search, behind the cache if enabled."""
+        if self._embeddings is None:
+            if self.use_embedding_cache:
+                from vector_store.embedding_cache import EmbeddingCache, CachedEmbeddings
+
+                # Chunks already embedded by any project are served from disk
+                self._embeddings = CachedEmbeddings(
+                    self.embedding_engine,
+                    EmbeddingCache(os.path.join(self.storage_dir, self.EMBEDDING_CACHE_DIR), self.EMBEDDING_MODEL)
+                )
+            else:
+                self._embeddings = self.embedding_engine
+        return self._embeddings
+
+    @property
+    def query_cache(self) -> Optional["QueryCache"]:
+        """Cache of query embeddings and results, or None if disabled."""
+        if self._query_cache is None and self.query_cache_size > 0:
+            from vector_store.query_cache import QueryCache
+            path = os.path.join(self.vector_store_path, self.QUERY_CACHE_FILE) if self.persist_query_cache else None
+            self._query_cache = QueryCache(self.query_cache_size, path)
+        return self._query_cache
+
+    @property
+    def default_text_splitter(self):
+        """Splitter used for every non-markdown file."""
+        if self._default_text_splitter is None:
+            from langchain.text_splitter import RecursiveCharacterTextSplitter
+            self._default_text_splitter = RecursiveCharacterTextSplitter(
+                chunk_size=500,  # Smaller chunks for better granularity
+                chunk_overlap=50,
+                length_function=len,
+                separators=["\n\n", "\n", " ", ""],
+                add_start_index=True  # lets overlapping chunks be merged back when answering
+            )
+        return self._default_text_splitter
+
+    @property
+    def markdown_splitter(self):
+        """Splitter used for markdown files."""
+        if self._markdown_splitter is None:
+            from langchain.text_splitter import MarkdownTextSplitter
+            self._markdown_splitter = MarkdownTextSplitter(
+                chunk_size=500,
+                chunk_overlap=50,
+                add_start_index=True
+            )
+        return self._markdown_splitter
 
     def is_markdown_file(self, file_path: str) -> bool:
         """Check if a file is a markdown file."""
         return file_path.lower().endswith(('.md', '.markdown'))
 
-    def process_documents(self, documents: List[Dict[str, str]]) -> List[Document]:
+    def split_document(self, file_path: str, content: str) -> List["Document"]:
+        """Split a single file into LangChain document chunks."""
+        from langchain.docstore.document import Document
+
+        # Create metadata with file information
+        metadata = {
+            "source": file_path,
+            "file_type": os.path.splitext(file_path)[1].lower(),
+            "is_markdown": self.is_markdown_file(file_path)
+        }
+
+        # Choose appropriate splitter based on file type
+        if self.code_chunker is not None and self.code_chunker.supports(metadata["file_type"]):
+            return [
+                Document(page_content=chunk.text, metadata=dict(
+                    metadata,
+                    start_index=chunk.start_index,
+                    line_start=chunk.line_start,
+                    line_end=chunk.line_end,
+                    symbol=chunk.symbol
+                ))
+                for chunk in self.code_chunker.split(content, metadata["file_type"])
+            ]
+
+        langchain_doc = Document(page_content=content, metadata=metadata)
+        if self.is_markdown_file(file_path):
+            # Special handling for markdown files
+            return self.markdown_splitter.split_documents([langchain_doc])
+
+        # Use default splitter for other files
+        return self.default_text_splitter.split_documents([langchain_doc])
+
+    def process_documents(self, documents: List[Dict[str, str]]) -> List["Document"]:
         """Convert raw documents into LangChain documents and split them."""
         split_docs = []
         
         for doc in documents:
-            file_path = doc["path"]
-            content = doc["content"]
-            
-            # Create metadata with file information
-            metadata = {
-                "source": file_path,
-                "file_type": os.path.splitext(file_path)[1].lower(),
-                "is_markdown": self.is_markdown_file(file_path)
-            }
-            
-            # Create initial document
-            langchain_doc = Document(page_content=content, metadata=metadata)
-            
-            # Choose appropriate splitter based on file type
-            if self.is_markdown_file(file_path):
-                # Special handling for markdown files
-                chunks = self.markdown_splitter.split_text(content)
-                split_docs.extend([
-                    Document(page_content=chunk, metadata=metadata)
-                    for chunk in chunks
-                ])
-            else:
-                # Use default splitter for other files
-                chunks = self.default_text_splitter.split_documents([langchain_doc])
-                split_docs.extend(chunks)
+            split_docs.extend(self.split_document(doc["path"], doc["content"]))
         
         return split_docs
 
-    def create_or_update_vector_store(self, documents: List[Dict[str, str]]) -> None:
-        """Create or update the vector store with the provided documents."""
-        processed_docs = self.process_documents(documents)
-        
-        if os.path.exists(self.vector_store_path):
-            # Load existing vector store and add new documents
-            self.vector_store = FAISS.load_local(
-                self.vector_store_path,
-                self.embeddings,
-                allow_dangerous_deserialization=True
-            )
-            # Delete existing documents if they exist
-            # This ensures we don't have duplicate or outdated content
-            self.vector_store = FAISS.from_documents(
-                processed_docs,
-                self.embeddings
-            )
+    def _chunk_and_record(self, doc: Dict, manifest: IndexManifest) -> List[Tuple["Document", str]]:
+        """
+        Split a document into chunks with fresh ids and record it in the manifest.
+        Returns (chunk, chunk id) pairs.
+        """
+        file_chunks = self.split_document(doc["path"], doc["content"])
+        file_chunk_ids = [str(uuid.uuid4()) for _ in file_chunks]
+        manifest.record(
+            doc["path"],
+            doc.get("size"),
+            doc.get("mtime"),
+            IndexManifest.hash_content(doc["content"]),
+            file_chunk_ids
+        )
+        return list(zip(file_chunks, file_chunk_ids))
+
+    def _add_embedded_batch(self, chunks: List["Document"], ids: List[str], vectors: List[List[float]]) -> None:
+        """Add a batch of already embedded chunks, creating the index on the first batch."""
+        from langchain_community.vectorstores import FAISS
+
+        text_embeddings = [(chunk.page_content, vector) for chunk, vector in zip(chunks, vectors)]
+        metadatas = [chunk.metadata for chunk in chunks]
+        if self.vector_store is None:
+            self.vector_store = FAISS.from_embeddings(text_embeddings, self.embeddings, metadatas=metadatas, ids=ids)
         else:
-            # Create new vector store
-            self.vector_store = FAISS.from_documents(
-                processed_docs,
-                self.embeddings
-            )
-        
-        # Save the vector store
-        self.vector_store.save_local(self.vector_store_path)
+            self.vector_store.add_embeddings(text_embeddings, metadatas=metadatas, ids=ids)
+
+    def _create_pipeline(self) -> "IngestionPipeline":
+        from vector_store.ingestion_pipeline import IngestionPipeline
+
+        batch_size = max(self.INGEST_BATCH_SIZE, self.embedding_engine.preferred_batch_size)
+        return IngestionPipeline(self.embeddings, batch_size=batch_size)
+
+    def format_embedding_stats(self) -> str:
+        """Describe the embedding throughput of this manager so far."""
+        engine = self.embedding_engine
+        mode = f"{engine.workers} worker processes" if engine.workers else "in-process"
+        summary = (f"Embedded {engine.stats['chunks']} chunks in {engine.stats['seconds']:.2f}s "
+                   f"({engine.chunks_per_second():.1f} chunks/sec, batch size {engine.batch_size}, {mode})")
+        if hasattr(self.embeddings, "hits"):
+            summary += f"; {self.embeddings.hits} chunks served from the embedding cache"
+        return summary
+
+    def close(self) -> None:
+        """Release background resources such as embedding worker processes."""
+        if self._embedding_engine is not None:
+            self._embedding_engine.close()
+
+    def release(self) -> None:
+        """
+        Close the open index and query cache once the searches in progress
+        have finished, e.g. when a resident store is evicted. A later
+        search opens them again.
+        """
+        with self._searches_done:
+            self._searches_done.wait_for(lambda: not self._searches)
+            with self._load_lock:
+                if self._reader is not None:
+                    self._reader.close()
+                    self._reader = None
+                if self._query_cache is not None:
+                    self._query_cache.close()
+                    self._query_cache = None
+
+    @contextmanager
+    def _search_in_progress(self) -> Iterator[None]:
+        with self._searches_done:
+            self._searches += 1
+        try:
+            yield
+        finally:
+            with self._searches_done:
+                self._searches -= 1
+                if not self._searches:
+                    self._searches_done.notify_all()
+
+    @contextmanager
+    def write_lock(self) -> Iterator[None]:
+        """
+        Hold the store's writer lock, shared with every process, so that
+        concurrent updates of a project run one after the other. Updates
+        take it themselves; callers that read the manifest to decide what
+        to update should hold it from then on. Searches never need it.
+        """
+        if not self._write_lock.acquire(blocking=False):
+            print(f"Waiting for another update of '{self.project_name}' to finish...")
+            with instrumentation.span("vector_store.wait_write_lock"):
+                self._write_lock.acquire()
+        try:
+            yield
+        finally:
+            self._write_lock.release()
+
+    def load_manifest(self) -> Optional[IndexManifest]:
+        """
+        Load the manifest of the current generation of the vector store,
+        keeping the loaded one if it is still current.
+        Returns None if there is no index or it was built without a manifest.
+        """
+        if not os.path.exists(self.vector_store_path):
+            return None
+        directory = current_directory(self.vector_store_path)
+        if self.manifest is None or self.manifest.directory != directory:
+            self.manifest = IndexManifest.load(directory)
+        return self.manifest
+
+    def load_index_config(self, directory: Optional[str] = None) -> "IndexConfig":
+        """
+        Load the index configuration saved with generation `directory` (the
+        current one by default). Stores whose configuration predates
+        generations keep it in the store directory, and stores without one
+        use flat indexes.
+        """
+        from vector_store.ann_index import IndexConfig
+
+        directory = directory or current_directory(self.vector_store_path)
+        if not os.path.exists(os.path.join(directory, IndexConfig.FILENAME)):
+            directory = self.vector_store_path
+        return IndexConfig.load(directory)
+
+    def _rebuild_lexical_index(self, directory: str) -> None:
+        """Build the lexical index of the store in `directory` from its chunks."""
+        import sqlite3
+        from vector_store.index_storage import CHUNKS_FILE
+
+        lexical = LexicalIndex(os.path.join(directory, LexicalIndex.FILENAME))
+        connection = sqlite3.connect(os.path.join(directory, CHUNKS_FILE))
+        try:
+            cursor = connection.execute("SELECT id, content FROM chunks")
+            while True:
+                rows = cursor.fetchmany(self.INGEST_BATCH_SIZE)
+                if not rows:
+                    break
+                lexical.add([chunk_id for chunk_id, _ in rows], [content for _, content in rows])
+        finally:
+            connection.close()
+        lexical.commit()
+        lexical.close()
+
+    def _next_generation(self) -> int:
+        """Number of the next saved index, continuing from the current one."""
+        from vector_store.index_storage import next_generation
+        return next_generation(current_directory(self.vector_store_path))
 
-    def similarity_search(self, query: str, k: int = 5) -> List[Document]:
+    def _publish(self, directory: str) -> None:
+        """Switch readers to a new generation and drop the files of the pre-generation layout."""
+        from vector_store.ann_index import IndexConfig
+        from vector_store.index_storage import LEGACY_DOCSTORE_FILE, STORE_FILES
+
+        publish_generation(self.vector_store_path, directory,
+                           STORE_FILES + (LEGACY_DOCSTORE_FILE, LexicalIndex.FILENAME, IndexManifest.FILENAME,
+                                          IndexConfig.FILENAME))
+
+    def create_or_update_vector_store(self, documents: Iterable[Dict[str, str]],
+                                      index_config: Optional["IndexConfig"] = None) -> int:
+        """
+        Create or replace the vector store with the provided documents.
+
+        Documents are streamed through the ingestion pipeline, so they may be
+        produced lazily (e.g. straight from FileProcessor.scan_directory).
+        Each embedded batch is written straight to the store's vector file
+        and chunk table (see StoreWriter), as is the BM25 lexical index, so
+        memory does not grow with the corpus apart from the manifest and
+        the approximate index selected by `index_config` (auto-selected by
+        corpus size by default), which is built from the vector file at the end.
+        Everything is written to a new generation of the store, which
+        readers switch to once it is complete.
+        Returns the number of files indexed; nothing is saved if it is 0.
+        """
+        from vector_store.ann_index import IndexConfig
+        from vector_store.index_storage import StoreWriter
+
+        index_config = index_config or IndexConfig()
+        with self.write_lock():
+            generation = self._next_generation()
+            directory = begin_generation(self.vector_store_path)
+            writer = None
+            try:
+                manifest = IndexManifest(directory)
+                lexical = LexicalIndex(os.path.join(directory, LexicalIndex.FILENAME))
+                writer = StoreWriter(directory)
+
+                def add_batch(chunks: List["Document"], ids: List[str], vectors: List[List[float]]) -> None:
+                    writer.add(chunks, ids, vectors)
+                    lexical.add(ids, [chunk.page_content for chunk in chunks])
+
+                # A full build always starts from an empty index so that no
+                # duplicate or outdated content survives
+                self.vector_store = None
+                try:
+                    with instrumentation.span("vector_store.ingest") as ingest:
+                        self.last_ingest_stats = self._create_pipeline().run(
+                            documents,
+                            lambda doc: self._chunk_and_record(doc, manifest),
+                            add_batch
+                        )
+                        lexical.commit()
+                        ingest.set(**self.last_ingest_stats)
+                finally:
+                    lexical.close()
+
+                if not writer.count:
+                    writer.close()
+                    shutil.rmtree(directory, ignore_errors=True)
+                    return 0
+
+                # Build the configured index type over the written vectors
+                with instrumentation.span("vector_store.save", index_type=index_config.index_type):
+                    writer.finish(index_config, generation)
+                    manifest.save()
+                    index_config.save(directory)
+            except BaseException:
+                if writer is not None:
+                    writer.close()
+                shutil.rmtree(directory, ignore_errors=True)
+                raise
+            self._publish(directory)
+        self.manifest = manifest
+        self.index_config = index_config
+        return len(manifest.files)
+
+    def apply_changes(self, documents: Iterable[Dict[str, str]], deleted_paths: Iterable[str] = ()) -> Dict[str, int]:
+        """
+        Incrementally update the vector store.
+
+        Only the given documents are re-chunked and re-embedded; vectors of
+        files that changed or were deleted are removed by chunk id, from the
+        vector and the lexical index alike. Stores created before the
+        lexical index existed get one built from all their chunks.
+
+        The result is saved as a new generation of the store, written from
+        the current one in time proportional to the change (see
+        StoreUpdater): new vectors are appended and added to the existing
+        approximate index, and removed ones are left as dead rows until
+        enough accumulate to compact the store and rebuild the index.
+        Unchanged files are carried over, so the generation being served is
+        never modified.
+
+        Args:
+            documents: New or possibly modified files (path, content, size, mtime),
+                streamed through the ingestion pipeline
+            deleted_paths: Relative paths of files that no longer exist; only
+                iterated once all documents have been consumed
+
+        Returns:
+            Dict[str, int]: Number of files indexed, removed and left untouched
+        """
+        with self.write_lock():
+            manifest = self.load_manifest()
+            if manifest is None:
+                raise ValueError("No manifest exists for this project; a full rebuild is required")
+            current = manifest.directory
+            generation = self._next_generation()
+            directory = begin_generation(self.vector_store_path)
+            try:
+                counts, rewritten = self._apply_changes(manifest, current, directory, generation,
+                                                        documents, deleted_paths)
+                # Nothing to save if no file changed, not even a timestamp
+                changed = any(counts.values()) or rewritten
+                if changed:
+                    manifest.save(directory)
+            except BaseException:
+                shutil.rmtree(directory, ignore_errors=True)
+                # The manifest was changed in memory for a generation that was never saved
+                self.manifest = None
+                raise
+            if changed:
+                self._publish(directory)
+            else:
+                shutil.rmtree(directory, ignore_errors=True)
+        return counts
+
+    def _apply_changes(self, manifest: IndexManifest, current: str, directory: str, generation: int,
+                       documents: Iterable[Dict[str, str]],
+                       deleted_paths: Iterable[str]) -> Tuple[Dict[str, int], bool]:
+        """
+        Write the files of generation `directory` from the `current` one (see
+        apply_changes). Returns the counts and whether the store files were
+        rewritten rather than carried over.
+        """
+        from vector_store.index_storage import STORE_FILES, StoreUpdater, is_legacy_store, migrate_legacy_store
+
+        if is_legacy_store(current):
+            migrate_legacy_store(current, self.embeddings)
+        # Saved with every generation, so it is published by the same switch
+        index_config = self.load_index_config(current)
+        index_config.save(directory)
+
+        stale_ids = []
+        counts = {"indexed": 0, "removed": 0, "unchanged": 0}
+        updater = None
+        lexical = None
+        has_lexical = LexicalIndex.exists(current)
+
+        def open_updater() -> StoreUpdater:
+            # The store files are carried over untouched until the first change
+            nonlocal updater
+            if updater is None:
+                updater = StoreUpdater(current, directory)
+            return updater
+
+        def open_lexical() -> LexicalIndex:
+            # The lexical index is copied on its first change
+            nonlocal lexical
+            if lexical is None:
+                path = os.path.join(directory, LexicalIndex.FILENAME)
+                shutil.copyfile(os.path.join(current, LexicalIndex.FILENAME), path)
+                lexical = LexicalIndex(path)
+            return lexical
+
+        def prepare(doc: Dict) -> List[Tuple["Document", str]]:
+            path = doc["path"]
+            if manifest.has_content(path, IndexManifest.hash_content(doc["content"])):
+                # Only the timestamp moved, the indexed vectors are still valid
+                manifest.touch(path, doc.get("size"), doc.get("mtime"))
+                counts["unchanged"] += 1
+                return []
+            stale_ids.extend(manifest.remove(path))
+            counts["indexed"] += 1
+            return self._chunk_and_record(doc, manifest)
+
+        def add_batch(chunks: List["Document"], ids: List[str], vectors: List[List[float]]) -> None:
+            open_updater().add(chunks, ids, vectors)
+            if has_lexical:
+                open_lexical().add(ids, [chunk.page_content for chunk in chunks])
+
+        try:
+            with instrumentation.span("vector_store.ingest") as ingest:
+                self.last_ingest_stats = self._create_pipeline().run(documents, prepare, add_batch)
+                ingest.set(**self.last_ingest_stats)
+
+            for path in deleted_paths:
+                stale_ids.extend(manifest.remove(path))
+                counts["removed"] += 1
+
+            if stale_ids:
+                open_updater().remove(stale_ids)
+                if has_lexical:
+                    open_lexical().remove(stale_ids)
+            if lexical is not None:
+                lexical.commit()
+
+            if updater is not None:
+                with instrumentation.span("vector_store.save") as span:
+                    span.set(rebuilt=updater.finish(index_config, generation))
+            else:
+                link_files(current, directory, STORE_FILES)
+        except BaseException:
+            if updater is not None:
+                updater.close()
+            raise
+        finally:
+            if lexical is not None:
+                lexical.close()
+
+        if not has_lexical:
+            self._rebuild_lexical_index(directory)
+        elif lexical is None:
+            link_files(current, directory, [LexicalIndex.FILENAME])
+        return counts, updater is not None or not has_lexical
+
+    def _ensure_loaded(self) -> "StoreReader":
+        """
+        Open the stored index for searching, reopening it if a newer
+        generation was published since it was opened (e.g. by an update run
+        in another process while this one stays resident). Stores saved in
+        the old pickled format are converted once.
+
+        A replaced reader is not closed: searches still running on it finish
+        on the generation they started with, and it is released once they
+        drop it.
+        """
+        from vector_store.index_storage import StoreReader, is_legacy_store, migrate_legacy_store, store_version
+
+        with self._load_lock:
+            if is_legacy_store(self.vector_store_path):
+                with self.write_lock():
+                    if is_legacy_store(self.vector_store_path):
+                        migrate_legacy_store(self.vector_store_path, self.embeddings)
+            version = store_version(self.vector_store_path)
+            if version is None:
+                raise ValueError("No vector store exists for this project")
+
+            if self._reader is None or version != self._reader.version:
+                with instrumentation.span("vector_store.open"):
+                    self._reader = StoreReader(self.vector_store_path)
+                self.index_config = self.load_index_config(self._reader.directory)
+            return self._reader
+
+    def _cached_search(self, reader: "StoreReader", queries: List[str], k: int,
+                       nprobe: Optional[int], ef_search: Optional[int]) -> List[List[int]]:
+        """
+        Search through the query cache. Results are reused for the same
+        normalized query, k, parameters and index generation; embeddings are
+        reused for the same query even after the index changed.
+        """
+        from vector_store.query_cache import normalize_query
+
+        cache = self.query_cache
+        keys = [normalize_query(query) for query in queries]
+        rows = [cache.get_results(key, k, nprobe, ef_search, reader.generation) for key in keys]
+
+        missing = [i for i, row in enumerate(rows) if row is None]
+        if missing:
+            vectors = {i: cache.get_vector(keys[i]) for i in missing}
+            to_embed = [i for i in missing if vectors[i] is None]
+            with instrumentation.span("vector_store.embed_queries", queries=len(to_embed)):
+                embedded = self.embedding_engine.embed_queries([queries[i] for i in to_embed]) if to_embed else []
+            for i, vector in zip(to_embed, embedded):
+                vectors[i] = vector
+
+            with instrumentation.span("vector_store.index_search", queries=len(missing)):
+                found = reader.search_positions([vectors[i] for i in missing], k, nprobe=nprobe, ef_search=ef_search)
+            for i, positions in zip(missing, found):
+                rows[i] = positions
+                cache.put(keys[i], vectors[i], k, nprobe, ef_search, reader.generation, positions)
+        return rows
+
+    def similarity_search(self, query: str, k: int = 5, nprobe: Optional[int] = None,
+                          ef_search: Optional[int] = None, mode: str = "vector") -> List["Document"]:
         """
         Perform similarity search in the vector store.
         Returns k most similar documents.
+
+        Args:
+            query: Text to search for
+            k: Number of documents to return
+            nprobe: IVF lists to visit (default: the value stored at creation)
+            ef_search: HNSW search depth (default: the value stored at creation)
+            mode: "vector" or "hybrid" (vector and BM25 rankings fused)
         """
-        if not self.vector_store:
-            if os.path.exists(self.vector_store_path):
-                self.vector_store = FAISS.load_local(
-                    self.vector_store_path,
-                    self.embeddings,
-                    allow_dangerous_deserialization=True
-                )
+        return self.similarity_search_batch([query], k=k, nprobe=nprobe, ef_search=ef_search, mode=mode)[0]
+
+    def similarity_search_batch(self, queries: List[str], k: int = 5, nprobe: Optional[int] = None,
+                                ef_search: Optional[int] = None,
+                                group_by_source: bool = True,
+                                mode: str = "vector") -> List[List["Document"]]:
+        """
+        Search for many queries at once: all queries are embedded in one
+        batched call and looked up with a single multi-query index search.
+        Returns, per query, the k most similar documents, grouped by file or,
+        without `group_by_source`, best match first.
+
+        In "hybrid" mode the vector ranking is fused with the BM25 ranking of
+        the lexical index by reciprocal rank fusion, so chunks containing the
+        exact identifiers of a query rank high even when their embeddings do
+        not. Stores without a lexical index are searched by vector only.
+        """
+        if mode not in self.SEARCH_MODES:
+            raise ValueError(f"Unknown search mode '{mode}', expected one of: {', '.join(self.SEARCH_MODES)}")
+        if not queries:
+            return []
+        with self._search_in_progress(), instrumentation.span("vector_store.search", queries=len(queries), k=k,
+                                                              mode=mode):
+            reader = self._ensure_loaded()
+            nprobe = nprobe or self.index_config.nprobe
+            ef_search = ef_search or self.index_config.ef_search
+            hybrid = mode == "hybrid" and reader.lexical is not None
+            candidates = k * self.HYBRID_CANDIDATES if hybrid else k
+
+            # Perform search
+            if self.query_cache is not None:
+                rows = self._cached_search(reader, queries, candidates, nprobe, ef_search)
             else:
-                raise ValueError("No vector store exists for this project")
-        
-        # Perform search
-        results = self.vector_store.similarity_search(query, k=k)
-        
+                with instrumentation.span("vector_store.embed_queries", queries=len(queries)):
+                    query_vectors = self.embedding_engine.embed_queries(queries)
+                with instrumentation.span("vector_store.index_search", queries=len(queries)):
+                    rows = reader.search_positions(query_vectors, candidates, nprobe=nprobe, ef_search=ef_search)
+            if hybrid:
+                with instrumentation.span("vector_store.lexical_search", queries=len(queries)):
+                    lexical_rows = reader.lexical_search_positions(queries, candidates)
+                rows = [reciprocal_rank_fusion([vector, lexical], k) for vector, lexical in zip(rows, lexical_rows)]
+            with instrumentation.span("vector_store.fetch"):
+                results = reader.documents_at(rows)
+
         # Sort results to group chunks from the same file together
-        results.sort(key=lambda x: x.metadata["source"])
-        
+        if group_by_source:
+            for documents in results:
+                documents.sort(key=lambda x: x.metadata["source"])
+
         return results
 
     def delete_vector_store(self) -> bool:
-        """Delete the vector store for this project."""
+        """Delete the vector store for this project, once no update is writing it."""
         try:
-            import shutil
-            if os.path.exists(self.vector_store_path):
+            if self._reader is not None:
+                self._reader.close()
+                self._reader = None
+            if self._query_cache is not None:
+                self._query_cache.close()
+                self._query_cache = None
+            if not os.path.exists(self.vector_store_path):
+                return False
+            with self.write_lock():
                 shutil.rmtree(self.vector_store_path)
-                self.vector_store = None
-                return True
-            return False
+            self.vector_store = None
+            return True
         except Exception as e:
             print(f"Error deleting vector store: {str(e)}")
             return False